@@ -0,0 +1,334 @@
+'''
+6.176 MIT POKERBOTS ASYNC GAME ENGINE
+Drives many games concurrently from one process on an asyncio event loop.
+
+Every game follows the same procedure as engine.Game, whose rounds are generators of
+queries to the pokerbots; here each query is answered over asyncio streams, and the
+pokerbots' output is read from their subprocess pipes by the event loop instead of a
+thread per pokerbot. A pokerbot's responses are timed as they are received, so the time
+the event loop spends on other games is never charged to its game clock.
+'''
+from collections import deque
+import argparse
+import asyncio
+import shutil
+import socket
+import tempfile
+import time
+import os
+
+from engine import Game, Player, PlayerLog, STATUS, PROTOCOL_VERSION, FRAME_HEADER, RESPONSE_PREVIEW, encode_message, decode_response, decode_line
+from config import *
+
+
+class TimedStreamReader(asyncio.StreamReader):
+    '''
+    Stream reader which notes when each line from the pokerbot arrived, or each frame once the pokerbot speaks binary.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.line_times = deque()
+        self.framed = False
+        self.header = bytearray()
+        self.frame_left = None
+
+    def feed_data(self, data):
+        '''
+        Stamps each line or frame end in the data with the time it was received.
+        '''
+        received_time = time.perf_counter()
+        ends = self.count_frames(data) if self.framed else data.count(b'\n')
+        self.line_times.extend([received_time] * ends)
+        super().feed_data(data)
+
+    def count_frames(self, data):
+        '''
+        Returns how many binary frames end in the data, keeping track of the frame in progress.
+        '''
+        frames = 0
+        view = memoryview(data)
+        while True:
+            if self.frame_left is None:
+                needed = FRAME_HEADER.size - len(self.header)
+                self.header += view[:needed]
+                view = view[needed:]
+                if len(self.header) < FRAME_HEADER.size:
+                    return frames
+                self.frame_left = FRAME_HEADER.unpack(self.header)[0]
+                self.header.clear()
+            taken = min(self.frame_left, len(view))
+            self.frame_left -= taken
+            view = view[taken:]
+            if self.frame_left > 0:
+                return frames
+            frames += 1
+            self.frame_left = None
+
+
+class AsyncPlayer(Player):
+    '''
+    Handles subprocess and stream interactions with one player's pokerbot on the event loop.
+    '''
+
+    def __init__(self, name, path, output_dir='.', config=None):
+        super().__init__(name, path, output_dir, config)
+        self.reader = None
+        self.writer = None
+        self.output_task = None
+        self.binary = False
+        self.frame_header = None
+
+    async def read_output(self, stream):
+        '''
+        Streams the pokerbot's output to its log until its pipe closes.
+        '''
+        while True:
+            output = await stream.read(PlayerLog.CHUNK_SIZE)
+            if not output:
+                break
+            self.log_output(output)
+
+    async def run(self):
+        '''
+        Runs the pokerbot and establishes the stream connection.
+        '''
+        if self.commands is None or len(self.commands['run']) == 0:
+            return
+        loop = asyncio.get_running_loop()
+        connected = loop.create_future()
+
+        def accept(reader, writer):
+            if connected.done():  # only the first connection over either transport is used
+                writer.close()
+            else:
+                connected.set_result((reader, writer))
+        protocol = lambda: asyncio.StreamReaderProtocol(TimedStreamReader(), accept)
+        servers = []
+        socket_dir = None
+        try:
+            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server_socket.bind(('', 0))
+            server_socket.listen()
+            servers.append(await loop.create_server(protocol, sock=server_socket))
+            port = server_socket.getsockname()[1]
+            env = None
+            if self.config.bot_transport == 'unix' and hasattr(socket, 'AF_UNIX'):
+                socket_dir = tempfile.mkdtemp(prefix='pokerbots-')
+                socket_path = os.path.join(socket_dir, 'engine.sock')
+                servers.append(await loop.create_unix_server(protocol, socket_path))
+                env = dict(os.environ, POKERBOTS_UNIX_SOCKET=socket_path)
+            proc = await asyncio.create_subprocess_exec(*self.commands['run'], str(port),
+                                                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                                                        cwd=self.path, env=env)
+            self.bot_subprocess = proc
+            self.output_task = loop.create_task(self.read_output(proc.stdout))
+            self.reader, self.writer = await asyncio.wait_for(connected, self.config.connect_timeout)
+            family = self.writer.get_extra_info('socket').family
+            transport = 'unix' if family == getattr(socket, 'AF_UNIX', None) else 'tcp'
+            print(self.name, 'connected successfully over', transport)
+            if self.config.bot_protocol == 'binary':
+                await self.negotiate()
+        except (TypeError, ValueError):
+            print(self.name, 'run command misformatted')
+        except asyncio.TimeoutError:
+            print('Timed out waiting for', self.name, 'to connect')
+        except OSError:
+            print(self.name, 'run failed - check "run" in commands.json')
+        finally:
+            for server in servers:
+                server.close()
+            if socket_dir is not None:
+                shutil.rmtree(socket_dir, ignore_errors=True)
+
+    async def negotiate(self):
+        '''
+        Offers the pokerbot the binary protocol, which it accepts by answering with the same version.
+        '''
+        try:
+            self.writer.write((PROTOCOL_VERSION + '\n').encode())
+            line = await asyncio.wait_for(self.reader.readline(), self.config.connect_timeout)
+            if self.reader.line_times:
+                self.reader.line_times.popleft()
+            if line.decode().strip() == PROTOCOL_VERSION:
+                self.binary = self.reader.framed = True
+                print(self.name, 'accepted the binary protocol')
+        except asyncio.TimeoutError:
+            print('Timed out waiting for', self.name, 'to answer the binary protocol offer')
+            self.writer.close()
+            self.writer = None
+
+    async def read_response(self):
+        '''
+        Returns the pokerbot's next response as a line of text, or an empty line once it closes the connection.
+        '''
+        if not self.binary:
+            return decode_line(await self.reader.readline())
+        try:
+            # a header read before a timed out wait is kept for the next read
+            if self.frame_header is None:
+                self.frame_header = await self.reader.readexactly(FRAME_HEADER.size)
+            payload = await self.reader.readexactly(FRAME_HEADER.unpack(self.frame_header)[0])
+        except asyncio.IncompleteReadError:
+            return ''
+        self.frame_header = None
+        try:
+            return decode_response(payload) + '\n'
+        except ValueError as error:
+            raise ValueError('{} {!r}'.format(error, payload[:RESPONSE_PREVIEW])) from None
+
+    async def stop(self):
+        '''
+        Closes the stream connection and stops the pokerbot.
+        '''
+        await self.disconnect()
+        self.write_log()
+
+    async def disconnect(self):
+        '''
+        Sends the quit message and waits for the pokerbot to exit.
+        '''
+        if self.writer is not None:
+            try:
+                self.writer.write(encode_message('Q') if self.binary else b'Q\n')
+                await asyncio.wait_for(self.writer.drain(), self.config.connect_timeout)
+                self.writer.close()
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to disconnect')
+                self.writer.close()
+            except OSError:
+                print('Could not close socket connection with', self.name)
+        if self.bot_subprocess is not None:
+            try:
+                # a pokerbot out of time may still be stuck, so it only gets a moment to quit
+                await asyncio.wait_for(self.bot_subprocess.wait(), self.config.connect_timeout if self.game_clock > 0. else 0.1)
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to quit')
+                self.bot_subprocess.kill()
+                await self.bot_subprocess.wait()
+            await self.output_task
+
+    async def query(self, round_state, player_message, game_log):
+        '''
+        Requests NUM_BOARDS actions from the pokerbot over the stream connection.
+        At the end of the round, we request NUM_BOARDS CheckAction's from the pokerbot.
+        '''
+        if self.writer is not None and self.game_clock > 0.:
+            try:
+                message = self.format_message(player_message)
+                data = encode_message(message) if self.binary else message.encode()
+                start_time = time.perf_counter()
+                self.writer.write(data)
+                await asyncio.wait_for(self.writer.drain(), self.config.connect_timeout)
+                sent_time = time.perf_counter()
+                timeout = self.game_clock - (sent_time - start_time) if self.config.enforce_game_clock else self.config.connect_timeout
+                try:
+                    line = await asyncio.wait_for(self.read_response(), timeout)
+                except asyncio.TimeoutError:
+                    if not self.reader.line_times:
+                        raise
+                    # the response arrived in time, but the event loop was busy with other games
+                    line = await self.read_response()
+                # charge the pokerbot up to when its response was received, not when this game resumed
+                end_time = max(self.reader.line_times.popleft(), sent_time) if self.reader.line_times else time.perf_counter()
+                self.charge_query(round_state, start_time, sent_time, end_time)
+                return self.parse_actions(round_state, line.strip(), game_log)
+            except (asyncio.TimeoutError, socket.timeout):
+                self.drop(game_log, self.name + ' ran out of time')
+            except OSError:
+                self.drop(game_log, self.name + ' disconnected')
+            except ValueError as error:  # the response was too long or could not be decoded
+                game_log.append(self.name + ' response misformatted: ' + str(error))
+        return self.default_actions(round_state)
+
+
+class AsyncGame(Game):
+    '''
+    Manages logging and the high-level game procedure on the event loop.
+
+    Pokerbots always run as subprocesses, in_process_bots only applies to engine.Game.
+    '''
+
+    async def answer_async(self, queries):
+        '''
+        Plays out a generator of queries, awaiting each pokerbot in turn, and returns its result.
+        '''
+        try:
+            player, round_state, player_message = next(queries)
+            while True:
+                actions = await player.query(round_state, player_message, self.log)
+                player, round_state, player_message = queries.send(actions)
+        except StopIteration as stop:
+            return stop.value
+
+    async def run(self, build=True):
+        '''
+        Runs one game of poker.
+
+        Returns the players in their starting seat order.
+        '''
+        players = [AsyncPlayer(name, path, self.output_dir, self.config) for name, path in self.player_specs]
+        loop = asyncio.get_running_loop()
+        try:
+            for player in players:
+                await loop.run_in_executor(None, player.build, build)
+            await asyncio.gather(*[player.run() for player in players])
+            seats = await self.answer_async(self.game_queries(players))
+            await asyncio.gather(*[player.stop() for player in players])
+        finally:
+            self.close()
+        return seats
+
+
+async def run_games(games, max_games=None, build=True, config=None):
+    '''
+    Plays (player specs, output directory) games concurrently, at most max_games at a time.
+
+    Every game uses the settings of config, or of config.py if it is None, apart from its
+    players and output directory. Each pokerbot directory is built once before the games start.
+    Returns the players of each game in their starting seat order, or the exception which ended it.
+    '''
+    if build:
+        loop = asyncio.get_running_loop()
+        paths = {}
+        for player_specs, output_dir in games:
+            for name, path in player_specs:
+                paths.setdefault(path, (name, output_dir))
+        for path, (name, output_dir) in paths.items():
+            os.makedirs(output_dir, exist_ok=True)
+            player = Player(name, path, output_dir, config)
+            await loop.run_in_executor(None, player.build)
+            player.write_log()
+    limit = asyncio.Semaphore(max_games or len(games) or 1)
+
+    async def run_game(player_specs, output_dir):
+        async with limit:
+            os.makedirs(output_dir, exist_ok=True)
+            return await AsyncGame(player_specs, output_dir, config).run(build=False)
+    return await asyncio.gather(*[run_game(player_specs, output_dir) for player_specs, output_dir in games], return_exceptions=True)
+
+
+def parse_args():
+    '''
+    Parses the number of games and where to write them.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 async_engine.py')
+    parser.add_argument('--games', type=int, default=8, help='Games to play between the players in config.py, defaults to 8')
+    parser.add_argument('--max-games', type=int, default=None, help='Games running at once, defaults to all of them')
+    parser.add_argument('--output-dir', type=str, default='async_games', help='Directory for the logs of each game')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    player_specs = [(PLAYER_1_NAME, PLAYER_1_PATH), (PLAYER_2_NAME, PLAYER_2_PATH)]
+    # seats alternate between consecutive games
+    games = [(player_specs if i % 2 == 0 else player_specs[::-1], os.path.join(args.output_dir, 'game_{:04d}'.format(i+1))) for i in range(args.games)]
+    start_time = time.perf_counter()
+    results = asyncio.run(run_games(games, args.max_games))
+    for (player_specs, output_dir), result in zip(games, results):
+        if isinstance(result, Exception):
+            print(output_dir, 'failed:', repr(result))
+        else:
+            print(output_dir + STATUS(result))
+    print('{} games in {:.1f}s'.format(len(games), time.perf_counter() - start_time))
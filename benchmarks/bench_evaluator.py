@@ -0,0 +1,62 @@
+'''
+Compares the vectorized evaluator with per-hand eval7.evaluate.
+
+Also checks that the Python skeleton's copy of the evaluator matches evaluator.py, its source.
+
+Usage: python3 benchmarks/bench_evaluator.py [--sizes 6 1000 100000]
+'''
+import argparse
+import filecmp
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import numpy as np
+import eval7
+from evaluator import evaluate
+
+
+def random_hands(num_hands, rng):
+    '''
+    Deals num_hands random 7-card hands as rows of card indices.
+    '''
+    return np.argsort(rng.random((num_hands, 52)), axis=1)[:, :7]
+
+
+def best_time(function, repeats):
+    '''
+    Returns the fastest of several timed calls.
+    '''
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/bench_evaluator.py')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[6, 1000, 100000], help='Hands per batch')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repeats per size, best is reported')
+    args = parser.parse_args()
+    assert filecmp.cmp(os.path.join(ROOT, 'evaluator.py'), os.path.join(ROOT, 'python_skeleton', 'skeleton', 'evaluator.py'), shallow=False), \
+        'python_skeleton/skeleton/evaluator.py differs from evaluator.py, copy evaluator.py over it'
+    rng = np.random.default_rng(0)
+    deck = eval7.Deck().cards  # deck order matches card indices
+    print('{:>8}  {:>14}  {:>14}  {:>8}'.format('hands', 'batch hands/s', 'eval7 hands/s', 'speedup'))
+    for size in args.sizes:
+        hands = random_hands(size, rng)
+        eval7_hands = [[deck[card] for card in row] for row in hands.tolist()]
+        batch_scores = evaluate(hands)
+        eval7_scores = [eval7.evaluate(hand) for hand in eval7_hands]
+        assert batch_scores.tolist() == eval7_scores, 'scores differ from eval7'
+        batch_time = best_time(lambda: evaluate(hands), args.repeats)
+        eval7_time = best_time(lambda: [eval7.evaluate(hand) for hand in eval7_hands], args.repeats)
+        print('{:>8}  {:>14.0f}  {:>14.0f}  {:>7.2f}x'.format(size, size / batch_time, size / eval7_time, eval7_time / batch_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+'''
+Microbenchmark of RoundState.proceed in the engine.
+
+Random legal action sequences are recorded first, then replayed from the start of
+each round, so the timings only cover the engine's state transitions.
+
+Usage: python3 benchmarks/bench_proceed.py [--rounds 2000]
+'''
+import argparse
+import tracemalloc
+import random
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import eval7
+from engine import FoldAction, CallAction, CheckAction, RaiseAction, AssignAction
+from engine import BoardState, RoundState, TerminalState, SmallDeck
+from engine import NUM_BOARDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
+
+
+def new_round(rng):
+    '''
+    Deals a round the way Game.run_round does.
+    '''
+    deck = eval7.Deck()
+    rng.shuffle(deck.cards)
+    hands = [deck.deal(NUM_BOARDS*2), deck.deal(NUM_BOARDS*2)]
+    new_decks = [SmallDeck(deck) for i in range(NUM_BOARDS)]
+    for new_deck in new_decks:
+        rng.shuffle(new_deck.cards)
+    stacks = (STARTING_STACK - NUM_BOARDS*SMALL_BLIND, STARTING_STACK - NUM_BOARDS*BIG_BLIND)
+    board_states = [BoardState((i+1)*BIG_BLIND, (SMALL_BLIND, BIG_BLIND), None, new_decks[i], None) for i in range(NUM_BOARDS)]
+    return RoundState(-2, 0, stacks, hands, board_states, None)
+
+
+def random_actions(round_state, rng):
+    '''
+    Picks a random legal action on every board, keeping net raises within the stacks.
+    '''
+    active = round_state.button % 2
+    legal_actions = round_state.legal_actions()
+    actions = []
+    budget = min(round_state.stacks[active], round_state.stacks[1-active])
+    for i in range(NUM_BOARDS):
+        board_state = round_state.board_states[i]
+        if AssignAction in legal_actions[i]:
+            actions.append(AssignAction(round_state.hands[active][2*i:2*i+2]))
+            continue
+        if isinstance(board_state, BoardState):
+            continue_cost = board_state.pips[1-active] - board_state.pips[active]
+            if RaiseAction in legal_actions[i] and rng.random() < 0.3:
+                min_raise, max_raise = board_state.raise_bounds(round_state.button, round_state.stacks)
+                amount = rng.randint(min_raise, max_raise)
+                if amount - board_state.pips[active] <= budget:
+                    budget -= amount - board_state.pips[active]
+                    actions.append(RaiseAction(amount))
+                    continue
+            if FoldAction in legal_actions[i] and rng.random() < 0.1:
+                actions.append(FoldAction())
+                continue
+            if CallAction in legal_actions[i] and continue_cost <= budget:
+                budget -= continue_cost
+                actions.append(CallAction())
+                continue
+        actions.append(CheckAction() if CheckAction in legal_actions[i] else FoldAction())
+    return actions
+
+
+def record_rounds(num_rounds, seed):
+    '''
+    Returns (initial round state, action sequence) pairs for num_rounds rounds.
+    '''
+    rng = random.Random(seed)
+    rounds = []
+    for _ in range(num_rounds):
+        deal_seed = rng.random()
+        round_state = new_round(random.Random(deal_seed))
+        history = []
+        while not isinstance(round_state, TerminalState):
+            actions = random_actions(round_state, rng)
+            history.append(actions)
+            round_state = round_state.proceed(actions)
+        rounds.append((new_round(random.Random(deal_seed)), history))
+    return rounds
+
+
+def replay(rounds):
+    '''
+    Replays every recorded round and returns the number of proceed calls.
+    '''
+    proceeds = 0
+    for initial_state, history in rounds:
+        round_state = initial_state
+        for actions in history:
+            round_state = round_state.proceed(actions)
+        proceeds += len(history)
+    return proceeds
+
+
+def retained_bytes(rounds):
+    '''
+    Returns the memory held by the terminal states of every replayed round.
+    '''
+    tracemalloc.start()
+    start_size = tracemalloc.get_traced_memory()[0]
+    terminal_states = []
+    for initial_state, history in rounds:
+        round_state = initial_state
+        for actions in history:
+            round_state = round_state.proceed(actions)
+        terminal_states.append(round_state)
+    size = tracemalloc.get_traced_memory()[0] - start_size
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/bench_proceed.py')
+    parser.add_argument('--rounds', type=int, default=2000, help='Rounds to replay')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repeats, best is reported')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the recorded actions')
+    args = parser.parse_args()
+    rounds = record_rounds(args.rounds, args.seed)
+    best = None
+    for _ in range(args.repeats):
+        start_time = time.perf_counter()
+        proceeds = replay(rounds)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    print('{} proceed calls over {} rounds'.format(proceeds, args.rounds))
+    print('{:.2f} us per proceed, {:.0f} rounds/s'.format(best / proceeds * 1e6, args.rounds / best))
+    print('{:.0f} bytes retained per terminal state'.format(retained_bytes(rounds) / args.rounds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+'''
+Replays a recorded engine message stream through the Python skeleton Runner.
+
+A seeded game is played in process to record every message one player receives, then
+the stream is fed to a fresh Runner and the skeleton player, so the timings cover the
+Runner's parsing and state reconstruction plus the player's own get_actions.
+
+Usage: python3 benchmarks/bench_runner.py [--repeats 5]
+'''
+from contextlib import redirect_stdout
+import argparse
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, 'python_skeleton'))
+import engine
+from skeleton.runner import Runner
+from player import Player
+
+
+class ReplayFile():
+    '''
+    Stands in for the Runner's socket file, reading the recorded stream and discarding responses.
+    '''
+
+    def __init__(self, stream):
+        self.lines = iter(stream.splitlines(keepends=True))
+
+    def readline(self):
+        return next(self.lines, b'')
+
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+def record_stream(seed):
+    '''
+    Plays one seeded game in process and returns the messages sent to the first player as bytes.
+    '''
+    messages = {}
+    write = engine.InProcessConnection.write
+
+    def recording_write(connection, data):
+        messages.setdefault(id(connection), []).append(data)
+        write(connection, data)
+
+    path = os.path.join(ROOT, 'python_skeleton')
+    config = engine.MatchConfig(players=(('A', path), ('B', path)), in_process_bots=True, deal_seed=seed)
+    engine.InProcessConnection.write = recording_write
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            engine.Match(config).run()
+    finally:
+        engine.InProcessConnection.write = write
+    first = min(messages.values(), key=lambda stream: b'P0' not in stream[0])
+    return b''.join(first)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/bench_runner.py')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed replays, best is reported')
+    parser.add_argument('--seed', type=int, default=0, help='Deal seed of the recorded game')
+    args = parser.parse_args()
+    stream = record_stream(args.seed)
+    num_messages = stream.count(b'\n')
+    best = None
+    for _ in range(args.repeats):
+        runner = Runner(Player(), ReplayFile(stream))
+        start_time = time.perf_counter()
+        runner.run()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    print('{} messages, {} bytes'.format(num_messages, len(stream)))
+    print('{:.2f} us per message, {:.1f} ms per game'.format(best / num_messages * 1e6, best * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+'''
+Checks the batched self-play environment against the engine and compares their speed.
+
+The same seeded deals are played in vector_env.VectorEnv and with engine.RoundState, with
+random actions, some of them illegal, checked by engine.Player.parse_actions, and every
+state along the way and every round's deltas must agree. Then both play random legal
+actions for a while and their rounds per second are compared.
+
+Usage: python3 benchmarks/bench_vector_env.py [--check-rounds 2000] [--envs 1 64 4096]
+'''
+import argparse
+import random
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from engine import BoardState, TerminalState, Player, NUM_BOARDS
+from vector_env import VectorEnv, FOLD, CALL, CHECK, RAISE, NUM_KINDS, HAND_SIZE
+from bench_proceed import new_round, random_actions as engine_actions
+
+LETTERS = {FOLD: 'F', CALL: 'C', CHECK: 'K', RAISE: 'R'}
+
+
+def random_actions(observation, rng, illegal=0.):
+    '''
+    Picks a random legal action on every board of every round, and a random illegal one with probability illegal.
+    '''
+    legal = observation['legal']
+    # folds are made rarer so that more rounds reach the later streets
+    kinds = (rng.random(legal.shape) * legal * np.array([0.3, 1., 1., 0.7])).argmax(axis=2)
+    bounds = observation['raise_bounds']
+    amounts = rng.integers(bounds[:, :, 0], bounds[:, :, 1] + 1)
+    assignments = np.argsort(rng.random((len(legal), HAND_SIZE)), axis=1)
+    if illegal:
+        noisy = rng.random(kinds.shape) < illegal
+        kinds[noisy] = rng.integers(0, NUM_KINDS, kinds.shape)[noisy]
+        amounts[noisy] += rng.integers(-3, 4, kinds.shape)[noisy]
+        misassigned = rng.random(len(legal)) < illegal
+        assignments[misassigned, 0] = assignments[misassigned, 1]
+    return kinds, amounts, assignments
+
+
+def clauses(round_state, kinds, amounts, assignment):
+    '''
+    Encodes one round's actions as a pokerbot's response to the engine.
+    '''
+    if round_state.button < 0:
+        hand = round_state.hands[round_state.button % 2]
+        return ';'.join('{}A{}'.format(i+1, ','.join(str(hand[j]) for j in assignment[2*i:2*i+2])) for i in range(NUM_BOARDS))
+    return ';'.join('{}{}'.format(i+1, LETTERS[kinds[i]] + (str(amounts[i]) if kinds[i] == RAISE else '')) for i in range(NUM_BOARDS))
+
+
+def differences(env, i, round_state):
+    '''
+    Returns a description of how round i of the environment differs from the engine's round state, or None.
+    '''
+    if isinstance(round_state, TerminalState):
+        if not env.done[i] or env.deltas[i].tolist() != round_state.deltas:
+            return 'deltas {} != {}'.format(env.deltas[i].tolist(), round_state.deltas)
+        return None
+    expected = (round_state.button, round_state.street, list(round_state.stacks),
+                [(b.pot, list(b.pips), b.settled) if isinstance(b, BoardState) else None for b in round_state.board_states])
+    actual = (int(env.button[i]), int(env.street[i]), env.stacks[i].tolist(),
+              [(int(env.pots[i, j]), env.pips[i, j].tolist(), bool(env.settled[i, j])) if env.live[i, j] else None for j in range(NUM_BOARDS)])
+    return None if expected == actual and not env.done[i] else '{} != {}'.format(actual, expected)
+
+
+def check(num_rounds, seed):
+    '''
+    Plays num_rounds seeded rounds in both and returns (actions taken, actions the engine corrected).
+    '''
+    deal_rng = random.Random(seed)
+    deal_seeds = [deal_rng.getrandbits(64) for _ in range(num_rounds)]
+    env = VectorEnv(num_rounds, auto_reset=False)
+    observation = env.reset(deal_seeds)
+    round_states = [new_round(random.Random(deal_seed)) for deal_seed in deal_seeds]
+    player = Player('check', '.', None)
+    rng = np.random.default_rng(seed)
+    game_log = []
+    steps = 0
+    while not env.done.all():
+        kinds, amounts, assignments = random_actions(observation, rng, illegal=0.05)
+        for i, round_state in enumerate(round_states):
+            if not isinstance(round_state, TerminalState):
+                response = clauses(round_state, kinds[i].tolist(), amounts[i].tolist(), assignments[i].tolist())
+                round_states[i] = round_state.proceed(player.parse_actions(round_state, response, game_log))
+                steps += 1
+        observation, _, _, _ = env.step(kinds, amounts, assignments)
+        for i, round_state in enumerate(round_states):
+            difference = differences(env, i, round_state)
+            assert difference is None, 'round {} (deal seed {}) differs from the engine: {}'.format(i, deal_seeds[i], difference)
+    return steps, len(game_log)
+
+
+def env_rate(num_envs, seconds, seed):
+    '''
+    Returns the rounds per second of a VectorEnv of num_envs rounds playing random legal actions.
+    '''
+    env = VectorEnv(num_envs, seed)
+    rng = np.random.default_rng(seed)
+    observation = env.observe()
+    rounds = 0
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < seconds:
+        observation, _, dones, _ = env.step(*random_actions(observation, rng))
+        rounds += int(dones.sum())
+    return rounds / (time.perf_counter() - start_time)
+
+
+def engine_rate(seconds, seed):
+    '''
+    Returns the rounds per second of engine.RoundState playing random legal actions.
+    '''
+    rng = random.Random(seed)
+    rounds = 0
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < seconds:
+        round_state = new_round(rng)
+        while not isinstance(round_state, TerminalState):
+            round_state = round_state.proceed(engine_actions(round_state, rng))
+        rounds += 1
+    return rounds / (time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/bench_vector_env.py')
+    parser.add_argument('--check-rounds', type=int, default=2000, help='Seeded rounds played in both and compared')
+    parser.add_argument('--envs', type=int, nargs='+', default=[1, 64, 4096], help='Rounds per environment')
+    parser.add_argument('--seconds', type=float, default=2., help='Time spent playing each size')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the deals and actions')
+    args = parser.parse_args()
+    steps, corrected = check(args.check_rounds, args.seed)
+    print('{} rounds agree with the engine over {} actions, {} of them corrected'.format(args.check_rounds, steps, corrected))
+    engine_rounds = engine_rate(args.seconds, args.seed)
+    print('{:>8}  {:>14}  {:>15}  {:>8}'.format('envs', 'env rounds/s', 'engine rounds/s', 'speedup'))
+    for num_envs in args.envs:
+        env_rounds = env_rate(num_envs, args.seconds, args.seed)
+        print('{:>8}  {:>14.0f}  {:>15.0f}  {:>7.2f}x'.format(num_envs, env_rounds, engine_rounds, env_rounds / engine_rounds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+'''
+Checks the Python skeleton's equity against weighted ranges.
+
+A range whose every weighted combo is blocked by the known cards must raise ValueError, both
+for the exact result once the turn is out and for Monte Carlo sampling before that, and a
+range with one combo left must still give that combo's equity.
+
+Usage: python3 benchmarks/check_equity.py
+'''
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'python_skeleton'))
+from skeleton.equity import equity
+
+HAND = ['As', 'Ad']
+BOARDS = {'sampled': [], 'exact': ['2c', '3d', '4h', '5s']}
+# your ace blocks AsKs, the dead card blocks KhKc, and QQ has no weight
+BLOCKED_RANGE = {'AsKs': 1., 'KhKc': 1., 'QQ': 0.}
+
+
+def main():
+    for path, board in BOARDS.items():
+        try:
+            result = equity(HAND, board, opp_range=BLOCKED_RANGE, dead=['Kh'])
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('a fully blocked range gave {} on the {} path instead of raising ValueError'.format(result, path))
+        # sampling is seeded randomly, so the sampled results only have to be close
+        result = equity(HAND, board, opp_range=dict(BLOCKED_RANGE, KdKc=1.), dead=['Kh'], samples=20000)
+        expected = equity(HAND, board, opp_range={'KdKc': 1.}, dead=['Kh'], samples=20000)
+        assert abs(result - expected) < 0.02, 'a range with one combo left gave {} on the {} path, not {}'.format(result, path, expected)
+    print('fully blocked ranges raise ValueError, and partly blocked ranges give the equity of the combos left')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+'''
+Checks the engine's game results between two copies of the same pokerbot.
+
+Seeded games are played in process between two copies of the Python skeleton, which are
+evenly matched, so the sequential test of EARLY_STOP = 'sprt' must not find either of
+them ahead, with or without duplicate deals, and their paired result over duplicate deals
+must be 0, as the skeleton plays the same cards the same way from either seat.
+
+Usage: python3 benchmarks/check_results.py [--games 10] [--rounds 300]
+'''
+from contextlib import redirect_stdout
+import argparse
+import io
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import engine
+
+SKELETON = os.path.join(ROOT, 'python_skeleton')
+
+
+def play(seed, num_rounds, duplicate_deals):
+    '''
+    Plays one seeded game between two copies of the skeleton with the sequential test on, and returns its MatchResult.
+    '''
+    config = engine.MatchConfig(players=(('A', SKELETON), ('B', SKELETON)), num_rounds=num_rounds, in_process_bots=True,
+                                deal_seed=seed, duplicate_deals=duplicate_deals, early_stop='sprt')
+    with redirect_stdout(io.StringIO()):
+        return engine.Match(config).run()
+
+
+class LineLog(engine.NullLog):
+    '''
+    Keeps the game log's lines in memory.
+    '''
+
+    def __init__(self):
+        self.lines = []
+
+    def append(self, line):
+        self.lines.append(line)
+
+
+def check_paired_results(games, num_rounds):
+    '''
+    Asserts that the paired result of every game between evenly matched pokerbots is 0.
+    '''
+    for seed in range(games):
+        config = engine.MatchConfig(players=(('A', SKELETON), ('B', SKELETON)), num_rounds=num_rounds, in_process_bots=True,
+                                    deal_seed=seed, duplicate_deals=True)
+        game = engine.Game(config.players, None, config)
+        game.log = LineLog()
+        with redirect_stdout(io.StringIO()):
+            game.run()
+        line = next(line for line in game.log.lines if ' paired result ' in line)
+        assert line.startswith('A paired result 0 over '), 'seed {}: {}'.format(seed, line)
+    print('{} games of {} rounds between evenly matched pokerbots have a paired result of 0'.format(games, num_rounds))
+
+
+def check_early_stop(games, num_rounds):
+    '''
+    Asserts that no game between evenly matched pokerbots stops early.
+    '''
+    for duplicate_deals in (False, True):
+        for seed in range(games):
+            result = play(seed, num_rounds, duplicate_deals)
+            assert result.stop_reason is None, 'seed {}{} stopped early: {}'.format(
+                seed, ' with duplicate deals' if duplicate_deals else '', result.stop_reason)
+    print('{} games of {} rounds between evenly matched pokerbots played every round, with and without duplicate deals'.format(
+        games, num_rounds))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/check_results.py')
+    parser.add_argument('--games', type=int, default=10, help='Seeded games played with each setting')
+    parser.add_argument('--rounds', type=int, default=300, help='Rounds per game')
+    args = parser.parse_args()
+    check_early_stop(args.games, args.rounds)
+    check_paired_results(args.games, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
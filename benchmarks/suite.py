@@ -0,0 +1,346 @@
+'''
+Engine benchmark suite with a stored baseline.
+
+Times whole rounds of Game.run_round with stub bots answering inside the engine, the
+game tree transitions (RoundState.proceed, proceed_street and showdown), response
+validation in Player.query_board, game log formatting, and the Python skeleton's Runner
+replaying a recorded message stream. Every case reports the best of several repeats in
+microseconds per operation.
+
+Results can be written as JSON and are compared with a baseline file; the suite exits
+with status 1 when any case is slower than its baseline by more than the threshold.
+
+Usage: python3 benchmarks/suite.py [--output results.json] [--baseline benchmarks/baseline.json]
+                                   [--threshold 0.25] [--update-baseline] [--cases proceed showdown]
+'''
+from contextlib import redirect_stdout
+import argparse
+import platform
+import tempfile
+import random
+import json
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from engine import CheckAction, RoundState, TerminalState, BoardState, Game, Player, NullLog, NUM_BOARDS
+from bench_proceed import record_rounds, random_actions
+import bench_runner
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+class StubPlayer(Player):
+    '''
+    Answers the engine's queries in process with random legal actions, without a pokerbot.
+    '''
+
+    def __init__(self, name, seed, output_dir='.'):
+        super().__init__(name, '.', output_dir)
+        self.rng = random.Random(seed)
+
+    def query(self, round_state, player_message, game_log):
+        del player_message[1:]  # the message is consumed as it would be by a socket
+        if isinstance(round_state, TerminalState):
+            return [CheckAction()] * NUM_BOARDS
+        return random_actions(round_state, self.rng)
+
+
+def best_time(function, repeats):
+    '''
+    Returns the fastest of several timed calls of a function returning its operation count, with that count.
+    '''
+    best = None
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        ops = function()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best, ops
+
+
+def collect_calls(rounds, cls, name):
+    '''
+    Replays the recorded rounds and returns the arguments of every call to one method, with its instance first.
+    '''
+    calls = []
+    original = getattr(cls, name)
+
+    def recording(self, *args):
+        calls.append((self,) + args)
+        return original(self, *args)
+    setattr(cls, name, recording)
+    try:
+        for initial_state, history in rounds:
+            round_state = initial_state
+            for actions in history:
+                round_state = round_state.proceed(actions)
+    finally:
+        setattr(cls, name, original)
+    return calls
+
+
+def round_transitions(rounds):
+    '''
+    Returns, for every recorded round, the list of (round state, actions) transitions and the terminal state.
+    '''
+    transitions = []
+    for initial_state, history in rounds:
+        round_state = initial_state
+        steps = []
+        for actions in history:
+            steps.append((round_state, actions))
+            round_state = round_state.proceed(actions)
+        transitions.append((steps, round_state))
+    return transitions
+
+
+def bench_run_round(args):
+    '''
+    Rounds played through Game.run_round, including writing the game log.
+    '''
+    with tempfile.TemporaryDirectory() as output_dir:
+        game = Game([('A', '.'), ('B', '.')], output_dir)
+        players = [StubPlayer('A', args.seed, output_dir), StubPlayer('B', args.seed + 1, output_dir)]
+        rng = random.Random(args.seed)
+        deal_seeds = [rng.getrandbits(64) for _ in range(args.rounds)]
+
+        def run():
+            seats = players
+            for deal_seed in deal_seeds:
+                game.run_round(seats, deal_seed)
+                seats = seats[::-1]
+            game.log.flush()
+            return len(deal_seeds)
+        try:
+            return best_time(run, args.repeats)
+        finally:
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                game.close()
+
+
+def bench_proceed(args, rounds):
+    '''
+    RoundState.proceed calls replaying recorded rounds.
+    '''
+    def run():
+        proceeds = 0
+        for initial_state, history in rounds:
+            round_state = initial_state
+            for actions in history:
+                round_state = round_state.proceed(actions)
+            proceeds += len(history)
+        return proceeds
+    return best_time(run, args.repeats)
+
+
+def bench_proceed_street(args, rounds):
+    '''
+    RoundState.proceed_street calls on the states which ended each street, including the showdowns they lead to.
+    '''
+    calls = collect_calls(rounds, RoundState, 'proceed_street')
+    proceed_street = RoundState.proceed_street
+
+    def run():
+        for (round_state,) in calls:
+            proceed_street(round_state)
+        return len(calls)
+    return best_time(run, args.repeats)
+
+
+def bench_showdown(args, rounds):
+    '''
+    RoundState.showdown calls, scoring every live board of a round with eval7.
+    '''
+    calls = collect_calls(rounds, RoundState, 'showdown')
+    showdown = RoundState.showdown
+
+    def run():
+        for (round_state,) in calls:
+            showdown(round_state)
+        return len(calls)
+    return best_time(run, args.repeats)
+
+
+def logging_game():
+    '''
+    Returns a game which formats its log lines and player messages without writing them, and its two players.
+    '''
+    game = Game.__new__(Game)
+    game.log = NullLog()
+    game.player_messages = [[], []]
+    game.pending_messages = {}
+    return game, [Player('A', '.'), Player('B', '.')]
+
+
+def bench_query_board(args, rounds):
+    '''
+    Player.query_board calls checking each recorded action as the pokerbot would have encoded it.
+    '''
+    game, (player, _) = logging_game()
+    calls = []
+    for steps, _ in round_transitions(rounds):
+        for round_state, actions in steps:
+            active = round_state.button % 2
+            for i in range(NUM_BOARDS):
+                if isinstance(round_state.board_states[i], BoardState):
+                    clause = game.log_board_action('A', actions[i], False, i+1)
+                    calls.append((round_state.board_states[i], clause, active, round_state.stacks))
+
+    def run():
+        for board_state, clause, active, stacks in calls:
+            player.query_board(board_state, clause, game.log, active, stacks)
+        return len(calls)
+    return best_time(run, args.repeats)
+
+
+def bench_log_round_state(args, rounds):
+    '''
+    Game.log_round_state calls on every state a pokerbot was queried on.
+    '''
+    game, players = logging_game()
+    transitions = round_transitions(rounds)
+
+    def run():
+        ops = 0
+        for steps, _ in transitions:
+            for round_state, _ in steps:
+                game.log_round_state(players, round_state)
+            ops += len(steps)
+        return ops
+    return best_time(run, args.repeats)
+
+
+def bench_log_actions(args, rounds):
+    '''
+    Game.log_actions calls on every recorded set of actions.
+    '''
+    game, players = logging_game()
+    calls = []
+    for steps, _ in round_transitions(rounds):
+        round_calls = []
+        for round_state, actions in steps:
+            bet_overrides = [(board_state.pips == (0, 0)) if isinstance(board_state, BoardState) else None for board_state in round_state.board_states]
+            round_calls.append((players[round_state.button % 2].name, actions, bet_overrides, round_state.button % 2))
+        calls.append(round_calls)
+
+    def run():
+        ops = 0
+        for round_calls in calls:
+            game.player_messages = [[], []]
+            for call in round_calls:
+                game.log_actions(*call)
+            ops += len(round_calls)
+        return ops
+    return best_time(run, args.repeats)
+
+
+def bench_log_terminal_state(args, rounds):
+    '''
+    Game.log_terminal_state calls on every recorded round's terminal state.
+    '''
+    game, players = logging_game()
+    terminal_states = [terminal_state for _, terminal_state in round_transitions(rounds)]
+
+    def run():
+        for terminal_state in terminal_states:
+            game.player_messages = [[], []]
+            game.log_terminal_state(players, terminal_state)
+        return len(terminal_states)
+    return best_time(run, args.repeats)
+
+
+def bench_skeleton_runner(args):
+    '''
+    Messages of a recorded game parsed and answered by the Python skeleton's Runner and player.
+    '''
+    stream = bench_runner.record_stream(args.seed)
+
+    def run():
+        bench_runner.Runner(bench_runner.Player(), bench_runner.ReplayFile(stream)).run()
+        return stream.count(b'\n')
+    return best_time(run, args.repeats)
+
+
+CASES = {
+    'run_round': lambda args, rounds: bench_run_round(args),
+    'proceed': bench_proceed,
+    'proceed_street': bench_proceed_street,
+    'showdown': bench_showdown,
+    'query_board': bench_query_board,
+    'log_round_state': bench_log_round_state,
+    'log_actions': bench_log_actions,
+    'log_terminal_state': bench_log_terminal_state,
+    'skeleton_runner': lambda args, rounds: bench_skeleton_runner(args),
+}
+
+
+def run_suite(args):
+    '''
+    Runs the selected cases and returns the results as a JSON-serializable dict.
+    '''
+    rounds = record_rounds(args.rounds, args.seed)
+    cases = {}
+    for name in args.cases:
+        elapsed, ops = CASES[name](args, rounds)
+        cases[name] = {'ops': ops, 'seconds': elapsed, 'us_per_op': elapsed / ops * 1e6, 'ops_per_sec': ops / elapsed}
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'platform': platform.platform(),
+            'rounds': args.rounds, 'repeats': args.repeats, 'seed': args.seed, 'cases': cases}
+
+
+def compare(results, baseline, threshold):
+    '''
+    Prints each case against the baseline and returns the names of the cases slower than it by more than the threshold.
+    '''
+    regressions = []
+    print('{:<20}  {:>10}  {:>12}  {:>10}  {:>8}'.format('case', 'us/op', 'ops/s', 'baseline', 'change'))
+    for name, case in results['cases'].items():
+        base = baseline['cases'].get(name) if baseline is not None else None
+        if base is None:
+            print('{:<20}  {:>10.3f}  {:>12.0f}  {:>10}  {:>8}'.format(name, case['us_per_op'], case['ops_per_sec'], '-', '-'))
+            continue
+        change = case['us_per_op'] / base['us_per_op'] - 1
+        flag = '  REGRESSION' if change > threshold else ''
+        if flag:
+            regressions.append(name)
+        print('{:<20}  {:>10.3f}  {:>12.0f}  {:>10.3f}  {:>+7.1%}{}'.format(name, case['us_per_op'], case['ops_per_sec'], base['us_per_op'], change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/suite.py')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES), help='Cases to run, defaults to all')
+    parser.add_argument('--rounds', type=int, default=1000, help='Rounds recorded for each case')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repeats per case, best is reported')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the recorded deals and actions')
+    parser.add_argument('--output', type=str, default=None, help='Write the results to this JSON file')
+    parser.add_argument('--baseline', type=str, default=BASELINE, help='Baseline JSON file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Fail when a case is slower than its baseline by more than this fraction')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline instead of comparing')
+    args = parser.parse_args()
+    results = run_suite(args)
+    if args.output is not None:
+        with open(args.output, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+        compare(results, None, args.threshold)
+        print('Baseline written to', args.baseline)
+        return
+    baseline = None
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as json_file:
+            baseline = json.load(json_file)
+    else:
+        print('No baseline at', args.baseline)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print('{} case(s) regressed by more than {:.0%}: {}'.format(len(regressions), args.threshold, ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
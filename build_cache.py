@@ -0,0 +1,163 @@
+'''
+Content-addressed cache of pokerbot builds.
+
+A build is keyed on the SHA-256 of the build command and of every source file in the
+pokerbot's directory. Files which a build creates or modifies are its artifacts: they are
+left out of the key, and copies of them are kept in the cache. A pokerbot whose sources
+and build command are unchanged skips its build, with any missing or modified artifacts
+restored from the cache, and concurrent engines building the same directory take turns
+through a file lock, so all but the first find the build cached.
+
+Layout of the cache directory:
+    builds/<key>/manifest.json    the build command and the digest of each artifact
+    builds/<key>/files/...        copies of the artifacts
+    dirs/<id>.json                the artifacts recorded for one pokerbot directory
+    dirs/<id>.lock                the lock held while that directory is checked or built
+'''
+from contextlib import contextmanager
+import tempfile
+import hashlib
+import shutil
+import fcntl
+import json
+import os
+
+IGNORED_NAMES = {'.git', '__pycache__'}
+IGNORED_SUFFIXES = ('.pyc',)
+
+
+def source_files(path):
+    '''
+    Returns the paths of the files in a pokerbot directory, relative to it and sorted.
+    '''
+    names = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [name for name in dirs if name not in IGNORED_NAMES]
+        for name in files:
+            if name not in IGNORED_NAMES and not name.endswith(IGNORED_SUFFIXES):
+                names.append(os.path.relpath(os.path.join(root, name), path))
+    return sorted(names)
+
+
+def file_digest(name):
+    '''
+    Returns the SHA-256 of a file's contents.
+    '''
+    digest = hashlib.sha256()
+    with open(name, 'rb') as data_file:
+        for chunk in iter(lambda: data_file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot(path):
+    '''
+    Returns the size and modification time of every file in a pokerbot directory.
+    '''
+    stats = {}
+    for relpath in source_files(path):
+        stat = os.stat(os.path.join(path, relpath))
+        stats[relpath] = (stat.st_size, stat.st_mtime_ns)
+    return stats
+
+
+def write_json(name, data):
+    '''
+    Replaces a JSON file atomically, so concurrent readers never see it half written.
+    '''
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(name), delete=False) as json_file:
+        json.dump(data, json_file, indent=2)
+    os.replace(json_file.name, name)
+
+
+class BuildCache():
+    '''
+    Looks up, restores and stores pokerbot builds in a cache directory.
+    '''
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(os.path.join(self.cache_dir, 'builds'), exist_ok=True)
+        os.makedirs(os.path.join(self.cache_dir, 'dirs'), exist_ok=True)
+
+    def directory_record(self, path):
+        '''
+        Returns the name, without extension, of the files kept for one pokerbot directory.
+        '''
+        directory_id = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, 'dirs', directory_id)
+
+    @contextmanager
+    def lock(self, path):
+        '''
+        Holds the lock of a pokerbot directory, waiting for any other engine checking or building it.
+        '''
+        with open(self.directory_record(path) + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def artifacts(self, path):
+        '''
+        Returns the artifacts recorded by earlier builds of a pokerbot directory.
+        '''
+        try:
+            with open(self.directory_record(path) + '.json', 'r') as json_file:
+                return set(json.load(json_file))
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return set()
+
+    def key(self, path, command, artifacts):
+        '''
+        Hashes the build command and every file of a pokerbot directory except its artifacts.
+        '''
+        digest = hashlib.sha256(json.dumps(command).encode())
+        for relpath in source_files(path):
+            if relpath not in artifacts:
+                digest.update('{}\0{}\0'.format(relpath, file_digest(os.path.join(path, relpath))).encode())
+        return digest.hexdigest()
+
+    def restore(self, path, command):
+        '''
+        Returns True when the build of a pokerbot directory is cached, after restoring its artifacts.
+        '''
+        key = self.key(path, command, self.artifacts(path))
+        build_dir = os.path.join(self.cache_dir, 'builds', key)
+        try:
+            with open(os.path.join(build_dir, 'manifest.json'), 'r') as json_file:
+                manifest = json.load(json_file)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return False
+        for relpath, digest in manifest['artifacts'].items():
+            target = os.path.join(path, relpath)
+            if not os.path.isfile(target) or file_digest(target) != digest:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(os.path.join(build_dir, 'files', relpath), target)
+        return True
+
+    def store(self, path, command, before):
+        '''
+        Records a successful build, given the snapshot of the pokerbot directory taken before it.
+        '''
+        after = snapshot(path)
+        artifacts = self.artifacts(path) | {relpath for relpath, stat in after.items() if before.get(relpath) != stat}
+        key = self.key(path, command, artifacts)
+        build_dir = os.path.join(self.cache_dir, 'builds', key)
+        if not os.path.isdir(build_dir):
+            staging_dir = tempfile.mkdtemp(dir=os.path.join(self.cache_dir, 'builds'))
+            digests = {}
+            for relpath in sorted(artifacts):
+                source = os.path.join(path, relpath)
+                if os.path.isfile(source):
+                    target = os.path.join(staging_dir, 'files', relpath)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copy2(source, target)
+                    digests[relpath] = file_digest(target)
+            write_json(os.path.join(staging_dir, 'manifest.json'), {'command': command, 'artifacts': digests})
+            try:
+                os.rename(staging_dir, build_dir)
+            except OSError:  # another directory with the same sources stored it first
+                shutil.rmtree(staging_dir, ignore_errors=True)
+        write_json(self.directory_record(path) + '.json', sorted(artifacts))
@@ -1,5 +1,6 @@
 # PARAMETERS TO CONTROL THE BEHAVIOR OF THE GAME ENGINE
 # DO NOT REMOVE OR RENAME THIS FILE
+# THESE ARE ALSO THE DEFAULT SETTINGS OF engine.MatchConfig
 PLAYER_1_NAME = 'A'
 PLAYER_1_PATH = './python_skeleton'
 # NO TRAILING SLASHES ARE ALLOWED IN PATHS
@@ -7,13 +8,42 @@ PLAYER_2_NAME = 'B'
 PLAYER_2_PATH = './python_skeleton'
 # GAME PROGRESS IS RECORDED HERE
 GAME_LOG_FILENAME = 'gamelog'
-# PLAYER_LOG_SIZE_LIMIT IS IN BYTES
+# THE GAME LOG CAN BE COMPRESSED AS IT IS WRITTEN: None, 'gzip', 'bz2' OR 'xz'
+GAME_LOG_COMPRESSION = None
+# ALSO WRITE A BINARY HAND HISTORY AND ITS ROUND INDEX, SEE hand_history.py
+HAND_HISTORY = False
+# PER-PLAYER QUERY LATENCY PERCENTILES ARE WRITTEN HERE AS JSON
+LATENCY_FILENAME = 'latency'
+# PLAYER_LOG_SIZE_LIMIT IS IN BYTES, OUTPUT PAST IT IS DROPPED AND COUNTED AT THE END OF THE PLAYER LOG
 PLAYER_LOG_SIZE_LIMIT = 524288
 # STARTING_GAME_CLOCK AND TIMEOUTS ARE IN SECONDS
 ENFORCE_GAME_CLOCK = True
 STARTING_GAME_CLOCK = 30.
 BUILD_TIMEOUT = 10.
 CONNECT_TIMEOUT = 10.
+# SET TO A DIRECTORY, SUCH AS '.build_cache', TO REUSE BUILDS OF UNCHANGED POKERBOTS; None BUILDS EVERY TIME
+BUILD_CACHE_DIR = None
+# 'unix' ALSO OFFERS BOTS A UNIX DOMAIN SOCKET, WITH TCP AS THE FALLBACK; 'tcp' USES TCP ONLY
+BOT_TRANSPORT = 'tcp'
+# 'binary' OFFERS BOTS A LENGTH-PREFIXED BINARY MESSAGE FORMAT WHEN THEY CONNECT, BOTS WHICH DECLINE IT USE 'text'
+BOT_PROTOCOL = 'text'
+# SEND THE END OF EACH ROUND WITH THE NEXT ROUND'S FIRST MESSAGE INSTEAD OF WAITING FOR BOTH BOTS TO ACK IT
+BUNDLE_ROUND_OVER = False
+# DEALS ARE SHUFFLED FROM THIS SEED AND EACH DEAL'S SEED IS LOGGED, None SHUFFLES RANDOMLY
+DEAL_SEED = None
+# PLAY EVERY DEAL TWICE WITH THE SEATS SWAPPED AND LOG THE PAIRED RESULT, SEEDED RANDOMLY IF DEAL_SEED IS None
+DUPLICATE_DEALS = False
+# STOP A GAME EARLY: None PLAYS EVERY ROUND, 'decided' STOPS ONCE THE LEAD CAN NOT BE OVERTURNED,
+# 'sprt' STOPS ONCE A SEQUENTIAL TEST FINDS ONE PLAYER BETTER BY SPRT_DELTA CHIPS PER ROUND
+EARLY_STOP = None
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+SPRT_DELTA = 5.
+SPRT_MIN_ROUNDS = 50
+# KEEP EVERY INTERMEDIATE ENGINE STATE IN MEMORY, FOR DEBUGGING ONLY
+STATE_HISTORY = False
+# PYTHON SKELETON BOTS CAN RUN INSIDE THE ENGINE PROCESS INSTEAD OF OVER A SOCKET
+IN_PROCESS_BOTS = False
 # THE GAME VARIANT FIXES THE PARAMETERS BELOW
 # CHANGE ONLY FOR TRAINING OR EXPERIMENTATION
 NUM_BOARDS = 3
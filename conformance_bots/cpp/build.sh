@@ -0,0 +1,7 @@
+#!/bin/bash
+
+mkdir -p build
+cd build
+cmake -DCMAKE_BUILD_TYPE=Debug ..
+make
+cd ..
@@ -0,0 +1,56 @@
+#include <skeleton/actions.h>
+#include <skeleton/constants.h>
+#include <skeleton/runner.h>
+#include <skeleton/states.h>
+
+using namespace pokerbots::skeleton;
+
+// Deterministic pokerbot for protocol_conformance.py, following the same rule
+// as conformance_bots/python/player.py: it raises on at most one board where
+// the round, street and board number allow it, sometimes past the maximum,
+// and folds on some others.
+struct Bot {
+  void handleNewRound(GameInfoPtr gameState, RoundStatePtr roundState,
+                      int active) {}
+  void handleRoundOver(GameInfoPtr gameState, TerminalStatePtr terminalState,
+                       int active) {}
+  std::vector<Action> getActions(GameInfoPtr gameState,
+                                 RoundStatePtr roundState, int active) {
+    auto legalActions = roundState->legalActions();
+    auto myCards = roundState->hands[active];
+    std::vector<Action> myActions;
+    bool raised = false;
+    for (int i = 0; i < NUM_BOARDS; ++i) {
+      auto &legal = legalActions[i];
+      int turn = gameState->roundNum + roundState->street + i;
+      if (legal.find(Action::Type::ASSIGN) != legal.end()) {
+        myActions.emplace_back(
+            Action::Type::ASSIGN,
+            std::array<Card, 2>{myCards[2 * i], myCards[2 * i + 1]});
+      } else if (legal.find(Action::Type::RAISE) != legal.end() && !raised &&
+                 turn % 3 == 0) {
+        auto boardState =
+            std::dynamic_pointer_cast<const BoardState>(roundState->boardStates[i]);
+        auto bounds = boardState->raiseBounds(roundState->button, roundState->stacks);
+        myActions.emplace_back(Action::Type::RAISE, gameState->roundNum % 7 == 0
+                                                        ? bounds[1] + 100
+                                                        : bounds[0]);
+        raised = true;
+      } else if (legal.find(Action::Type::FOLD) != legal.end() &&
+                 turn % 4 == 0) {
+        myActions.emplace_back(Action::Type::FOLD);
+      } else if (legal.find(Action::Type::CHECK) != legal.end()) {
+        myActions.emplace_back(Action::Type::CHECK);
+      } else {
+        myActions.emplace_back(Action::Type::CALL);
+      }
+    }
+    return myActions;
+  }
+};
+
+int main(int argc, char *argv[]) {
+  auto [host, port] = parseArgs(argc, argv);
+  runBot<Bot>(host, port);
+  return 0;
+}
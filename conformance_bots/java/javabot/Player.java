@@ -0,0 +1,68 @@
+package javabot;
+
+import javabot.skeleton.Action;
+import javabot.skeleton.ActionType;
+import javabot.skeleton.GameState;
+import javabot.skeleton.State;
+import javabot.skeleton.TerminalState;
+import javabot.skeleton.BoardState;
+import javabot.skeleton.RoundState;
+import javabot.skeleton.Bot;
+import javabot.skeleton.Runner;
+
+import java.util.List;
+import java.util.Arrays;
+import java.util.ArrayList;
+import java.util.Set;
+
+/**
+ * Deterministic pokerbot for protocol_conformance.py, following the same rule as
+ * conformance_bots/python/player.py.
+ */
+public class Player implements Bot {
+
+    public void handleNewRound(GameState gameState, RoundState roundState, int active) {
+    }
+
+    public void handleRoundOver(GameState gameState, TerminalState terminalState, int active) {
+    }
+
+    /**
+     * Raises on at most one board where the round, street and board number allow it, and folds on some others.
+     */
+    public List<Action> getActions(GameState gameState, RoundState roundState, int active) {
+        List<Set<ActionType>> legalActions = roundState.legalActions();
+        List<String> myCards = roundState.hands.get(active);
+        List<Action> myActions = new ArrayList<Action>();
+        boolean raised = false;
+        for (int i = 0; i < State.NUM_BOARDS; i++) {
+            Set<ActionType> legalBoardActions = legalActions.get(i);
+            int turn = gameState.roundNum + roundState.street + i;
+            if (legalBoardActions.contains(ActionType.ASSIGN_ACTION_TYPE)) {
+                myActions.add(new Action(ActionType.ASSIGN_ACTION_TYPE, Arrays.asList(myCards.get(2*i), myCards.get(2*i + 1))));
+            } else if (legalBoardActions.contains(ActionType.RAISE_ACTION_TYPE) && !raised && turn % 3 == 0) {
+                BoardState boardState = (BoardState)roundState.boardStates.get(i);
+                List<Integer> bounds = boardState.raiseBounds(roundState.button, roundState.stacks);
+                myActions.add(new Action(ActionType.RAISE_ACTION_TYPE, gameState.roundNum % 7 == 0 ? bounds.get(1) + 100 : bounds.get(0)));
+                raised = true;
+            } else if (legalBoardActions.contains(ActionType.FOLD_ACTION_TYPE) && turn % 4 == 0) {
+                myActions.add(new Action(ActionType.FOLD_ACTION_TYPE));
+            } else if (legalBoardActions.contains(ActionType.CHECK_ACTION_TYPE)) {
+                myActions.add(new Action(ActionType.CHECK_ACTION_TYPE));
+            } else {
+                myActions.add(new Action(ActionType.CALL_ACTION_TYPE));
+            }
+        }
+        return myActions;
+    }
+
+    /**
+     * Main program for running a Java pokerbot.
+     */
+    public static void main(String[] args) {
+        Player player = new Player();
+        Runner runner = new Runner();
+        runner.parseArgs(args);
+        runner.runBot(player);
+    }
+}
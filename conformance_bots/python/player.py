@@ -0,0 +1,57 @@
+'''
+Deterministic pokerbot for protocol_conformance.py, written in Python.
+
+It raises and folds as well as checking and calling, so a conformance check exercises every
+action code, and it decides from the round state alone, so it plays the same game over either
+protocol. Every few rounds it raises past the maximum on purpose, so that the engine corrects
+it and the raise amount no longer fits in one byte. The C++ and Java bots beside it follow
+the same rule.
+'''
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'python_skeleton'))
+from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction, AssignAction
+from skeleton.states import BoardState, NUM_BOARDS
+from skeleton.bot import Bot
+from skeleton.runner import parse_args, run_bot
+
+
+class Player(Bot):
+    '''
+    A pokerbot which raises and folds on a fixed schedule.
+    '''
+
+    def handle_new_round(self, game_state, round_state, active):
+        pass
+
+    def handle_round_over(self, game_state, terminal_state, active):
+        pass
+
+    def get_actions(self, game_state, round_state, active):
+        '''
+        Raises on at most one board where the round, street and board number allow it, and folds on some others.
+        '''
+        legal_actions = round_state.legal_actions()
+        my_cards = round_state.hands[active]
+        my_actions = [None] * NUM_BOARDS
+        raised = False
+        for i in range(NUM_BOARDS):
+            turn = game_state.round_num + round_state.street + i
+            if AssignAction in legal_actions[i]:
+                my_actions[i] = AssignAction([my_cards[2*i], my_cards[2*i+1]])
+            elif RaiseAction in legal_actions[i] and not raised and turn % 3 == 0:
+                min_raise, max_raise = round_state.board_states[i].raise_bounds(round_state.button, round_state.stacks)
+                my_actions[i] = RaiseAction(max_raise + 100 if game_state.round_num % 7 == 0 else min_raise)
+                raised = True
+            elif FoldAction in legal_actions[i] and turn % 4 == 0:
+                my_actions[i] = FoldAction()
+            elif CheckAction in legal_actions[i]:
+                my_actions[i] = CheckAction()
+            else:
+                my_actions[i] = CallAction()
+        return my_actions
+
+
+if __name__ == '__main__':
+    run_bot(Player(), parse_args())
@@ -1,6 +1,8 @@
 #pragma once
 
 #include <charconv>
+#include <cstdint>
+#include <cstdlib>
 #include <iostream>
 #include <optional>
 #include <string>
@@ -8,6 +10,7 @@
 
 #include <boost/algorithm/string.hpp>
 #include <boost/asio/ip/tcp.hpp>
+#include <boost/asio/local/stream_protocol.hpp>
 
 #include <fmt/format.h>
 #include <fmt/ostream.h>
@@ -19,10 +22,171 @@
 
 namespace pokerbots::skeleton {
 
-template <typename BotType> class Runner {
+// the engine may offer the binary protocol, see engine.py for its layout
+inline const std::string PROTOCOL_VERSION = "V1";
+inline constexpr unsigned char UNKNOWN_CARD = 255;
+
+inline Card cardName(unsigned char card) {
+  static const std::string ranks = "23456789TJQKA", suits = "cdhs";
+  if (card >= 52)
+    return "";
+  return {ranks[card / 4], suits[card % 4]};
+}
+
+inline unsigned char cardByte(const Card &card) {
+  static const std::string ranks = "23456789TJQKA", suits = "cdhs";
+  return static_cast<unsigned char>(4 * ranks.find(card[0]) +
+                                    suits.find(card[1]));
+}
+
+template <typename BotType,
+          typename StreamType = boost::asio::ip::tcp::iostream>
+class Runner {
 private:
   BotType pokerbot;
-  boost::asio::ip::tcp::iostream &stream;
+  StreamType &stream;
+  GameInfoPtr gameInfo;
+  StatePtr roundState;
+  int active = 0;
+  bool roundFlag = true;
+
+  void setClock(double gameClock) {
+    gameInfo = std::make_shared<GameInfo>(gameInfo->bankroll,
+                                          gameInfo->oppBankroll, gameClock,
+                                          gameInfo->roundNum);
+  }
+
+  void startRound(const std::vector<Card> &cards) {
+    std::array<std::array<Card, 2 * NUM_BOARDS>, 2> hands;
+    for (int i = 0; i < cards.size(); ++i)
+      hands[active][i] = cards[i];
+
+    std::array<Card, 5> deck;
+    std::array<Pip, 2> pips = {SMALL_BLIND, BIG_BLIND};
+
+    std::array<StatePtr, NUM_BOARDS> boardStates;
+    for (auto i = 0; i < NUM_BOARDS; ++i) {
+      boardStates[i] = std::make_shared<BoardState>(
+          (i + 1) * BIG_BLIND, pips, std::array<std::array<Card, 2>, 2>{},
+          deck, nullptr);
+    }
+
+    std::array<int, 2> stacks = {STARTING_STACK - (SMALL_BLIND * NUM_BOARDS),
+                                 STARTING_STACK - (BIG_BLIND * NUM_BOARDS)};
+    roundState = std::make_shared<RoundState>(
+        -2, 0, std::move(stacks), std::move(hands), boardStates, nullptr);
+
+    if (roundFlag) {
+      pokerbot.handleNewRound(
+          gameInfo, std::static_pointer_cast<const RoundState>(roundState),
+          active);
+      roundFlag = false;
+    }
+  }
+
+  void endRound(int delta, int oppDelta) {
+    std::array<int, 2> deltas;
+    deltas[active] = delta;
+    deltas[1 - active] = oppDelta;
+
+    roundState = std::make_shared<TerminalState>(
+        std::move(deltas),
+        std::static_pointer_cast<const TerminalState>(roundState)
+            ->previousState);
+    gameInfo = std::make_shared<GameInfo>(
+        gameInfo->bankroll + delta, gameInfo->oppBankroll + oppDelta,
+        gameInfo->gameClock, gameInfo->roundNum);
+    pokerbot.handleRoundOver(
+        gameInfo, std::static_pointer_cast<const TerminalState>(roundState),
+        active);
+    gameInfo = std::make_shared<GameInfo>(
+        gameInfo->bankroll, gameInfo->oppBankroll, gameInfo->gameClock,
+        gameInfo->roundNum + 1);
+    roundFlag = true;
+  }
+
+  void newGame() {
+    // a new game against a warm bot
+    gameInfo = std::make_shared<GameInfo>(0, 0, 0.0, 1);
+    roundFlag = true;
+  }
+
+  StatePtr
+  updateBoards(const std::array<std::vector<Card>, NUM_BOARDS> &boards,
+               StatePtr roundState) {
+    std::array<StatePtr, NUM_BOARDS> newBoardStates;
+    for (auto i = 0; i < NUM_BOARDS; ++i) {
+      std::array<Card, 5> revisedDeck;
+      for (auto j = 0; j < boards[i].size(); ++j) {
+        revisedDeck[j] = boards[i][j];
+      }
+
+      if (auto maker = std::dynamic_pointer_cast<const BoardState>(
+              std::static_pointer_cast<const RoundState>(roundState)
+                  ->boardStates[i])) {
+        newBoardStates[i] = std::make_shared<BoardState>(
+            maker->pot, maker->pips, maker->hands, revisedDeck,
+            maker->previousState);
+      } else {
+        auto terminal = std::static_pointer_cast<const TerminalState>(
+            std::static_pointer_cast<const RoundState>(roundState)
+                ->boardStates[i]);
+
+        auto newMaker =
+            std::static_pointer_cast<const BoardState>(terminal->previousState);
+
+        newBoardStates[i] = std::make_shared<TerminalState>(
+            terminal->deltas,
+            std::make_shared<BoardState>(newMaker->pot, newMaker->pips,
+                                         newMaker->hands, revisedDeck,
+                                         newMaker->previousState,
+                                         newMaker->settled));
+      }
+    }
+    auto maker = std::static_pointer_cast<const RoundState>(roundState);
+    return std::make_shared<RoundState>(
+        maker->button, maker->street, maker->stacks, maker->hands,
+        std::move(newBoardStates), maker->previousState);
+  }
+
+  // opponent hands which were not shown are empty
+  StatePtr
+  revealHands(const std::array<std::vector<Card>, NUM_BOARDS> &oppHands,
+              StatePtr roundState) {
+    std::array<StatePtr, NUM_BOARDS> newBoardStates;
+
+    roundState =
+        std::static_pointer_cast<const TerminalState>(roundState)->previousState;
+    for (auto i = 0; i < NUM_BOARDS; ++i) {
+      if (oppHands[i].empty()) {
+        newBoardStates[i] =
+            std::static_pointer_cast<const RoundState>(roundState)
+                ->boardStates[i];
+      } else {
+        auto terminal = std::static_pointer_cast<const TerminalState>(
+            std::static_pointer_cast<const RoundState>(roundState)
+                ->boardStates[i]);
+        auto maker =
+            std::static_pointer_cast<const BoardState>(terminal->previousState);
+
+        auto revisedHands = maker->hands;
+        revisedHands[1 - active] = {oppHands[i][0], oppHands[i][1]};
+        newBoardStates[i] = std::make_shared<TerminalState>(
+            terminal->deltas,
+            std::make_shared<BoardState>(maker->pot, maker->pips, revisedHands,
+                                         maker->deck, maker->previousState,
+                                         maker->settled));
+      }
+    }
+
+    auto maker = std::static_pointer_cast<const RoundState>(roundState);
+    return std::make_shared<TerminalState>(
+        Deltas{0, 0},
+        std::make_shared<RoundState>(maker->button, maker->street,
+                                     maker->stacks, maker->hands,
+                                     std::move(newBoardStates),
+                                     maker->previousState));
+  }
 
   StatePtr parseMultiCode(const std::string &clause, StatePtr roundState,
                           int active) {
@@ -33,81 +197,18 @@ private:
       return s.find(sub) != std::string::npos;
     };
 
-    if (contains(clause, "B")) {
-      std::array<StatePtr, NUM_BOARDS> newBoardStates;
+    if (contains(clause, "B") || contains(clause, "O")) {
+      std::array<std::vector<Card>, NUM_BOARDS> cards;
       for (auto i = 0; i < NUM_BOARDS; ++i) {
         auto leftover = subclauses[i].substr(2);
-
-        std::vector<Card> cards;
-        boost::split(cards, leftover, boost::is_any_of(","));
-
-        std::array<Card, 5> revisedDeck;
-        for (auto j = 0; j < cards.size(); ++j) {
-          revisedDeck[j] = cards[j];
-        }
-
-        if (auto maker = std::dynamic_pointer_cast<const BoardState>(
-                std::static_pointer_cast<const RoundState>(roundState)
-                    ->boardStates[i])) {
-          newBoardStates[i] = std::make_shared<BoardState>(
-              maker->pot, maker->pips, maker->hands, revisedDeck,
-              maker->previousState);
-        } else {
-          auto terminal = std::static_pointer_cast<const TerminalState>(
-              std::static_pointer_cast<const RoundState>(roundState)
-                  ->boardStates[i]);
-
-          auto newMaker = std::static_pointer_cast<const BoardState>(
-              terminal->previousState);
-
-          newBoardStates[i] = std::make_shared<TerminalState>(
-              terminal->deltas,
-              std::make_shared<BoardState>(
-                  newMaker->pot, newMaker->pips, newMaker->hands, revisedDeck,
-                  newMaker->previousState, newMaker->settled));
+        if (!leftover.empty()) {
+          boost::split(cards[i], leftover, boost::is_any_of(","));
         }
       }
-      auto maker = std::static_pointer_cast<const RoundState>(roundState);
-      return std::make_shared<RoundState>(
-          maker->button, maker->street, maker->stacks, maker->hands,
-          std::move(newBoardStates), maker->previousState);
-    } else if (contains(clause, "O")) {
-      std::array<StatePtr, NUM_BOARDS> newBoardStates;
-
-      roundState = std::static_pointer_cast<const TerminalState>(roundState)
-                       ->previousState;
-      for (auto i = 0; i < NUM_BOARDS; ++i) {
-        auto leftover = subclauses[i].substr(2);
-
-        if (leftover.empty()) {
-          newBoardStates[i] =
-              std::static_pointer_cast<const RoundState>(roundState)
-                  ->boardStates[i];
-        } else {
-          std::vector<Card> cards;
-          boost::split(cards, leftover, boost::is_any_of(","));
-          auto terminal = std::static_pointer_cast<const TerminalState>(
-              std::static_pointer_cast<const RoundState>(roundState)
-                  ->boardStates[i]);
-          auto maker = std::static_pointer_cast<const BoardState>(
-              terminal->previousState);
-
-          auto revisedHands = maker->hands;
-          revisedHands[1 - active] = {cards[0], cards[1]};
-          newBoardStates[i] = std::make_shared<TerminalState>(
-              terminal->deltas,
-              std::make_shared<BoardState>(
-                  maker->pot, maker->pips, revisedHands, maker->deck,
-                  maker->previousState, maker->settled));
-        }
+      if (contains(clause, "B")) {
+        return updateBoards(cards, roundState);
       }
-
-      auto maker = std::static_pointer_cast<const RoundState>(roundState);
-      return std::make_shared<TerminalState>(
-          Deltas{0, 0},
-          std::make_shared<RoundState>(
-              maker->button, maker->street, maker->stacks, maker->hands,
-              std::move(newBoardStates), maker->previousState));
+      return revealHands(cards, roundState);
     } else {
       std::array<Action, NUM_BOARDS> actions;
       for (int i = 0; i < subclauses.size(); ++i) {
@@ -166,15 +267,162 @@ private:
     return packet;
   }
 
+  // binary messages are a little-endian uint32 length and the payload
+  template <typename Container> void sendFrame(Container &&actions) {
+    std::string frame(4 + 4 * NUM_BOARDS, '\0');
+    frame[0] = static_cast<char>(4 * NUM_BOARDS);
+    auto record = 4;
+    for (const Action &action : actions) {
+      switch (action.actionType) {
+      case Action::Type::FOLD:
+        frame[record] = 'F';
+        break;
+      case Action::Type::CALL:
+        frame[record] = 'C';
+        break;
+      case Action::Type::CHECK:
+        frame[record] = 'K';
+        break;
+      case Action::Type::RAISE:
+        frame[record] = 'R';
+        frame[record + 1] = static_cast<char>(action.amount & 0xff);
+        frame[record + 2] = static_cast<char>(action.amount >> 8);
+        break;
+      case Action::Type::ASSIGN:
+        frame[record] = 'A';
+        frame[record + 1] = static_cast<char>(cardByte(action.cards[0]));
+        frame[record + 2] = static_cast<char>(cardByte(action.cards[1]));
+        break;
+      }
+      record += 4;
+    }
+    stream.write(frame.data(), frame.size());
+    stream.flush();
+  }
+
+  bool receiveFrame(std::string &frame) {
+    unsigned char header[4];
+    if (!stream.read(reinterpret_cast<char *>(header), 4)) {
+      return false;
+    }
+    std::uint32_t length = header[0] | header[1] << 8 | header[2] << 16 |
+                           static_cast<std::uint32_t>(header[3]) << 24;
+    frame.resize(length);
+    return static_cast<bool>(stream.read(&frame[0], length));
+  }
+
+  // returns false once the game is over
+  bool processFrame(const std::string &frame) {
+    std::size_t i = 0;
+    auto byte = [&]() { return static_cast<unsigned char>(frame[i++]); };
+    auto int32 = [&]() {
+      std::uint32_t value = 0;
+      for (auto shift = 0; shift < 32; shift += 8)
+        value |= static_cast<std::uint32_t>(byte()) << shift;
+      return static_cast<std::int32_t>(value);
+    };
+    auto cards = [&]() {
+      std::vector<Card> cards(byte());
+      for (auto &card : cards)
+        card = cardName(byte());
+      return cards;
+    };
+
+    while (i < frame.size()) {
+      switch (byte()) {
+      case 'T':
+        setClock(int32() / 1000.0);
+        break;
+      case 'P':
+        active = byte();
+        break;
+      case 'H':
+        startRound(cards());
+        break;
+      case 'D': {
+        auto delta = int32();
+        auto oppDelta = int32();
+        endRound(delta, oppDelta);
+        break;
+      }
+      case 'N':
+        newGame();
+        break;
+      case 'Q':
+        return false;
+      case 'B':
+      case 'O': {
+        auto letter = frame[i - 1];
+        std::array<std::vector<Card>, NUM_BOARDS> boardCards;
+        for (auto &board : boardCards)
+          board = cards();
+        roundState = letter == 'B' ? updateBoards(boardCards, roundState)
+                                   : revealHands(boardCards, roundState);
+        break;
+      }
+      case 'A': {
+        std::array<Action, NUM_BOARDS> actions;
+        for (auto &action : actions) {
+          auto letter = byte();
+          auto first = byte();
+          auto second = byte();
+          byte();
+          switch (letter) {
+          case 'F':
+            action = {Action::Type::FOLD};
+            break;
+          case 'C':
+            action = {Action::Type::CALL};
+            break;
+          case 'K':
+            action = {Action::Type::CHECK};
+            break;
+          case 'R':
+            action = {Action::Type::RAISE, first | second << 8};
+            break;
+          default: // 'A'
+            action = {Action::Type::ASSIGN,
+                      std::array<Card, 2>{cardName(first), cardName(second)}};
+            break;
+          }
+        }
+        roundState = std::static_pointer_cast<const RoundState>(roundState)
+                         ->proceed(actions);
+        break;
+      }
+      default:
+        return false;
+      }
+    }
+    return true;
+  }
+
+  void runBinary() {
+    std::string frame;
+    while (receiveFrame(frame) && processFrame(frame)) {
+      if (roundFlag) {
+        std::array<Action, NUM_BOARDS> acks;
+        for (auto j = 0; j < NUM_BOARDS; ++j) {
+          acks[j] = {Action::Type::CHECK};
+        }
+        sendFrame(acks);
+      } else {
+        sendFrame(pokerbot.getActions(
+            gameInfo, std::static_pointer_cast<const RoundState>(roundState),
+            active));
+      }
+    }
+  }
+
 public:
   template <typename... Args>
-  Runner(boost::asio::ip::tcp::iostream &stream, Args... args)
+  Runner(StreamType &stream, Args... args)
       : pokerbot(std::forward<Args>(args)...), stream(stream) {}
 
   ~Runner() { stream.close(); }
 
   void run() {
-    GameInfoPtr gameInfo = std::make_shared<GameInfo>(0, 0, 0.0, 1);
+    gameInfo = std::make_shared<GameInfo>(0, 0, 0.0, 1);
     std::array<StatePtr, NUM_BOARDS> boardStates;
     for (int i = 0; i < NUM_BOARDS; i++) {
       boardStates[i] = std::make_shared<BoardState>(
@@ -182,24 +430,29 @@ public:
           std::array<std::array<std::string, 2>, 2>{}, std::array<Card, 5>{},
           nullptr);
     }
-    StatePtr roundState = std::make_shared<RoundState>(
+    roundState = std::make_shared<RoundState>(
         -2, 0, std::array<int, 2>{0},
         std::array<std::array<Card, 2 * NUM_BOARDS>, 2>{}, boardStates,
         nullptr);
 
-    int active = 0;
-    bool roundFlag = true;
+    active = 0;
+    roundFlag = true;
 
     while (true) {
       auto packets = receive();
 
+      if (packets.size() == 1 && packets[0] == PROTOCOL_VERSION) {
+        // accept the binary protocol and use it from now on
+        stream << PROTOCOL_VERSION << '\n' << std::flush;
+        runBinary();
+        return;
+      }
+
       for (const auto &clause : packets) {
         auto leftovers = clause.substr(1);
         switch (clause[0]) {
         case 'T':
-          gameInfo = std::make_shared<GameInfo>(
-              gameInfo->bankroll, gameInfo->oppBankroll, std::stof(leftovers),
-              gameInfo->roundNum);
+          setClock(std::stof(leftovers));
           break;
         case 'P':
           active = std::stoi(leftovers);
@@ -207,32 +460,7 @@ public:
         case 'H': {
           std::vector<Card> cards;
           boost::split(cards, leftovers, boost::is_any_of(","));
-
-          std::array<std::array<Card, 2 * NUM_BOARDS>, 2> hands;
-          for (int i = 0; i < cards.size(); ++i)
-            hands[active][i] = cards[i];
-
-          std::array<Card, 5> deck;
-          std::array<Pip, 2> pips = {SMALL_BLIND, BIG_BLIND};
-
-          for (auto i = 0; i < NUM_BOARDS; ++i) {
-            boardStates[i] = std::make_shared<BoardState>(
-                (i + 1) * BIG_BLIND, pips, std::array<std::array<Card, 2>, 2>{},
-                deck, nullptr);
-          }
-
-          std::array<int, 2> stacks = {
-              STARTING_STACK - (SMALL_BLIND * NUM_BOARDS),
-              STARTING_STACK - (BIG_BLIND * NUM_BOARDS)};
-          roundState = std::make_shared<RoundState>(
-              -2, 0, std::move(stacks), std::move(hands), boardStates, nullptr);
-
-          if (roundFlag) {
-            pokerbot.handleNewRound(
-                gameInfo,
-                std::static_pointer_cast<const RoundState>(roundState), active);
-            roundFlag = false;
-          }
+          startRound(cards);
           break;
         }
         case 'D': {
@@ -241,28 +469,12 @@ public:
 
           auto delta = std::stoi(subclauses[0].substr(1));
           int oppDelta = std::stoi(subclauses[1].substr(1));
-
-          std::array<int, 2> deltas;
-          deltas[active] = delta;
-          deltas[1 - active] = oppDelta;
-
-          roundState = std::make_shared<TerminalState>(
-              std::move(deltas),
-              std::static_pointer_cast<const TerminalState>(roundState)
-                  ->previousState);
-          gameInfo = std::make_shared<GameInfo>(
-              gameInfo->bankroll + delta, gameInfo->oppBankroll + oppDelta,
-              gameInfo->gameClock, gameInfo->roundNum);
-          pokerbot.handleRoundOver(
-              gameInfo,
-              std::static_pointer_cast<const TerminalState>(roundState),
-              active);
-          gameInfo = std::make_shared<GameInfo>(
-              gameInfo->bankroll, gameInfo->oppBankroll, gameInfo->gameClock,
-              gameInfo->roundNum + 1);
-          roundFlag = true;
+          endRound(delta, oppDelta);
           break;
         }
+        case 'N':
+          newGame();
+          break;
         case 'Q':
           return;
         case '1':
@@ -289,6 +501,19 @@ public:
 
 template <typename BotType, typename... Args>
 void runBot(std::string &host, std::string &port, Args... args) {
+#if defined(BOOST_ASIO_HAS_LOCAL_SOCKETS)
+  // prefer the engine's unix domain socket when it offers one
+  if (const char *path = std::getenv("POKERBOTS_UNIX_SOCKET")) {
+    boost::asio::local::stream_protocol::iostream localStream;
+    localStream.connect(boost::asio::local::stream_protocol::endpoint(path));
+    if (localStream) {
+      auto r = Runner<BotType, boost::asio::local::stream_protocol::iostream>(
+          localStream, std::forward<Args>(args)...);
+      r.run();
+      return;
+    }
+  }
+#endif
   boost::asio::ip::tcp::iostream stream;
   stream.connect(host, port);
   // set TCP_NODELAY on the stream
@@ -3,11 +3,25 @@
 DO NOT REMOVE, RENAME, OR EDIT THIS FILE
 '''
 from collections import namedtuple
-from threading import Thread
-from queue import Queue
+from contextlib import redirect_stdout, redirect_stderr
+import contextlib
+from threading import Thread, Lock
+import importlib.util
+import bisect
+import math
+import traceback
+import random
 import time
+import gzip
+import lzma
+import bz2
+import io
 import json
 import subprocess
+import struct
+import tempfile
+import select
+import shutil
 import socket
 import eval7
 import sys
@@ -15,6 +29,8 @@ import os
 
 sys.path.append(os.getcwd())
 from config import *
+import hand_history
+import build_cache
 
 FoldAction = namedtuple('FoldAction', [])
 CallAction = namedtuple('CallAction', [])
@@ -24,12 +40,21 @@ RaiseAction = namedtuple('RaiseAction', ['amount'])
 AssignAction = namedtuple('AssignAction', ['cards'])
 TerminalState = namedtuple('TerminalState', ['deltas', 'previous_state'])
 
+# legal action sets are shared, so they are frozen
+ASSIGN_ACTIONS = frozenset({AssignAction})
+CHECK_ACTIONS = frozenset({CheckAction})
+CHECK_RAISE_ACTIONS = frozenset({CheckAction, RaiseAction})
+FOLD_CALL_ACTIONS = frozenset({FoldAction, CallAction})
+FOLD_CALL_RAISE_ACTIONS = frozenset({FoldAction, CallAction, RaiseAction})
+
 STREET_NAMES = ['Flop', 'Turn', 'River']
 DECODE = {'F': FoldAction, 'C': CallAction, 'K': CheckAction, 'R': RaiseAction, 'A': AssignAction}
+RECORD_KINDS = {FoldAction: hand_history.FOLD, CallAction: hand_history.CALL, CheckAction: hand_history.CHECK, AssignAction: hand_history.ASSIGN}
 CCARDS = lambda cards: ','.join(map(str, cards))
 PCARDS = lambda cards: '[{}]'.format(' '.join(map(str, cards)))
 PVALUE = lambda name, value: ', {} ({})'.format(name, value)
 STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
+LATENCY_STREETS = {0: 'preflop', 3: 'flop', 4: 'turn', 5: 'river'}
 TABLE_STATUS = lambda players, i: ''.join([PVALUE(p.name, p.table_winnings[i]) for p in players])
 POTVAL = lambda value: ', ({})'.format(value)
 
@@ -45,6 +70,7 @@ POTVAL = lambda value: ', ({})'.format(value)
 # #B**,**,**,**,** the board cards in common format for each board
 # #O**,** the opponent's hand in common format for each board
 # D###;D## the player's, followed by opponent's, bankroll delta from the round
+# N new game, reset the game state of a pokerbot kept running from the previous game
 # Q game over
 #
 # Board clauses are separated by semicolons
@@ -52,7 +78,131 @@ POTVAL = lambda value: ', ({})'.format(value)
 # Messages end with '\n'
 # The engine expects a response of #K for each board at the end of the round as an ack,
 # otherwise a response which encodes the player's action
+# With BUNDLE_ROUND_OVER the #O and D clauses ending a round are not acked, they are sent
+# ahead of the T, P and H clauses starting the next round, and only the last round of a game is acked
 # Action history is sent once, including the player's actions
+#
+# Binary encoding scheme, offered when BOT_PROTOCOL is 'binary':
+#
+# Once a pokerbot connects, the engine sends the message V1 and a pokerbot which accepts
+# answers V1 instead of an ack; pokerbots which do not know the offer ack it and stay on text.
+# Every later message either way is a frame, a little-endian uint32 length and the payload.
+# Cards are single bytes, 4*rank + suit with ranks 23456789TJQKA and suits cdhs, 255 if unknown.
+# A message is the same clauses as in text, each a letter followed by a fixed layout:
+#
+# T int32 the player's game clock in milliseconds
+# P uint8 the player's index
+# H uint8 count, then count cards, the player's hole cards
+# B for each board, uint8 count, then count cards, the board cards
+# O for each board, uint8 count, then count cards, the opponent's hand, count 0 if not shown
+# A for each board, an action record, the actions in the round history
+# D int32 int32 the player's, followed by opponent's, bankroll delta from the round
+# N new game
+# Q game over
+#
+# Action records are 4 bytes: F, C, K, R or A, then for R the amount as a uint16,
+# for A the two cards, and zeros otherwise, and a zero pad byte.
+# The pokerbot's response is a frame of one action record for each board.
+
+PROTOCOL_VERSION = 'V1'
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+CARD_BYTES = {rank + suit: 4*i + j for i, rank in enumerate(RANKS) for j, suit in enumerate(SUITS)}
+BYTE_CARDS = {byte: card for card, byte in CARD_BYTES.items()}
+UNKNOWN_CARD = 255
+FRAME_HEADER = struct.Struct('<I')
+CLOCK_RECORD = struct.Struct('<ci')
+DELTAS_RECORD = struct.Struct('<cii')
+RAISE_RECORD = struct.Struct('<cHx')
+ACTION_RECORD = struct.Struct('<cBBx')
+# bytes of a response which could not be decoded that are quoted in the game log
+RESPONSE_PREVIEW = 64
+
+
+def encode_cards(cards):
+    '''
+    Returns the count and card bytes of a comma separated list of cards.
+    '''
+    card_bytes = bytes(CARD_BYTES[card] for card in cards.split(',')) if cards else b''
+    return bytes((len(card_bytes),)) + card_bytes
+
+
+def encode_action(code):
+    '''
+    Returns the action record of one board's action code, such as R20 or AAs,Kd.
+    '''
+    if code[0] == 'R':
+        return RAISE_RECORD.pack(b'R', int(code[1:]))
+    if code[0] == 'A' and len(code) > 1:
+        first, second = code[1:].split(',')
+        return ACTION_RECORD.pack(b'A', CARD_BYTES[first], CARD_BYTES[second])
+    cards = UNKNOWN_CARD if code[0] == 'A' else 0
+    return ACTION_RECORD.pack(code[0].encode(), cards, cards)
+
+
+def encode_message(message):
+    '''
+    Translates a text message for a pokerbot into a binary frame, clause by clause.
+    '''
+    payload = bytearray()
+    for clause in message.split():
+        letter = clause[0]
+        if letter == 'T':
+            payload += CLOCK_RECORD.pack(b'T', round(float(clause[1:]) * 1000))
+        elif letter == 'P':
+            payload += b'P' + bytes((int(clause[1:]),))
+        elif letter == 'H':
+            payload += b'H' + encode_cards(clause[1:])
+        elif letter == 'D':
+            delta, opp_delta = clause.split(';')
+            payload += DELTAS_RECORD.pack(b'D', int(delta[1:]), int(opp_delta[1:]))
+        elif letter in 'NQ':
+            payload += letter.encode()
+        else:  # board clauses, 1*;2*;3*
+            subclauses = clause.split(';')
+            code = subclauses[0][1]
+            if code in 'BO':
+                payload += code.encode() + b''.join(encode_cards(subclause[2:]) for subclause in subclauses)
+            else:
+                payload += b'A' + b''.join(encode_action(subclause[1:]) for subclause in subclauses)
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def decode_response(payload):
+    '''
+    Translates a pokerbot's binary response into the text clauses it stands for.
+
+    Raises ValueError if the response is not one action record for each board.
+    '''
+    if len(payload) != ACTION_RECORD.size * NUM_BOARDS:
+        raise ValueError('expected {} action records'.format(NUM_BOARDS))
+    codes = []
+    for i in range(NUM_BOARDS):
+        letter, first, second = ACTION_RECORD.unpack_from(payload, i * ACTION_RECORD.size)
+        if letter == b'R':
+            code = 'R' + str(RAISE_RECORD.unpack_from(payload, i * ACTION_RECORD.size)[1])
+        elif letter == b'A':
+            if first not in BYTE_CARDS or second not in BYTE_CARDS:
+                raise ValueError('unknown card')
+            code = 'A' + BYTE_CARDS[first] + ',' + BYTE_CARDS[second]
+        elif letter in (b'F', b'C', b'K'):
+            code = letter.decode()
+        else:
+            raise ValueError('unknown action ' + repr(letter))
+        codes.append(str(i+1) + code)
+    return ';'.join(codes)
+
+
+def decode_line(data):
+    '''
+    Decodes one line of text from a pokerbot.
+
+    Raises ValueError quoting the start of the line if it is not valid text.
+    '''
+    try:
+        return data.decode()
+    except UnicodeDecodeError:
+        raise ValueError(repr(bytes(data[:RESPONSE_PREVIEW]))) from None
 
 
 class SmallDeck(eval7.Deck):
@@ -63,16 +213,38 @@ class SmallDeck(eval7.Deck):
         self.cards = [eval7.Card(str(card)) for card in existing_deck.cards]
 
 
-class BoardState(namedtuple('_BoardState', ['pot', 'pips', 'hands', 'deck', 'previous_state', 'settled', 'reveal'], defaults=[False, True])):
+class BoardState():
     '''
     Encodes the game tree for one board within a round.
+
+    Pips are a tuple indexed by player. A state only links to the state it came from when
+    STATE_HISTORY is set, except that terminal states always keep the state they ended on.
+    The last legal actions and raise bounds are kept with the active player and stacks they were computed for.
     '''
+    __slots__ = ['pot', 'pips', 'hands', 'deck', 'previous_state', 'settled', 'reveal', 'legal_memo', 'bounds_memo']
+
+    def __init__(self, pot, pips, hands, deck, previous_state, settled=False, reveal=True):
+        self.pot = pot
+        self.pips = pips
+        self.hands = hands
+        self.deck = deck
+        self.previous_state = previous_state
+        self.settled = settled
+        self.reveal = reveal
+        self.legal_memo = None
+        self.bounds_memo = None
+
+    def __repr__(self):
+        return 'BoardState(pot={}, pips={}, hands={}, settled={}, reveal={})'.format(self.pot, self.pips, self.hands, self.settled, self.reveal)
+
     def showdown(self):
         '''
         Compares the players' hands and computes payoffs.
         '''
-        score0 = eval7.evaluate(self.deck.peek(5) + self.hands[0])
-        score1 = eval7.evaluate(self.deck.peek(5) + self.hands[1])
+        # eval7 scores a couple of hands faster than a NumPy batch can be set up
+        board = self.deck.peek(5)
+        score0 = eval7.evaluate(board + self.hands[0])
+        score1 = eval7.evaluate(board + self.hands[1])
         if score0 > score1:
             winnings = [self.pot, 0]
         elif score0 < score1:
@@ -83,74 +255,97 @@ class BoardState(namedtuple('_BoardState', ['pot', 'pips', 'hands', 'deck', 'pre
 
     def legal_actions(self, button, stacks):
         '''
-        Returns a set which corresponds to the active player's legal moves on this board.
+        Returns a frozenset which corresponds to the active player's legal moves on this board.
         '''
         active = button % 2
+        key = (active, stacks[0], stacks[1])
+        if self.legal_memo is not None and self.legal_memo[0] == key:
+            return self.legal_memo[1]
         if (self.hands is None) or (len(self.hands[active]) == 0):
-            return {AssignAction}
+            legal_actions = ASSIGN_ACTIONS
         elif self.settled:
-            return {CheckAction}
-        # board being played on
-        continue_cost = self.pips[1-active] - self.pips[active]
-        if continue_cost == 0:
-            # we can only raise the stakes if both players can afford it
-            bets_forbidden = (stacks[0] == 0 or stacks[1] == 0)
-            return {CheckAction} if bets_forbidden else {CheckAction, RaiseAction}
-        # continue_cost > 0
-        # similarly, re-raising is only allowed if both players can afford it
-        raises_forbidden = (continue_cost == stacks[active] or stacks[1-active] == 0)
-        return {FoldAction, CallAction} if raises_forbidden else {FoldAction, CallAction, RaiseAction}
+            legal_actions = CHECK_ACTIONS
+        else:  # board being played on
+            continue_cost = self.pips[1-active] - self.pips[active]
+            if continue_cost == 0:
+                # we can only raise the stakes if both players can afford it
+                bets_forbidden = (stacks[0] == 0 or stacks[1] == 0)
+                legal_actions = CHECK_ACTIONS if bets_forbidden else CHECK_RAISE_ACTIONS
+            else:  # continue_cost > 0
+                # similarly, re-raising is only allowed if both players can afford it
+                raises_forbidden = (continue_cost == stacks[active] or stacks[1-active] == 0)
+                legal_actions = FOLD_CALL_ACTIONS if raises_forbidden else FOLD_CALL_RAISE_ACTIONS
+        self.legal_memo = (key, legal_actions)
+        return legal_actions
 
     def raise_bounds(self, button, stacks):
         '''
         Returns a tuple of the minimum and maximum legal raises on this board.
         '''
         active = button % 2
+        key = (active, stacks[0], stacks[1])
+        if self.bounds_memo is not None and self.bounds_memo[0] == key:
+            return self.bounds_memo[1]
         continue_cost = self.pips[1-active] - self.pips[active]
         max_contribution = min(stacks[active], stacks[1-active] + continue_cost)
         min_contribution = min(max_contribution, continue_cost + max(continue_cost, BIG_BLIND))
-        return (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
+        bounds = (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
+        self.bounds_memo = (key, bounds)
+        return bounds
 
     def proceed(self, action, button, street):
         '''
         Advances the game tree by one action performed by the active player on the current board.
         '''
         active = button % 2
+        previous_state = self if STATE_HISTORY else None
         if isinstance(action, AssignAction):
             new_hands = [[]] * 2
             new_hands[active] = action.cards
             if self.hands is not None:
                 opp_hands = self.hands[1-active]
                 new_hands[1-active] = opp_hands
-            return BoardState(self.pot, self.pips, new_hands, self.deck, self)
+            return BoardState(self.pot, self.pips, new_hands, self.deck, previous_state)
         if isinstance(action, FoldAction):
-            new_pot = self.pot + sum(self.pips)
+            new_pot = self.pot + self.pips[0] + self.pips[1]
             winnings = [0, new_pot] if active == 0 else [new_pot, 0]
-            return TerminalState(winnings, BoardState(new_pot, [0, 0], self.hands, self.deck, self, True, False))
+            return TerminalState(winnings, BoardState(new_pot, (0, 0), self.hands, self.deck, previous_state, True, False))
         if isinstance(action, CallAction):
-            if button == 0: # sb calls bb
-                return BoardState(self.pot, [BIG_BLIND] * 2, self.hands, self.deck, self)
+            if button == 0:  # sb calls bb
+                return BoardState(self.pot, (BIG_BLIND, BIG_BLIND), self.hands, self.deck, previous_state)
             # both players acted
-            new_pips = list(self.pips)
-            contribution = new_pips[1-active] - new_pips[active]
-            new_pips[active] += contribution
-            return BoardState(self.pot, new_pips, self.hands, self.deck, self, True)
+            return BoardState(self.pot, (self.pips[1-active],) * 2, self.hands, self.deck, previous_state, True)
         if isinstance(action, CheckAction):
             if (street == 0 and button > 0) or button > 1:  # both players acted
-                return BoardState(self.pot, self.pips, self.hands, self.deck, self, True, self.reveal)
+                return BoardState(self.pot, self.pips, self.hands, self.deck, previous_state, True, self.reveal)
             # let opponent act
-            return BoardState(self.pot, self.pips, self.hands, self.deck, self, self.settled, self.reveal)
+            return BoardState(self.pot, self.pips, self.hands, self.deck, previous_state, self.settled, self.reveal)
         # isinstance(action, RaiseAction)
-        new_pips = list(self.pips)
-        contribution = action.amount - new_pips[active]
-        new_pips[active] += contribution
-        return BoardState(self.pot, new_pips, self.hands, self.deck, self)
+        new_pips = (action.amount, self.pips[1]) if active == 0 else (self.pips[0], action.amount)
+        return BoardState(self.pot, new_pips, self.hands, self.deck, previous_state)
 
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'stacks', 'hands', 'board_states', 'previous_state'])):
+class RoundState():
     '''
     Encodes the game tree for one round of poker.
+
+    Stacks are a tuple indexed by player. As with BoardState, the previous state is only
+    kept when STATE_HISTORY is set. The legal actions are computed once per state.
     '''
+    __slots__ = ['button', 'street', 'stacks', 'hands', 'board_states', 'previous_state', 'legal']
+
+    def __init__(self, button, street, stacks, hands, board_states, previous_state):
+        self.button = button
+        self.street = street
+        self.stacks = stacks
+        self.hands = hands
+        self.board_states = board_states
+        self.previous_state = previous_state
+        self.legal = None
+
+    def __repr__(self):
+        return 'RoundState(button={}, street={}, stacks={}, board_states={})'.format(self.button, self.street, self.stacks, self.board_states)
+
     def showdown(self):
         '''
         Compares the players' hands and computes payoffs.
@@ -162,44 +357,124 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'stacks', 'hands
             net_winnings[1] += board_state.deltas[1]
         end_stacks = [self.stacks[0] + net_winnings[0], self.stacks[1] + net_winnings[1]]
         deltas = [end_stacks[0] - STARTING_STACK, end_stacks[1] - STARTING_STACK]
-        return TerminalState(deltas, RoundState(self.button, self.street, self.stacks, self.hands, terminal_board_states, self))
+        previous_state = self if STATE_HISTORY else None
+        return TerminalState(deltas, RoundState(self.button, self.street, self.stacks, self.hands, terminal_board_states, previous_state))
 
     def legal_actions(self):
         '''
-        Returns a list of sets which correspond to the active player's legal moves on each board.
+        Returns a tuple of frozensets which correspond to the active player's legal moves on each board.
         '''
-        return [board_state.legal_actions(self.button, self.stacks) if isinstance(board_state, BoardState) else {CheckAction} for board_state in self.board_states]
+        if self.legal is None:
+            self.legal = tuple(board_state.legal_actions(self.button, self.stacks) if isinstance(board_state, BoardState) else CHECK_ACTIONS for board_state in self.board_states)
+        return self.legal
 
     def proceed_street(self):
         '''
         Resets the players' pips on each board and advances the game tree to the next round of betting.
         '''
-        new_pots = [0]*NUM_BOARDS
-        for i in range(NUM_BOARDS):
-            if isinstance(self.board_states[i], BoardState):
-                new_pots[i] = self.board_states[i].pot + sum(self.board_states[i].pips)
-        new_board_states = [BoardState(new_pots[i], [0, 0], self.board_states[i].hands, self.board_states[i].deck, self.board_states[i]) if isinstance(self.board_states[i], BoardState) else self.board_states[i] for i in range(NUM_BOARDS)]
-        all_terminal = [isinstance(board_state, TerminalState) for board_state in new_board_states]
-        if self.street == 5 or all(all_terminal):
-            return RoundState(self.button, 5, self.stacks, self.hands, new_board_states, self).showdown()
+        new_board_states = []
+        all_terminal = True
+        for board_state in self.board_states:
+            if isinstance(board_state, BoardState):
+                new_pot = board_state.pot + board_state.pips[0] + board_state.pips[1]
+                previous_state = board_state if STATE_HISTORY else None
+                board_state = BoardState(new_pot, (0, 0), board_state.hands, board_state.deck, previous_state)
+                all_terminal = False
+            new_board_states.append(board_state)
+        previous_state = self if STATE_HISTORY else None
+        if self.street == 5 or all_terminal:
+            return RoundState(self.button, 5, self.stacks, self.hands, new_board_states, previous_state).showdown()
         new_street = 3 if self.street == 0 else self.street + 1
-        return RoundState(1, new_street, self.stacks, self.hands, new_board_states, self)
+        return RoundState(1, new_street, self.stacks, self.hands, new_board_states, previous_state)
 
     def proceed(self, actions):
         '''
         Advances the game tree by one tuple of actions performed by the active player across all boards.
         '''
-        new_board_states = [self.board_states[i].proceed(actions[i], self.button, self.street) if isinstance(self.board_states[i], BoardState) else self.board_states[i] for i in range(NUM_BOARDS)]
         active = self.button % 2
-        new_stacks = list(self.stacks)
+        new_board_states = []
         contribution = 0
-        for i in range(NUM_BOARDS):
-            if isinstance(new_board_states[i], BoardState) and isinstance(self.board_states[i], BoardState):
-                contribution += new_board_states[i].pips[active] - self.board_states[i].pips[active]
-        new_stacks[active] -= contribution
-        settled = [(isinstance(board_state, TerminalState) or board_state.settled) for board_state in new_board_states]
-        state = RoundState(self.button + 1, self.street, new_stacks, self.hands, new_board_states, self)
-        return state.proceed_street() if all(settled) else state
+        all_settled = True
+        for board_state, action in zip(self.board_states, actions):
+            if isinstance(board_state, BoardState):
+                new_board_state = board_state.proceed(action, self.button, self.street)
+                if isinstance(new_board_state, BoardState):
+                    contribution += new_board_state.pips[active] - board_state.pips[active]
+                    all_settled = all_settled and new_board_state.settled
+                new_board_states.append(new_board_state)
+            else:
+                new_board_states.append(board_state)
+        if active == 0:
+            new_stacks = (self.stacks[0] - contribution, self.stacks[1])
+        else:
+            new_stacks = (self.stacks[0], self.stacks[1] - contribution)
+        previous_state = self if STATE_HISTORY else None
+        state = RoundState(self.button + 1, self.street, new_stacks, self.hands, new_board_states, previous_state)
+        return state.proceed_street() if all_settled else state
+
+
+class LatencyHistogram():
+    '''
+    Counts latencies in fixed, log-spaced buckets, from 1 microsecond to 100 seconds.
+
+    Percentiles are reported as the upper edge of the bucket they fall in, at most a factor of
+    10 ** (1/20), about 1.122 or 12.2%, above the true value for latencies of 1 microsecond or
+    more, and never above the largest latency seen.
+    '''
+    # 20 buckets per decade
+    EDGES = [10 ** (exponent / 20) * 1e-6 for exponent in range(8 * 20 + 1)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.EDGES) + 1)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, seconds):
+        '''
+        Records one latency.
+        '''
+        self.counts[bisect.bisect_left(self.EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        '''
+        Returns the latency below which the given fraction of recorded latencies fall.
+        '''
+        rank = math.ceil(fraction * self.count)
+        cumulative = 0
+        for bucket, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and cumulative > 0:
+                return min(self.EDGES[bucket], self.max) if bucket < len(self.EDGES) else self.max
+        return 0.
+
+    def summary(self):
+        '''
+        Returns the count, mean, p50, p95, p99 and max in seconds.
+        '''
+        return {'count': self.count, 'mean': self.total / self.count if self.count else 0.,
+                'p50': self.percentile(0.5), 'p95': self.percentile(0.95), 'p99': self.percentile(0.99), 'max': self.max}
+
+
+# every setting of a match, as in config.py, which gives the defaults; no files are written without an output_dir
+# the game variant, NUM_BOARDS, STARTING_STACK and the blinds, is shared with the skeletons and stays in config.py
+MatchConfig = namedtuple('MatchConfig', ['players', 'output_dir', 'num_rounds', 'starting_game_clock', 'enforce_game_clock',
+                                         'build_timeout', 'connect_timeout', 'build_cache_dir', 'bot_transport', 'bot_protocol',
+                                         'bundle_round_over', 'in_process_bots', 'deal_seed', 'duplicate_deals', 'early_stop',
+                                         'sprt_alpha', 'sprt_beta', 'sprt_delta', 'sprt_min_rounds', 'game_log_filename',
+                                         'game_log_compression', 'hand_history', 'latency_filename', 'player_log_size_limit'],
+                         defaults=[((PLAYER_1_NAME, PLAYER_1_PATH), (PLAYER_2_NAME, PLAYER_2_PATH)), None, NUM_ROUNDS,
+                                   STARTING_GAME_CLOCK, ENFORCE_GAME_CLOCK, BUILD_TIMEOUT, CONNECT_TIMEOUT, BUILD_CACHE_DIR,
+                                   BOT_TRANSPORT, BOT_PROTOCOL, BUNDLE_ROUND_OVER, IN_PROCESS_BOTS, DEAL_SEED, DUPLICATE_DEALS,
+                                   EARLY_STOP, SPRT_ALPHA, SPRT_BETA, SPRT_DELTA, SPRT_MIN_ROUNDS, GAME_LOG_FILENAME,
+                                   GAME_LOG_COMPRESSION, HAND_HISTORY, LATENCY_FILENAME, PLAYER_LOG_SIZE_LIMIT])
+# the outcome of one game, each per-player field in starting seat order; latencies are the summaries written to latency.json
+MatchResult = namedtuple('MatchResult', ['names', 'bankrolls', 'table_winnings', 'rounds', 'stop_reason', 'deal_seed',
+                                         'game_clocks', 'latencies', 'elapsed', 'game_log'])
 
 
 class Player():
@@ -207,20 +482,42 @@ class Player():
     Handles subprocess and socket interactions with one player's pokerbot.
     '''
 
-    def __init__(self, name, path):
+    def __init__(self, name, path, output_dir='.', config=None):
         self.name = name
         self.path = path
-        self.game_clock = STARTING_GAME_CLOCK
+        self.output_dir = output_dir
+        self.config = config if config is not None else MatchConfig()
+        self.game_clock = self.config.starting_game_clock
         self.bankroll = 0
         self.table_winnings = [0] * NUM_BOARDS
         self.commands = None
         self.bot_subprocess = None
         self.socketfile = None
-        self.bytes_queue = Queue()
+        self.log = PlayerLog(limit=self.config.player_log_size_limit)
+        self.log_lock = Lock()
+        self.open_log(output_dir)
+        self.latencies = {}
+        self.new_game = False
 
-    def build(self):
+    def record_latency(self, key, seconds):
+        '''
+        Adds one latency to the named histogram.
+        '''
+        if key not in self.latencies:
+            self.latencies[key] = LatencyHistogram()
+        self.latencies[key].add(seconds)
+
+    def latency_summary(self):
+        '''
+        Returns the summary of every latency histogram, keyed by name.
+        '''
+        return {key: self.latencies[key].summary() for key in sorted(self.latencies)}
+
+    def build(self, run_build=True):
         '''
         Loads the commands file and builds the pokerbot.
+
+        With run_build=False only the commands file is loaded, for pokerbots built ahead of time.
         '''
         try:
             with open(self.path + '/commands.json', 'r') as json_file:
@@ -235,68 +532,148 @@ class Player():
             print(self.name, 'commands.json not found - check PLAYER_PATH')
         except json.decoder.JSONDecodeError:
             print(self.name, 'commands.json misformatted')
-        if self.commands is not None and len(self.commands['build']) > 0:
-            try:
-                proc = subprocess.run(self.commands['build'],
-                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                      cwd=self.path, timeout=BUILD_TIMEOUT, check=False)
-                self.bytes_queue.put(proc.stdout)
-            except subprocess.TimeoutExpired as timeout_expired:
-                error_message = 'Timed out waiting for ' + self.name + ' to build'
-                print(error_message)
-                self.bytes_queue.put(timeout_expired.stdout)
-                self.bytes_queue.put(error_message.encode())
-            except (TypeError, ValueError):
-                print(self.name, 'build command misformatted')
-            except OSError:
-                print(self.name, 'build failed - check "build" in commands.json')
+        if run_build and self.commands is not None and len(self.commands['build']) > 0:
+            if self.config.build_cache_dir is None:
+                self.run_build_command()
+                return
+            cache = build_cache.BuildCache(self.config.build_cache_dir)
+            with cache.lock(self.path):
+                if cache.restore(self.path, self.commands['build']):
+                    print(self.name, 'build is up to date')
+                    return
+                before = build_cache.snapshot(self.path)
+                if self.run_build_command():
+                    cache.store(self.path, self.commands['build'], before)
+
+    def run_build_command(self):
+        '''
+        Runs the build command from the commands file.
+
+        Returns True when the build succeeded.
+        '''
+        try:
+            proc = subprocess.run(self.commands['build'],
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  cwd=self.path, timeout=self.config.build_timeout, check=False)
+            self.log_output(proc.stdout)
+            return proc.returncode == 0
+        except subprocess.TimeoutExpired as timeout_expired:
+            error_message = 'Timed out waiting for ' + self.name + ' to build'
+            print(error_message)
+            self.log_output(timeout_expired.stdout)
+            self.log_output(error_message.encode())
+        except (TypeError, ValueError):
+            print(self.name, 'build command misformatted')
+        except OSError:
+            print(self.name, 'build failed - check "build" in commands.json')
+        return False
 
     def run(self):
         '''
         Runs the pokerbot and establishes the socket connection.
         '''
         if self.commands is not None and len(self.commands['run']) > 0:
+            socket_dir = None
             try:
                 server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                with server_socket:
+                server_sockets = [server_socket]
+                env = None
+                if self.config.bot_transport == 'unix' and hasattr(socket, 'AF_UNIX'):
+                    # skeletons which support it connect to this path, the others fall back to TCP
+                    socket_dir = tempfile.mkdtemp(prefix='pokerbots-')
+                    socket_path = os.path.join(socket_dir, 'engine.sock')
+                    unix_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    server_sockets.append(unix_socket)
+                    unix_socket.bind(socket_path)
+                    unix_socket.listen()
+                    env = dict(os.environ, POKERBOTS_UNIX_SOCKET=socket_path)
+                with contextlib.ExitStack() as server_stack:
+                    for listener in server_sockets:
+                        server_stack.enter_context(listener)
                     server_socket.bind(('', 0))
-                    server_socket.settimeout(CONNECT_TIMEOUT)
                     server_socket.listen()
                     port = server_socket.getsockname()[1]
                     proc = subprocess.Popen(self.commands['run'] + [str(port)],
                                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                            cwd=self.path)
+                                            cwd=self.path, env=env)
                     self.bot_subprocess = proc
-                    # function for bot listening
-                    def enqueue_output(out, queue):
-                        try:
-                            for line in out:
-                                queue.put(line)
-                        except ValueError:
-                            pass
                     # start a separate bot listening thread which dies with the program
-                    Thread(target=enqueue_output, args=(proc.stdout, self.bytes_queue), daemon=True).start()
-                    # block until we timeout or the player connects
-                    client_socket, _ = server_socket.accept()
-                    with client_socket:
-                        client_socket.settimeout(CONNECT_TIMEOUT)
-                        sock = client_socket.makefile('rw')
-                        self.socketfile = sock
-                        print(self.name, 'connected successfully')
+                    Thread(target=self.capture_output, args=(proc.stdout,), daemon=True).start()
+                    # block until we timeout or the player connects over either transport
+                    ready, _, _ = select.select(server_sockets, [], [], self.config.connect_timeout)
+                    if not ready:
+                        raise socket.timeout
+                    client_socket, _ = ready[0].accept()
+                    client_socket.settimeout(self.config.connect_timeout)
+                    self.socketfile = SocketConnection(client_socket)
+                    transport = 'unix' if ready[0] is not server_socket else 'tcp'
+                    print(self.name, 'connected successfully over', transport)
+                    if self.config.bot_protocol == 'binary':
+                        self.negotiate()
             except (TypeError, ValueError):
                 print(self.name, 'run command misformatted')
             except OSError:
                 print(self.name, 'run failed - check "run" in commands.json')
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to connect')
+            finally:
+                if socket_dir is not None:
+                    shutil.rmtree(socket_dir, ignore_errors=True)
+
+    def negotiate(self):
+        '''
+        Offers the pokerbot the binary protocol, which it accepts by answering with the same version.
+        '''
+        try:
+            self.socketfile.write(self.socketfile.encode(PROTOCOL_VERSION + '\n'))
+            if self.socketfile.readline(self.config.connect_timeout).strip() == PROTOCOL_VERSION:
+                self.socketfile = BinaryConnection(self.socketfile)
+                print(self.name, 'accepted the binary protocol')
+        except socket.timeout:
+            print('Timed out waiting for', self.name, 'to answer the binary protocol offer')
+            self.socketfile.close()
+            self.socketfile = None
+
+    def reset(self, output_dir, config=None):
+        '''
+        Prepares a pokerbot which is still running for a new game, with new settings if a config is given.
+
+        The pokerbot is told to reset its game state by a new game clause in its next message.
+        '''
+        self.output_dir = output_dir
+        if config is not None:
+            self.config = config
+        self.game_clock = self.config.starting_game_clock
+        self.bankroll = 0
+        self.table_winnings = [0] * NUM_BOARDS
+        self.latencies = {}
+        self.new_game = True
+        self.open_log(output_dir)
+
+    def open_log(self, output_dir):
+        '''
+        Names the pokerbot's log in output_dir, or drops its output when output_dir is None.
+        '''
+        if output_dir is None:
+            with self.log_lock:
+                self.log = PlayerLog(limit=0)
+        else:
+            self.log.start(os.path.join(output_dir, self.name + '.txt'))
 
     def stop(self):
         '''
         Closes the socket connection and stops the pokerbot.
         '''
+        self.disconnect()
+        self.write_log()
+
+    def disconnect(self):
+        '''
+        Sends the quit message and waits for the pokerbot to exit.
+        '''
         if self.socketfile is not None:
             try:
-                self.socketfile.write('Q\n')
+                self.socketfile.write(self.socketfile.encode('Q\n'))
                 self.socketfile.close()
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to disconnect')
@@ -304,126 +681,191 @@ class Player():
                 print('Could not close socket connection with', self.name)
         if self.bot_subprocess is not None:
             try:
-                outs, _ = self.bot_subprocess.communicate(timeout=CONNECT_TIMEOUT)
-                self.bytes_queue.put(outs)
+                # a pokerbot out of time may still be stuck, so it only gets a moment to quit
+                outs, _ = self.bot_subprocess.communicate(timeout=self.config.connect_timeout if self.game_clock > 0. else 0.1)
+                self.log_output(outs)
             except subprocess.TimeoutExpired:
                 print('Timed out waiting for', self.name, 'to quit')
                 self.bot_subprocess.kill()
                 outs, _ = self.bot_subprocess.communicate()
-                self.bytes_queue.put(outs)
-        with open(self.name + '.txt', 'wb') as log_file:
-            bytes_written = 0
-            for output in self.bytes_queue.queue:
-                try:
-                    bytes_written += log_file.write(output)
-                    if bytes_written >= PLAYER_LOG_SIZE_LIMIT:
-                        break
-                except TypeError:
-                    pass
+                self.log_output(outs)
+
+    def capture_output(self, stream):
+        '''
+        Streams the pokerbot's output to its log in chunks until its pipe closes.
+        '''
+        try:
+            for output in iter(lambda: stream.read1(PlayerLog.CHUNK_SIZE), b''):
+                self.log_output(output)
+        except (OSError, ValueError):  # the pipe was closed by disconnect
+            pass
+
+    def log_output(self, output):
+        '''
+        Adds output from the pokerbot or its build to the current log.
+        '''
+        if output:
+            with self.log_lock:
+                self.log.write(output)
+
+    def write_log(self):
+        '''
+        Finishes the pokerbot's log file, and holds later output until the pokerbot is reset for a new game.
+        '''
+        with self.log_lock:
+            self.log.close()
+            self.log = PlayerLog(limit=self.config.player_log_size_limit)
 
     def query(self, round_state, player_message, game_log):
         '''
         Requests NUM_BOARDS actions from the pokerbot over the socket connection.
         At the end of the round, we request NUM_BOARDS CheckAction's from the pokerbot.
         '''
-        active = round_state.button % 2 if isinstance(round_state, RoundState) else None
         if self.socketfile is not None and self.game_clock > 0.:
-            clauses = ''
             try:
-                player_message[0] = 'T{:.3f}'.format(self.game_clock)
-                message = ' '.join(player_message) + '\n'
-                del player_message[1:]  # do not send redundant action history
+                data = self.socketfile.encode(self.format_message(player_message))
                 start_time = time.perf_counter()
-                self.socketfile.write(message)
+                self.socketfile.write(data)
                 self.socketfile.flush()
-                clauses = self.socketfile.readline().strip()
+                sent_time = time.perf_counter()
+                # the read is cut off the moment the pokerbot's game clock runs out
+                timeout = self.game_clock - (sent_time - start_time) if self.config.enforce_game_clock else self.config.connect_timeout
+                clauses = self.socketfile.readline(timeout).strip()
                 end_time = time.perf_counter()
-                if ENFORCE_GAME_CLOCK:
-                    self.game_clock -= end_time - start_time
-                if self.game_clock <= 0.:
-                    raise socket.timeout
-                assert_flag = (';' in clauses)
-                clauses = clauses.split(';')
-                if assert_flag:
-                    assert (len(clauses) == NUM_BOARDS)
-                actions = [self.query_board(round_state.board_states[i], clauses[i], game_log, active, round_state.stacks)
-                    if isinstance(round_state, RoundState) else self.query_board(round_state.previous_state.board_states[i], clauses[i],
-                    game_log, active, round_state.previous_state.stacks) for i in range(NUM_BOARDS)]
-                if all(isinstance(a, AssignAction) for a in actions):
-                    if set().union(*[set(a.cards) for a in actions]) == set(round_state.hands[active]):
-                        return actions
-                    #else: (assigned cards not in hand or some cards unassigned)
-                    game_log.append(self.name + ' attempted illegal assignment')
-                else:
-                    contribution = 0
-                    opp_continue_cost = 0
-                    for i in range(NUM_BOARDS):
-                        if isinstance(actions[i], RaiseAction):
-                            contribution += actions[i].amount - round_state.board_states[i].pips[active]
-                            opp_continue_cost += actions[i].amount - round_state.board_states[i].pips[1-active]
-                        elif isinstance(actions[i], CallAction):
-                            contribution += round_state.board_states[i].pips[1-active] - round_state.board_states[i].pips[active]
-                    max_contribution = round_state.stacks[active] if isinstance(round_state, RoundState) else 0
-                    opp_stack = round_state.stacks[1-active] if isinstance(round_state, RoundState) else 0
-                    all_in_flag = (contribution == max_contribution)
-                    if 0 <= contribution <= max_contribution:
-                        if not all_in_flag:
-                            for i in range(NUM_BOARDS):
-                                if not isinstance(actions[i], RaiseAction):
-                                    continue
-                                min_raise = round_state.board_states[i].raise_bounds(active, round_state.stacks)[0]
-                                legal_actions = round_state.board_states[i].legal_actions(active, round_state.stacks)
-                                if actions[i].amount < min_raise:
-                                    game_log.append(self.name + ' did not meet minimum raise amount on board {}'.format(i+1))
-                                    actions[i] = CallAction() if CallAction in legal_actions else CheckAction()
-                        elif 0 < contribution:
-                            game_log.append(self.name + ' went all in')
-                        if opp_continue_cost <= opp_stack:
-                            return actions
-                        else:
-                            game_log.append(self.name + " attempted net RaiseAction's which opponent cannot match")
-                            effective_stack = round_state.stacks[1-active]
-                            mod_actions = actions[:]
-                            for i in range(NUM_BOARDS):
-                                if isinstance(actions[i], RaiseAction):
-                                    raise_delta = actions[i].amount - round_state.board_states[i].pips[1-active]
-                                    if effective_stack == 0:
-                                        mod_actions[i] = CallAction()
-                                    elif raise_delta > effective_stack:
-                                        mod_actions[i] = RaiseAction(round_state.board_states[i].pips[1-active] + effective_stack)
-                                        effective_stack = 0
-                                    else:
-                                        effective_stack -= raise_delta
-                            return mod_actions
-                    else: # (attempted negative net raise or net raise larger than bankroll)
-                        game_log.append(self.name + " attempted an illegal combination of RaiseAction's and/or CallAction's")
+                self.charge_query(round_state, start_time, sent_time, end_time)
+                return self.parse_actions(round_state, clauses, game_log)
             except socket.timeout:
-                error_message = self.name + ' ran out of time'
-                game_log.append(error_message)
-                print(error_message)
-                self.game_clock = 0.
-            except AssertionError:
-                error_message = self.name + ' did not submit ' + str(NUM_BOARDS) + ' actions'
-                game_log.append(error_message)
+                self.drop(game_log, self.name + ' ran out of time')
             except OSError:
-                error_message = self.name + ' disconnected'
-                game_log.append(error_message)
-                print(error_message)
-                self.game_clock = 0.
-            except (IndexError, KeyError, ValueError):
-                error_message = self.name + ' response misformatted: ' + str(clauses)
-                game_log.append(error_message)
-            except TypeError:
-                error_message = self.name + ' attempted an action after the round has ended'
-                game_log.append(error_message)
-        default_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else [{CheckAction} for i in range(NUM_BOARDS)]
+                self.drop(game_log, self.name + ' disconnected')
+            except ValueError as error:  # the response could not be decoded
+                game_log.append(self.name + ' response misformatted: ' + str(error))
+        return self.default_actions(round_state)
+
+    def drop(self, game_log, error_message):
+        '''
+        Gives up on a pokerbot which ran out of time or lost its connection for the rest of the game.
+        '''
+        game_log.append(error_message)
+        print(error_message)
+        self.game_clock = 0.
+
+    def format_message(self, player_message):
+        '''
+        Encodes the pending clauses for the pokerbot, then clears them down to the game clock.
+        '''
+        player_message[0] = 'T{:.3f}'.format(self.game_clock)
+        message = ' '.join(player_message) + '\n'
+        if self.new_game:
+            message = 'N ' + message
+            self.new_game = False
+        del player_message[1:]  # do not send redundant action history
+        return message
+
+    def charge_query(self, round_state, start_time, sent_time, end_time):
+        '''
+        Records the latencies of one query and charges it to the game clock.
+
+        Raises socket.timeout if the pokerbot ran out of time.
+        '''
+        if isinstance(round_state, TerminalState):
+            kind, street = 'ack', round_state.previous_state.street
+        else:
+            kind, street = ('assign' if round_state.button < 0 else 'betting'), round_state.street
+        self.record_latency('total', end_time - start_time)
+        self.record_latency('send', sent_time - start_time)
+        self.record_latency('receive', end_time - sent_time)
+        self.record_latency('kind:' + kind, end_time - start_time)
+        self.record_latency('street:' + LATENCY_STREETS[street], end_time - start_time)
+        if self.config.enforce_game_clock:
+            self.game_clock -= end_time - start_time
+        if self.game_clock <= 0.:
+            raise socket.timeout
+
+    def parse_actions(self, round_state, clauses, game_log):
+        '''
+        Decodes and checks the pokerbot's response, falling back to the default actions if it is illegal.
+        '''
+        active = round_state.button % 2 if isinstance(round_state, RoundState) else None
+        try:
+            assert_flag = (';' in clauses)
+            clauses = clauses.split(';')
+            if assert_flag:
+                assert (len(clauses) == NUM_BOARDS)
+            actions = [self.query_board(round_state.board_states[i], clauses[i], game_log, active, round_state.stacks)
+                if isinstance(round_state, RoundState) else self.query_board(round_state.previous_state.board_states[i], clauses[i],
+                game_log, active, round_state.previous_state.stacks) for i in range(NUM_BOARDS)]
+            if all(isinstance(a, AssignAction) for a in actions):
+                if set().union(*[set(a.cards) for a in actions]) == set(round_state.hands[active]):
+                    return actions
+                #else: (assigned cards not in hand or some cards unassigned)
+                game_log.append(self.name + ' attempted illegal assignment')
+            else:
+                contribution = 0
+                opp_continue_cost = 0
+                for i in range(NUM_BOARDS):
+                    if isinstance(actions[i], RaiseAction):
+                        contribution += actions[i].amount - round_state.board_states[i].pips[active]
+                        opp_continue_cost += actions[i].amount - round_state.board_states[i].pips[1-active]
+                    elif isinstance(actions[i], CallAction):
+                        contribution += round_state.board_states[i].pips[1-active] - round_state.board_states[i].pips[active]
+                max_contribution = round_state.stacks[active] if isinstance(round_state, RoundState) else 0
+                opp_stack = round_state.stacks[1-active] if isinstance(round_state, RoundState) else 0
+                all_in_flag = (contribution == max_contribution)
+                if 0 <= contribution <= max_contribution:
+                    if not all_in_flag:
+                        for i in range(NUM_BOARDS):
+                            if not isinstance(actions[i], RaiseAction):
+                                continue
+                            min_raise = round_state.board_states[i].raise_bounds(active, round_state.stacks)[0]
+                            legal_actions = round_state.board_states[i].legal_actions(active, round_state.stacks)
+                            if actions[i].amount < min_raise:
+                                game_log.append(self.name + ' did not meet minimum raise amount on board {}'.format(i+1))
+                                actions[i] = CallAction() if CallAction in legal_actions else CheckAction()
+                    elif 0 < contribution:
+                        game_log.append(self.name + ' went all in')
+                    if opp_continue_cost <= opp_stack:
+                        return actions
+                    else:
+                        game_log.append(self.name + " attempted net RaiseAction's which opponent cannot match")
+                        effective_stack = round_state.stacks[1-active]
+                        mod_actions = actions[:]
+                        for i in range(NUM_BOARDS):
+                            if isinstance(actions[i], RaiseAction):
+                                raise_delta = actions[i].amount - round_state.board_states[i].pips[1-active]
+                                if effective_stack == 0:
+                                    mod_actions[i] = CallAction()
+                                elif raise_delta > effective_stack:
+                                    mod_actions[i] = RaiseAction(round_state.board_states[i].pips[1-active] + effective_stack)
+                                    effective_stack = 0
+                                else:
+                                    effective_stack -= raise_delta
+                        return mod_actions
+                else: # (attempted negative net raise or net raise larger than bankroll)
+                    game_log.append(self.name + " attempted an illegal combination of RaiseAction's and/or CallAction's")
+        except AssertionError:
+            error_message = self.name + ' did not submit ' + str(NUM_BOARDS) + ' actions'
+            game_log.append(error_message)
+        except (IndexError, KeyError, ValueError):
+            error_message = self.name + ' response misformatted: ' + str(clauses)
+            game_log.append(error_message)
+        except TypeError:
+            error_message = self.name + ' attempted an action after the round has ended'
+            game_log.append(error_message)
+        return self.default_actions(round_state)
+
+    def default_actions(self, round_state):
+        '''
+        Returns the actions of a pokerbot which did not respond legally, checking where it can and folding elsewhere.
+        '''
+        default_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else [CHECK_ACTIONS] * NUM_BOARDS
         return [CheckAction() if CheckAction in default else FoldAction() for default in default_actions]
 
     def query_board(self, board_state, clause, game_log, active, stacks):
         '''
         Parses one action from the pokerbot for a specific board.
         '''
-        legal_actions = board_state.legal_actions(active, stacks) if isinstance(board_state, BoardState) else {CheckAction}
+        legal_actions = board_state.legal_actions(active, stacks) if isinstance(board_state, BoardState) else CHECK_ACTIONS
         action = DECODE[clause[1]]
         if action in legal_actions:
             if clause[1] == 'R':
@@ -443,14 +885,525 @@ class Player():
         return CheckAction() if CheckAction in legal_actions else FoldAction()
 
 
+class SocketConnection():
+    '''
+    Line-based connection to a pokerbot whose reads can stop at a deadline.
+
+    Bytes received after a complete line, or before a read timed out, are kept for the next read.
+    '''
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def encode(self, message):
+        '''
+        Returns the bytes which carry a text message.
+        '''
+        return message.encode()
+
+    def write(self, data):
+        '''
+        Sends an encoded message, waiting at most the socket's timeout.
+        '''
+        self.sock.sendall(data)
+
+    def flush(self):
+        '''
+        Messages are sent as they are written.
+        '''
+
+    def readline(self, timeout=None):
+        '''
+        Returns the next line, or what is left once the pokerbot closes the connection.
+
+        Raises socket.timeout if no complete line arrives within timeout seconds,
+        and ValueError if the line is not valid text.
+        '''
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            end = self.buffer.find(b'\n')
+            if end >= 0:
+                line = self.buffer[:end+1]
+                del self.buffer[:end+1]
+                return decode_line(line)
+            if not self.receive(deadline):
+                line = bytes(self.buffer)
+                self.buffer.clear()
+                return decode_line(line)
+
+    def receive(self, deadline):
+        '''
+        Adds the bytes which arrive next to the buffer, and returns False once the pokerbot closes the connection.
+
+        Raises socket.timeout if nothing arrives before the deadline.
+        '''
+        remaining = None if deadline is None else deadline - time.perf_counter()
+        if remaining is not None and remaining <= 0.:
+            raise socket.timeout
+        ready, _, _ = select.select([self.sock], [], [], remaining)
+        if not ready:
+            raise socket.timeout
+        data = self.sock.recv(1 << 16)
+        self.buffer += data
+        return bool(data)
+
+    def close(self):
+        '''
+        Closes the connection.
+        '''
+        self.sock.close()
+
+
+class BinaryConnection(SocketConnection):
+    '''
+    Connection to a pokerbot which accepted the binary protocol.
+
+    Text messages are translated into binary frames as they are written, and binary responses
+    back into text as they are read, so the engine handles both protocols alike.
+    '''
+
+    def __init__(self, connection):
+        super().__init__(connection.sock)
+        self.buffer = connection.buffer
+
+    def encode(self, message):
+        '''
+        Returns the binary frame which carries a text message.
+        '''
+        return encode_message(message)
+
+    def readline(self, timeout=None):
+        '''
+        Returns the next response frame as a line of text, or an empty line once the pokerbot closes the connection.
+
+        Raises socket.timeout if no complete frame arrives within timeout seconds,
+        and ValueError if the frame does not hold one action for each board.
+        '''
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if len(self.buffer) >= FRAME_HEADER.size:
+                end = FRAME_HEADER.size + FRAME_HEADER.unpack_from(self.buffer)[0]
+                if len(self.buffer) >= end:
+                    payload = bytes(self.buffer[FRAME_HEADER.size:end])
+                    del self.buffer[:end]
+                    try:
+                        return decode_response(payload) + '\n'
+                    except ValueError as error:
+                        raise ValueError('{} {!r}'.format(error, payload[:RESPONSE_PREVIEW])) from None
+            if not self.receive(deadline):
+                self.buffer.clear()
+                return ''
+
+
+class PlayerOutput():
+    '''
+    Text stream which sends what a pokerbot running inside the engine process prints to its log.
+    '''
+
+    def __init__(self, player):
+        self.player = player
+
+    def write(self, text):
+        '''
+        Logs printed text as it is printed.
+        '''
+        self.player.log_output(text.encode(errors='replace'))
+        return len(text)
+
+    def flush(self):
+        '''
+        Nothing is buffered.
+        '''
+
+
+class InProcessConnection():
+    '''
+    Stands in for the socket file of a pokerbot running inside the engine process.
+    '''
+
+    def __init__(self, runner, path, output):
+        self.runner = runner
+        self.path = path
+        self.output = output
+        self.message = None
+        self.crashed = False
+
+    def encode(self, message):
+        '''
+        Returns the bytes which carry a text message.
+        '''
+        return message.encode()
+
+    def write(self, data):
+        '''
+        Holds an encoded message until the pokerbot is asked for its response.
+        '''
+        self.message = data
+
+    def flush(self):
+        '''
+        Nothing is buffered beyond the pending message.
+        '''
+
+    def readline(self, timeout=None):
+        '''
+        Hands the pending message to the pokerbot's runner and returns its encoded response.
+
+        The pokerbot runs in the engine's thread, so it can not be cut off at the timeout.
+        '''
+        if self.crashed:
+            raise OSError('pokerbot crashed')
+        packet = self.message.split()
+        self.message = None
+        engine_dir = os.getcwd()
+        try:
+            os.chdir(self.path)
+            with redirect_stdout(self.output), redirect_stderr(self.output):
+                actions = self.runner.process(packet)
+        except Exception:  # the pokerbot's own code raised, as a subprocess would have crashed
+            traceback.print_exc(file=self.output)
+            self.crashed = True
+            raise OSError('pokerbot crashed')
+        finally:
+            os.chdir(engine_dir)
+        return '' if actions is None else self.runner.encode(actions) + '\n'
+
+    def close(self):
+        '''
+        Lets the pokerbot see the end of the game.
+        '''
+        if self.message is not None and not self.crashed:
+            self.readline()
+
+
+class InProcessPlayer(Player):
+    '''
+    Runs a pokerbot built on the Python skeleton inside the engine process.
+
+    Messages are handed straight to the pokerbot's own skeleton Runner instead of a socket,
+    so the pokerbot sees exactly the game states it would see over a socket connection.
+    Pokerbots which are not Python scripts fall back to a subprocess.
+    '''
+
+    def __init__(self, name, path, output_dir='.', config=None):
+        super().__init__(name, path, output_dir, config)
+        self.output = PlayerOutput(self)
+
+    def script(self):
+        '''
+        Returns the Python script named by the run command, or None for other pokerbots.
+        '''
+        if self.commands is None or len(self.commands['run']) == 0:
+            return None
+        command = self.commands['run']
+        if not os.path.basename(str(command[0])).startswith('python') or not str(command[-1]).endswith('.py'):
+            return None
+        return command[-1]
+
+    def run(self):
+        '''
+        Imports the pokerbot and connects it to the engine without a socket.
+        '''
+        script = self.script()
+        if script is None:
+            super().run()
+            return
+        path = os.path.abspath(self.path)
+        engine_dir = os.getcwd()
+        # each pokerbot gets its own copy of the skeleton package
+        saved_modules = {name: module for name, module in sys.modules.items() if name == 'skeleton' or name.startswith('skeleton.')}
+        for name in saved_modules:
+            del sys.modules[name]
+        sys.path.insert(0, path)
+        try:
+            os.chdir(path)
+            with redirect_stdout(self.output), redirect_stderr(self.output):
+                spec = importlib.util.spec_from_file_location('pokerbot_' + self.name, os.path.join(path, script))
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                runner_module = importlib.import_module('skeleton.runner')
+                pokerbot = module.Player()
+            runner = runner_module.Runner(pokerbot, None)
+            self.socketfile = InProcessConnection(runner, path, self.output)
+            print(self.name, 'loaded in process')
+        except Exception:  # the pokerbot failed to import or initialize
+            traceback.print_exc(file=self.output)
+            print(self.name, 'failed to load in process')
+        finally:
+            os.chdir(engine_dir)
+            sys.path.remove(path)
+            for name in [name for name in sys.modules if name == 'skeleton' or name.startswith('skeleton.')]:
+                del sys.modules[name]
+            sys.modules.update(saved_modules)
+
+    def stop(self):
+        '''
+        Ends the game for the pokerbot and finishes its log.
+        '''
+        if isinstance(self.socketfile, InProcessConnection):
+            try:
+                self.socketfile.write(self.socketfile.encode('Q\n'))
+                self.socketfile.close()
+            except OSError:
+                pass
+            self.socketfile = None
+        super().stop()
+
+
+class BotPool():
+    '''
+    Keeps pokerbots running between games, so consecutive games skip their build and startup.
+    '''
+
+    def __init__(self):
+        self.idle = {}
+
+    def lease(self, name, path, output_dir='.', build=True, config=None):
+        '''
+        Returns a running pokerbot for a new game, starting one only if none is idle.
+        '''
+        idle_players = self.idle.get((name, path), [])
+        while idle_players:
+            player = idle_players.pop()
+            if not self.reusable(player):  # a late reply to its last query may still be on the socket
+                player.disconnect()
+                continue
+            player.reset(output_dir, config)
+            return player
+        player = Player(name, path, output_dir, config)
+        player.build(build)
+        player.run()
+        return player
+
+    def release(self, player):
+        '''
+        Takes back a pokerbot after its game, stopping it if it can not play another one.
+        '''
+        player.write_log()
+        if self.reusable(player):
+            self.idle.setdefault((player.name, player.path), []).append(player)
+        else:
+            player.disconnect()
+
+    def reusable(self, player):
+        '''
+        Returns whether a pokerbot can play another game, which it can not once it crashed,
+        never connected, or ran out of time or lost its connection and was dropped.
+        '''
+        return player.socketfile is not None and player.game_clock > 0.
+
+    def close(self):
+        '''
+        Stops every idle pokerbot.
+        '''
+        for players in self.idle.values():
+            for player in players:
+                player.disconnect()
+        self.idle = {}
+
+
+class EarlyStopPolicy():
+    '''
+    Decides when a game can stop before its last round.
+
+    The 'decided' rule stops once the bankroll lead is larger than the most it could change
+    in the rounds left. The 'sprt' rule runs a sequential probability ratio test of an even
+    game against each player winning delta chips per round on average, and stops once one
+    player is found ahead; evenly matched players play every round. It runs on the per-round
+    results or, with DUPLICATE_DEALS, on the mean result of each duplicate deal's two rounds.
+    A round's result is half the change in the first player's lead, so the dead money in
+    every pot, which makes both players' deltas sum to more than zero, cancels out.
+    '''
+
+    def __init__(self, rule, alpha=SPRT_ALPHA, beta=SPRT_BETA, delta=SPRT_DELTA, min_rounds=SPRT_MIN_ROUNDS, paired=DUPLICATE_DEALS,
+                 num_rounds=NUM_ROUNDS):
+        assert rule in ('decided', 'sprt')
+        self.rule = rule
+        self.num_rounds = num_rounds
+        self.delta = delta
+        self.min_rounds = min_rounds
+        self.paired = paired
+        self.upper = math.log((1 - beta) / alpha)
+        # the most one round can change the lead: the winner of every board gains the other
+        # player's whole stack plus all the dead money, and the other player gets none of it
+        self.max_swing = 2 * STARTING_STACK + sum((i+1)*BIG_BLIND for i in range(NUM_BOARDS))
+
+    def check(self, players, round_results):
+        '''
+        Returns why the game should stop after the rounds played so far, or None to play on.
+
+        Players are in their starting seat order, and round_results holds half the change in the
+        first player's lead in each round.
+        '''
+        rounds_left = self.num_rounds - len(round_results)
+        lead = players[0].bankroll - players[1].bankroll
+        if self.rule == 'decided':
+            if abs(lead) > rounds_left * self.max_swing:
+                leader = players[0] if lead > 0 else players[1]
+                return 'decided, {} leads by {} with {} rounds left'.format(leader.name, abs(lead), rounds_left)
+            return None
+        if self.paired:  # per-round means, so that delta is in chips per round either way
+            samples = [(round_results[i] + round_results[i+1]) / 2 for i in range(0, len(round_results) - 1, 2)]
+        else:
+            samples = round_results
+        if len(round_results) < self.min_rounds or len(samples) < 2:
+            return None
+        mean = sum(samples) / len(samples)
+        variance = sum((sample - mean) ** 2 for sample in samples) / (len(samples) - 1)
+        if variance == 0:
+            return None
+        total = sum(samples)
+        for sign, leader in ((1, players[0]), (-1, players[1])):
+            # log likelihood ratio of the leader winning delta per round against an even game, for normal samples
+            ratio = self.delta * (sign * total - len(samples) * self.delta / 2) / variance
+            if ratio >= self.upper:
+                return 'sprt, {} is ahead with log likelihood ratio {:.2f} after {} rounds'.format(leader.name, ratio, len(round_results))
+        return None
+
+
+class GameLog():
+    '''
+    Streams the game log to a buffered, optionally compressed file as lines are appended.
+    '''
+    OPENERS = {None: None, 'gzip': gzip.GzipFile, 'bz2': bz2.BZ2File, 'xz': lzma.LZMAFile}
+    EXTENSIONS = {None: '.txt', 'gzip': '.txt.gz', 'bz2': '.txt.bz2', 'xz': '.txt.xz'}
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, name, compression=None):
+        self.name = name + self.EXTENSIONS[compression]
+        if compression is None:
+            self.compressed_file = None
+            self.file = open(self.name, 'w', buffering=self.BUFFER_SIZE)
+        else:
+            self.compressed_file = self.OPENERS[compression](self.name, 'wb')
+            self.file = io.TextIOWrapper(io.BufferedWriter(self.compressed_file, self.BUFFER_SIZE))
+        self.separator = ''
+
+    def append(self, line):
+        '''
+        Writes one line of the game log.
+        '''
+        self.file.write(self.separator + line)
+        self.separator = '\n'
+
+    def flush(self):
+        '''
+        Pushes everything appended so far to disk, so a partial log survives a crash.
+
+        Only gzip can flush its compressor mid-stream, bz2 and xz logs are written in blocks.
+        '''
+        self.file.flush()
+        if self.compressed_file is not None:
+            self.compressed_file.flush()
+
+    def close(self):
+        '''
+        Finishes the log file.
+        '''
+        self.file.close()
+
+
+class NullLog():
+    '''
+    Stands in for the game log of a game which is not logged.
+    '''
+    name = None
+
+    def append(self, line):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PlayerLog():
+    '''
+    Streams a pokerbot's output to its log file as it arrives, up to PLAYER_LOG_SIZE_LIMIT bytes.
+
+    Output past the limit is counted and dropped, and the count is noted at the end of the file.
+    Until the log is given a file name, output is held in memory, still within the limit.
+    '''
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, name=None, limit=PLAYER_LOG_SIZE_LIMIT):
+        self.name = name
+        self.limit = limit
+        self.file = None
+        self.pending = bytearray()
+        self.bytes_written = 0
+        self.bytes_dropped = 0
+
+    def start(self, name):
+        '''
+        Names the log file, which is created when it is first written.
+        '''
+        self.name = name
+
+    def write(self, output):
+        '''
+        Writes as much of the output as the limit allows.
+        '''
+        kept = output[:max(0, self.limit - self.bytes_written)]
+        self.bytes_dropped += len(output) - len(kept)
+        self.bytes_written += len(kept)
+        if not kept:
+            return
+        if self.name is None:
+            self.pending += kept
+            return
+        if self.file is None:
+            self.file = open(self.name, 'wb')
+        if self.pending:
+            self.file.write(self.pending)
+            self.pending = bytearray()
+        self.file.write(kept)
+
+    def close(self):
+        '''
+        Finishes the log file, creating it even if the pokerbot printed nothing.
+        '''
+        if self.name is None:
+            return
+        if self.file is None:
+            self.file = open(self.name, 'wb')
+            self.file.write(self.pending)
+        if self.bytes_dropped:
+            self.file.write('\n{} bytes of output dropped over the {} byte limit\n'.format(self.bytes_dropped, self.limit).encode())
+        self.file.close()
+
+
 class Game():
     '''
     Manages logging and the high-level game procedure.
     '''
 
-    def __init__(self):
-        self.log = ['6.176 MIT Pokerbots - ' + PLAYER_1_NAME + ' vs ' + PLAYER_2_NAME]
+    def __init__(self, player_specs=None, output_dir='.', config=None):
+        self.config = config = config if config is not None else MatchConfig()
+        if player_specs is None:
+            player_specs = config.players
+        self.player_specs = player_specs
+        self.output_dir = output_dir
+        if output_dir is None:  # nothing is written
+            self.log = NullLog()
+            self.hand_history = None
+        else:
+            self.log = GameLog(os.path.join(output_dir, config.game_log_filename), config.game_log_compression)
+            self.hand_history = hand_history.HandHistoryWriter(os.path.join(output_dir, config.game_log_filename)) if config.hand_history else None
+        self.log.append('6.176 MIT Pokerbots - ' + player_specs[0][0] + ' vs ' + player_specs[1][0])
+        self.deal_seed = config.deal_seed
+        if self.deal_seed is None and config.duplicate_deals:
+            self.deal_seed = random.SystemRandom().getrandbits(64)
+        self.deal_rng = random.Random(self.deal_seed) if self.deal_seed is not None else None
+        if self.deal_seed is not None:
+            self.log.append('Deal seed ' + str(self.deal_seed) + (', duplicate deals' if config.duplicate_deals else ''))
+        self.round_results = []
+        self.stop_reason = None
         self.player_messages = [[], []]
+        self.pending_messages = {}  # the end of the last round, still owed to each pokerbot
 
     def log_round_state(self, players, round_state):
         '''
@@ -461,8 +1414,8 @@ class Game():
             self.log.append('{} posts the blind of {} on each board'.format(players[1].name, BIG_BLIND))
             self.log.append('{} dealt {}'.format(players[0].name, PCARDS(round_state.hands[0])))
             self.log.append('{} dealt {}'.format(players[1].name, PCARDS(round_state.hands[1])))
-            self.player_messages[0] = ['T0.', 'P0', 'H' + CCARDS(round_state.hands[0])]
-            self.player_messages[1] = ['T0.', 'P1', 'H' + CCARDS(round_state.hands[1])]
+            self.player_messages[0] = ['T0.', *self.pending_messages.pop(players[0], ()), 'P0', 'H' + CCARDS(round_state.hands[0])]
+            self.player_messages[1] = ['T0.', *self.pending_messages.pop(players[1], ()), 'P1', 'H' + CCARDS(round_state.hands[1])]
         elif round_state.street > 0 and round_state.button == 1:
             boards = [board_state.deck.peek(round_state.street) if isinstance(board_state, BoardState) else [] for board_state in round_state.board_states]
             for i in range(NUM_BOARDS):
@@ -552,65 +1505,292 @@ class Game():
         self.player_messages[0].append(';'.join(log_messages))
         self.player_messages[1].append(';'.join(log_messages[::-1]))
 
-    def run_round(self, players):
+    def record_round_state(self, round_state):
+        '''
+        Incorporates the dealt hands and board cards into the hand history.
+        '''
+        if round_state.street == 0 and round_state.button == -2:
+            self.hand_history.deal(0, round_state.hands[0])
+            self.hand_history.deal(1, round_state.hands[1])
+        elif round_state.street > 0 and round_state.button == 1:
+            for i, board_state in enumerate(round_state.board_states):
+                if isinstance(board_state, BoardState):
+                    self.hand_history.record(hand_history.BOARD, i+1, 0, round_state.street, board_state.pot, board_state.deck.peek(round_state.street))
+
+    def record_actions(self, actions, bet_overrides, active, street):
+        '''
+        Incorporates the actions on every live board into the hand history.
+        '''
+        for i in range(NUM_BOARDS):
+            action = actions[i]
+            if isinstance(action, AssignAction):
+                self.hand_history.record(hand_history.ASSIGN, i+1, active, street, 0, action.cards)
+            elif bet_overrides[i] is None:  # the board is already over
+                continue
+            elif isinstance(action, RaiseAction):
+                kind = hand_history.BET if bet_overrides[i] else hand_history.RAISE
+                self.hand_history.record(kind, i+1, active, street, action.amount)
+            else:
+                self.hand_history.record(RECORD_KINDS[type(action)], i+1, active, street)
+
+    def record_terminal_state(self, round_state):
+        '''
+        Incorporates the shown hands and the results on each board and the overall round into the hand history.
+        '''
+        previous_round = round_state.previous_state
+        for i in range(NUM_BOARDS):
+            previous_board = previous_round.board_states[i].previous_state
+            for position in (0, 1):
+                if previous_board.reveal:
+                    self.hand_history.record(hand_history.SHOW, i+1, position, previous_round.street, 0, previous_board.hands[position])
+                self.hand_history.record(hand_history.RESULT, i+1, position, previous_round.street, previous_round.board_states[i].deltas[position])
+        for position in (0, 1):
+            self.hand_history.record(hand_history.ROUND_END, 0, position, previous_round.street, round_state.deltas[position])
+
+    def run_round(self, players, deal_seed=None):
         '''
         Runs one round of poker.
+
+        When a deal seed is given, every shuffle of the round is drawn from it.
+        '''
+        self.answer(self.round_queries(players, deal_seed))
+
+    def answer(self, queries):
+        '''
+        Plays out a generator of queries, asking each pokerbot in turn, and returns its result.
+        '''
+        try:
+            player, round_state, player_message = next(queries)
+            while True:
+                actions = player.query(round_state, player_message, self.log)
+                player, round_state, player_message = queries.send(actions)
+        except StopIteration as stop:
+            return stop.value
+
+    def round_queries(self, players, deal_seed=None):
+        '''
+        Generates the queries of one round of poker as (player, round state, player message) tuples.
+
+        The actions answering each query are sent back into the generator, so the round can be
+        played over any kind of connection to the pokerbots. Returns the terminal state.
         '''
         deck = eval7.Deck()
-        deck.shuffle()
+        rng = random.Random(deal_seed) if deal_seed is not None else None
+        if rng is None:
+            deck.shuffle()
+        else:
+            rng.shuffle(deck.cards)
         hands = [deck.deal(NUM_BOARDS*2), deck.deal(NUM_BOARDS*2)]
         new_decks  = [SmallDeck(deck) for i in range(NUM_BOARDS)]
         for new_deck in new_decks:
-            new_deck.shuffle()
-        stacks = [STARTING_STACK - NUM_BOARDS*SMALL_BLIND, STARTING_STACK - NUM_BOARDS*BIG_BLIND]
-        board_states = [BoardState((i+1)*BIG_BLIND, [SMALL_BLIND, BIG_BLIND], None, new_decks[i], None) for i in range(NUM_BOARDS)]
+            if rng is None:
+                new_deck.shuffle()
+            else:
+                rng.shuffle(new_deck.cards)
+        stacks = (STARTING_STACK - NUM_BOARDS*SMALL_BLIND, STARTING_STACK - NUM_BOARDS*BIG_BLIND)
+        board_states = [BoardState((i+1)*BIG_BLIND, (SMALL_BLIND, BIG_BLIND), None, new_decks[i], None) for i in range(NUM_BOARDS)]
         round_state = RoundState(-2, 0, stacks, hands, board_states, None)
         while not isinstance(round_state, TerminalState):
             self.log_round_state(players, round_state)
+            if self.hand_history is not None:
+                self.record_round_state(round_state)
             active = round_state.button % 2
             player = players[active]
-            actions = player.query(round_state, self.player_messages[active], self.log)
-            bet_overrides = [(round_state.board_states[i].pips == [0, 0]) if isinstance(round_state.board_states[i], BoardState) else None for i in range(NUM_BOARDS)]
+            actions = yield player, round_state, self.player_messages[active]
+            bet_overrides = [(round_state.board_states[i].pips == (0, 0)) if isinstance(round_state.board_states[i], BoardState) else None for i in range(NUM_BOARDS)]
             self.log_actions(player.name, actions, bet_overrides, active)
+            if self.hand_history is not None:
+                self.record_actions(actions, bet_overrides, active, round_state.street)
             round_state = round_state.proceed(actions)
         self.log_terminal_state(players, round_state)
+        if self.hand_history is not None:
+            self.record_terminal_state(round_state)
+        if self.config.bundle_round_over:
+            # the end of the round goes out with each pokerbot's next message, without waiting for an ack
+            for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
+                self.pending_messages[player] = player_message[1:]
+                player.bankroll += delta
+            return round_state
         for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
-            player.query(round_state, player_message, self.log)
+            yield player, round_state, player_message
             player.bankroll += delta
+        return round_state
 
-    def run(self):
+    def round_over_queries(self, round_state):
         '''
-        Runs one game of poker.
+        Generates the acks which deliver the end of the last round to the pokerbots still owed it.
+        '''
+        for player, clauses in list(self.pending_messages.items()):
+            yield player, round_state, ['T0.'] + clauses
+        self.pending_messages = {}
+
+    def log_paired_results(self, players):
+        '''
+        Sums the first player's results over both plays of each duplicate deal, where card luck cancels out.
+
+        A round's result is half the change in the lead, so evenly matched players come out at about 0.
+        '''
+        pairs = [self.round_results[i] + self.round_results[i+1] for i in range(0, len(self.round_results) - 1, 2)]
+        if not pairs:
+            return
+        mean = sum(pairs) / len(pairs)
+        variance = sum((pair - mean) ** 2 for pair in pairs) / (len(pairs) - 1) if len(pairs) > 1 else 0.
+        self.log.append('{} paired result {:g} over {} duplicate deals, {:.2f} +/- {:.2f} per deal'.format(
+            players[0].name, sum(pairs), len(pairs), mean, math.sqrt(variance / len(pairs))))
+
+    def log_latencies(self, players):
         '''
-        print('   __  _____________  ___       __           __        __    ')
-        print('  /  |/  /  _/_  __/ / _ \\___  / /_____ ____/ /  ___  / /____')
-        print(' / /|_/ // /  / /   / ___/ _ \\/  \'_/ -_) __/ _ \\/ _ \\/ __(_-<')
-        print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
-        print()
-        print('Starting the Pokerbots engine...')
-        players = [
-            Player(PLAYER_1_NAME, PLAYER_1_PATH),
-            Player(PLAYER_2_NAME, PLAYER_2_PATH)
-        ]
+        Summarizes each player's query latencies in the game log and writes every histogram summary as JSON.
+        '''
+        summaries = {}
         for player in players:
-            player.build()
-            player.run()
-        for round_num in range(1, NUM_ROUNDS + 1):
+            summary = player.latency_summary()
+            summaries[player.name] = summary
+            if 'total' in summary:
+                total = summary['total']
+                self.log.append('{} latency p50 {:.3f}ms, p95 {:.3f}ms, p99 {:.3f}ms, max {:.3f}ms, game clock left {:.3f}s'.format(
+                    player.name, total['p50'] * 1e3, total['p95'] * 1e3, total['p99'] * 1e3, total['max'] * 1e3, player.game_clock))
+        if self.output_dir is not None:
+            with open(os.path.join(self.output_dir, self.config.latency_filename + '.json'), 'w') as json_file:
+                json.dump(summaries, json_file, indent=2)
+
+    def run(self, build=True, pool=None):
+        '''
+        Runs one game of poker.
+
+        Pokerbots are leased from the pool when one is given, and returned to it after the game.
+        Returns the players in their starting seat order.
+        '''
+        in_process = self.config.in_process_bots
+        if in_process:  # in-process pokerbots are already cheap to start
+            pool = None
+        if pool is not None:
+            players = [pool.lease(name, path, self.output_dir, build, self.config) for name, path in self.player_specs]
+        else:
+            player_class = InProcessPlayer if in_process else Player
+            players = [player_class(name, path, self.output_dir, self.config) for name, path in self.player_specs]
+        try:
+            for player in players:
+                if pool is None:
+                    player.build(build)
+                    player.run()
+            seats = self.answer(self.game_queries(players))
+            for player in players:
+                if pool is None:
+                    player.stop()
+                else:
+                    pool.release(player)
+        finally:
+            self.close()
+        return seats
+
+    def game_queries(self, players):
+        '''
+        Generates the queries of every round of the game, logs the results, and returns the players in their starting seat order.
+        '''
+        config = self.config
+        seats = players
+        early_stop = None
+        if config.early_stop is not None:
+            early_stop = EarlyStopPolicy(config.early_stop, config.sprt_alpha, config.sprt_beta, config.sprt_delta,
+                                         config.sprt_min_rounds, config.duplicate_deals, config.num_rounds)
+        deal_seed = None
+        round_state = None
+        for round_num in range(1, config.num_rounds + 1):
             self.log.append('')
             self.log.append('Round #' + str(round_num) + STATUS(players))
-            self.run_round(players)
+            if self.deal_rng is not None:
+                # seats swap every round, so a duplicate deal is replayed with the cards swapped
+                if not config.duplicate_deals or round_num % 2 == 1:
+                    deal_seed = self.deal_rng.getrandbits(64)
+                self.log.append('Deal seed ' + str(deal_seed))
+            if self.hand_history is not None:
+                self.hand_history.start_round(round_num, seats.index(players[0]))
+            lead = seats[0].bankroll - seats[1].bankroll
+            round_state = yield from self.round_queries(players, deal_seed)
+            # the dead money adds to both bankrolls, so only the change in the lead is a result
+            self.round_results.append((seats[0].bankroll - seats[1].bankroll - lead) / 2)
             players = players[::-1]
+            self.log.flush()
+            if self.hand_history is not None:
+                self.hand_history.end_round()
+                self.hand_history.flush()
+            if early_stop is not None and round_num < config.num_rounds:
+                self.stop_reason = early_stop.check(seats, self.round_results)
+                if self.stop_reason is not None:
+                    self.log.append('')
+                    self.log.append('Stopped after round #{}: {}'.format(round_num, self.stop_reason))
+                    break
+        yield from self.round_over_queries(round_state)
         self.log.append('')
-        self.log.append('Final' + STATUS(players))
+        self.log.append('Final' + STATUS(seats))
         for i in range(NUM_BOARDS):
-            self.log.append('Table ' + str(i+1) + TABLE_STATUS(players, i))
-        for player in players:
-            player.stop()
-        name = GAME_LOG_FILENAME + '.txt'
-        print('Writing', name)
-        with open(name, 'w') as log_file:
-            log_file.write('\n'.join(self.log))
+            self.log.append('Table ' + str(i+1) + TABLE_STATUS(seats, i))
+        if config.duplicate_deals:
+            self.log_paired_results(seats)
+        self.log_latencies(seats)
+        return seats
+
+    def close(self):
+        '''
+        Finishes the game log and hand history.
+        '''
+        if self.log.name is not None:
+            print('Writing', self.log.name)
+        self.log.close()
+        if self.hand_history is not None:
+            print('Writing', self.hand_history.name)
+            self.hand_history.close()
+
+    def result(self, seats, elapsed):
+        '''
+        Returns the MatchResult of the game, given the players in their starting seat order and the seconds it took.
+        '''
+        return MatchResult(tuple(player.name for player in seats), tuple(player.bankroll for player in seats),
+                           tuple(tuple(player.table_winnings) for player in seats), len(self.round_results), self.stop_reason,
+                           self.deal_seed, tuple(player.game_clock for player in seats),
+                           tuple(player.latency_summary() for player in seats), elapsed, self.log.name)
+
+
+class Match():
+    '''
+    Plays games between two pokerbots with every setting taken from a MatchConfig instead of config.py.
+
+    Matches with different settings can be played one after another in the same process, for
+    example from a training loop, and a match writes no files unless its config has an output_dir.
+    '''
+
+    def __init__(self, config=None, pool=None):
+        self.config = config if config is not None else MatchConfig()
+        self.pool = pool
+
+    def run(self, build=True):
+        '''
+        Plays one game and returns its MatchResult.
+
+        Pokerbots are leased from the match's BotPool when it has one.
+        '''
+        config = self.config
+        if config.output_dir is not None:
+            os.makedirs(config.output_dir, exist_ok=True)
+        game = Game(config.players, config.output_dir, config)
+        start_time = time.perf_counter()
+        seats = game.run(build, self.pool)
+        return game.result(seats, time.perf_counter() - start_time)
+
+
+def print_banner():
+    '''
+    Greets whoever runs the engine from the command line.
+    '''
+    print('   __  _____________  ___       __           __        __    ')
+    print('  /  |/  /  _/_  __/ / _ \\___  / /_____ ____/ /  ___  / /____')
+    print(' / /|_/ // /  / /   / ___/ _ \\/  \'_/ -_) __/ _ \\/ _ \\/ __(_-<')
+    print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
+    print()
+    print('Starting the Pokerbots engine...')
 
 
 if __name__ == '__main__':
-    Game().run()
+    print_banner()
+    Match(MatchConfig(output_dir='.')).run()
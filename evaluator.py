@@ -0,0 +1,179 @@
+'''
+Vectorized poker hand evaluation.
+
+Ranks many hands in one call. Each hand is a row of card indices, where a card's
+index is 4 * rank + suit (ranks 2 through A are 0 through 12, suits c, d, h, s
+are 0 through 3), and rows may hold 5 to 7 cards. Scores are identical to
+eval7.evaluate, so a higher score is a better hand. For a single pair of hands eval7 is
+faster, so the engine's showdowns use it.
+
+evaluator.py at the root of the repository is the source. python_skeleton/skeleton/evaluator.py
+is a verbatim copy for Python bots, and benchmarks/bench_evaluator.py fails if they differ.
+'''
+from collections import Counter
+from itertools import combinations, combinations_with_replacement
+import numpy as np
+
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+CARD_INDEX = {rank + suit: 4*i + j for i, rank in enumerate(RANKS) for j, suit in enumerate(SUITS)}
+
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = [value << 24 for value in range(9)]
+RANK_BITS = 1 << np.arange(13, dtype=np.int64)
+
+
+def _build_tables():
+    '''
+    Precomputes lookup tables indexed by 13-bit rank masks.
+    '''
+    masks = np.arange(1 << 13, dtype=np.int64)
+    popcount = ((masks[:, None] & RANK_BITS) != 0).sum(axis=1)
+    highest = np.zeros(1 << 13, dtype=np.int64)
+    for rank in range(13):
+        highest[(masks >> rank) > 0] = rank
+    straight = np.full(1 << 13, -1, dtype=np.int64)
+    wheel = RANK_BITS[12] | 0b1111
+    straight[(masks & wheel) == wheel] = 3
+    for high in range(4, 13):
+        run = 0b11111 << (high - 4)
+        straight[(masks & run) == run] = high
+    # top[k][mask] packs the k highest ranks of mask into consecutive nibbles, highest first
+    top = [np.zeros(1 << 13, dtype=np.int64)]
+    rest = masks.copy()
+    for _ in range(5):
+        rank = highest[rest]
+        top.append((top[-1] << 4) | rank)
+        rest &= ~(1 << rank)
+    return popcount, highest, straight, top
+
+
+POPCOUNT, HIGHEST, STRAIGHT_HIGH, TOP = _build_tables()
+
+
+def card_index(card):
+    '''
+    Returns the index of a card given as a string such as 'As' or as an eval7.Card.
+    '''
+    if isinstance(card, str):
+        return CARD_INDEX[card]
+    return 4*card.rank + card.suit
+
+
+def card_indices(cards):
+    '''
+    Returns the indices of a sequence of cards.
+    '''
+    return [card_index(card) for card in cards]
+
+
+def _evaluate_masks(cards):
+    '''
+    Scores hands shaped (..., 5 to 7) from their rank masks, without the 7-card tables.
+    '''
+    cards = np.asarray(cards, dtype=np.int64)
+    ranks = cards >> 2
+    suits = cards & 3
+    bits = RANK_BITS[ranks]
+    counts = (ranks[..., None] == np.arange(13)).sum(axis=-2)
+    single = np.bitwise_or.reduce(bits, axis=-1)
+    double = ((counts >= 2) * RANK_BITS).sum(axis=-1)
+    triple = ((counts >= 3) * RANK_BITS).sum(axis=-1)
+    quad = ((counts == 4) * RANK_BITS).sum(axis=-1)
+    suited = np.stack([np.bitwise_or.reduce(np.where(suits == suit, bits, 0), axis=-1) for suit in range(4)], axis=-1)
+    suited_counts = POPCOUNT[suited]
+    flush_mask = np.take_along_axis(suited, suited_counts.argmax(axis=-1)[..., None], axis=-1)[..., 0]
+    is_flush = suited_counts.max(axis=-1) >= 5
+    straight_flush = STRAIGHT_HIGH[flush_mask]
+    straight = STRAIGHT_HIGH[single]
+    quad_rank = HIGHEST[quad]
+    trips_rank = HIGHEST[triple]
+    pair_rank = HIGHEST[double]
+    full_house_pair = double & ~(1 << trips_rank)
+    second_pair_rank = HIGHEST[double & ~(1 << pair_rank)]
+    two_pair_kickers = single & ~(1 << pair_rank) & ~(1 << second_pair_rank)
+    conditions = [
+        is_flush & (straight_flush >= 0),
+        quad != 0,
+        (triple != 0) & (full_house_pair != 0),
+        is_flush,
+        straight >= 0,
+        triple != 0,
+        POPCOUNT[double] >= 2,
+        double != 0,
+    ]
+    choices = [
+        STRAIGHT_FLUSH | (straight_flush << 16),
+        QUADS | (quad_rank << 16) | (HIGHEST[single & ~(1 << quad_rank)] << 12),
+        FULL_HOUSE | (trips_rank << 16) | (HIGHEST[full_house_pair] << 12),
+        FLUSH | TOP[5][flush_mask],
+        STRAIGHT | (straight << 16),
+        TRIPS | (trips_rank << 16) | (TOP[2][single & ~(1 << trips_rank)] << 8),
+        TWO_PAIR | (pair_rank << 16) | (second_pair_rank << 12) | (HIGHEST[two_pair_kickers] << 8),
+        PAIR | (pair_rank << 16) | (TOP[3][single & ~(1 << pair_rank)] << 4),
+    ]
+    return np.select(conditions, choices, HIGH_CARD | TOP[5][single])
+
+
+def _build_seven_card_tables():
+    '''
+    Precomputes the score of every 7-card rank multiset and of every flush suit mask.
+    '''
+    multisets = [combo for combo in combinations_with_replacement(range(13), 7) if max(Counter(combo).values()) <= 4]
+    multisets = np.array(multisets, dtype=np.int64)
+    # suits dealt round robin never make a flush, so these are the non-flush scores
+    non_flush_scores = _evaluate_masks(4*multisets + np.arange(7) % 4)
+    keys = RANK_KEYS[multisets].sum(axis=1)
+    assert len(np.unique(keys)) == len(keys), 'rank keys must be a perfect hash'
+    scores, classes = np.unique(non_flush_scores, return_inverse=True)
+    rank_table = np.zeros(keys.max() + 1, dtype=np.uint16)
+    rank_table[keys] = classes
+    flush_table = np.zeros(1 << 13, dtype=np.int64)
+    for size in (5, 6, 7):
+        masks = [sum(1 << rank for rank in combo) for combo in combinations(range(13), size)]
+        ranks = np.array([[rank for rank in range(13) if mask >> rank & 1] for mask in masks], dtype=np.int64)
+        flush_table[masks] = _evaluate_masks(4*ranks)
+    flush_suit = np.full(1 << 12, -1, dtype=np.int64)
+    for suit_key in range(1 << 12):
+        for suit in range(4):
+            if (suit_key >> (3*suit)) & 7 >= 5:
+                flush_suit[suit_key] = suit
+    return scores, rank_table, flush_table, flush_suit
+
+
+# perfect hash of a 7-card rank multiset: distinct multisets have distinct key sums
+RANK_KEYS = np.array([0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181], dtype=np.int64)
+CARD_RANK_KEY = RANK_KEYS[np.arange(52) >> 2]
+CARD_SUIT_KEY = 1 << (3*(np.arange(52) & 3))
+CARD_RANK_BIT = RANK_BITS[np.arange(52) >> 2]
+CARD_SUIT = np.arange(52) & 3
+SCORES, RANK_TABLE, FLUSH_TABLE, FLUSH_SUIT = _build_seven_card_tables()
+
+
+def evaluate(cards):
+    '''
+    Scores every hand in an array of card indices shaped (..., 5 to 7).
+
+    Returns an int64 array shaped like cards without its last axis.
+    '''
+    cards = np.asarray(cards, dtype=np.int64)
+    if cards.shape[-1] != 7:
+        return _evaluate_masks(cards)
+    scores = SCORES[RANK_TABLE[CARD_RANK_KEY[cards].sum(axis=-1)]]
+    flush_suit = FLUSH_SUIT[CARD_SUIT_KEY[cards].sum(axis=-1)]
+    flushes = flush_suit >= 0
+    if flushes.any():
+        flush_cards = cards[flushes]
+        suited = CARD_SUIT[flush_cards] == flush_suit[flushes][:, None]
+        flush_masks = (CARD_RANK_BIT[flush_cards] * suited).sum(axis=-1)
+        # a flush beats every non-flush hand a 7-card flush can also make
+        scores[flushes] = FLUSH_TABLE[flush_masks]
+    return scores
+
+
+def evaluate_hands(hands, board):
+    '''
+    Scores several hole card pairs against one shared board, given as cards or indices.
+    '''
+    board = [card if isinstance(card, int) else card_index(card) for card in board]
+    rows = [[card if isinstance(card, int) else card_index(card) for card in hand] + board for hand in hands]
+    return evaluate(rows)
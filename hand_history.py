@@ -0,0 +1,165 @@
+'''
+Structured binary hand histories.
+
+Next to the text game log, the engine can write every event of a game as fixed-width
+20-byte records to GAME_LOG_FILENAME.hh, with the offset of each round's first record in
+GAME_LOG_FILENAME.hhi. A round can be read with a single seek, and a whole file can be
+memory-mapped as a NumPy structured array for analysis.
+
+Each record holds:
+    kind    one of the record kinds below
+    board   board number from 1, or 0 for records about the whole round
+    seat    0 or 1, the player's seat in the order the game was started with
+    street  0 (preflop), 3 (flop), 4 (turn) or 5 (river)
+    round   round number from 1
+    amount  raise amount, pot, or bankroll delta depending on the kind
+    cards   up to 8 card indices (4 * rank + suit, see evaluator.py), NO_CARD where unused
+'''
+import struct
+import os
+import numpy as np
+
+from evaluator import card_indices
+
+ROUND, DEAL, ASSIGN, FOLD, CALL, CHECK, BET, RAISE, BOARD, SHOW, RESULT, ROUND_END = range(12)
+KIND_NAMES = ['ROUND', 'DEAL', 'ASSIGN', 'FOLD', 'CALL', 'CHECK', 'BET', 'RAISE', 'BOARD', 'SHOW', 'RESULT', 'ROUND_END']
+NO_CARD = 255
+MAX_CARDS = 8
+
+RECORD = struct.Struct('<BBBBIi8B')
+RECORD_DTYPE = np.dtype([('kind', '<u1'), ('board', '<u1'), ('seat', '<u1'), ('street', '<u1'),
+                         ('round', '<u4'), ('amount', '<i4'), ('cards', '<u1', (MAX_CARDS,))])
+INDEX_DTYPE = np.dtype('<u8')
+assert RECORD.size == RECORD_DTYPE.itemsize
+
+
+class HandHistoryWriter():
+    '''
+    Buffers the records of the current round and appends them to the hand history file when the round ends.
+
+    Records name players by their position in the current round, 0 for the small blind,
+    and are stored with the seat of that player.
+    '''
+
+    def __init__(self, name):
+        self.name = name + '.hh'
+        self.index_name = name + '.hhi'
+        self.file = open(self.name, 'wb')
+        self.index_file = open(self.index_name, 'wb')
+        self.num_records = 0
+        self.buffer = bytearray()
+        self.round_num = 0
+        self.first_seat = 0
+
+    def record(self, kind, board=0, position=0, street=0, amount=0, cards=()):
+        '''
+        Adds one record to the current round, with cards given as eval7.Card's.
+        '''
+        indices = card_indices(cards)
+        indices += [NO_CARD] * (MAX_CARDS - len(indices))
+        self.buffer += RECORD.pack(kind, board, position ^ self.first_seat, street, self.round_num, amount, *indices)
+
+    def start_round(self, round_num, first_seat):
+        '''
+        Begins a round in which the given seat is the small blind, and writes its ROUND record.
+        '''
+        self.round_num = round_num
+        self.first_seat = first_seat
+        self.index_file.write(struct.pack('<Q', self.num_records))
+        self.record(ROUND)
+
+    def deal(self, position, hand):
+        '''
+        Records a player's hole cards, MAX_CARDS to a record.
+        '''
+        for i in range(0, len(hand), MAX_CARDS):
+            self.record(DEAL, 0, position, 0, 0, hand[i:i+MAX_CARDS])
+
+    def end_round(self):
+        '''
+        Appends the current round's records to the file.
+        '''
+        self.num_records += len(self.buffer) // RECORD.size
+        self.file.write(self.buffer)
+        self.buffer = bytearray()
+
+    def flush(self):
+        '''
+        Pushes every finished round to disk.
+        '''
+        self.file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        '''
+        Finishes the hand history and its index.
+        '''
+        self.end_round()
+        self.file.close()
+        self.index_file.close()
+
+
+class HandHistory():
+    '''
+    Memory-maps a hand history file written by the engine.
+
+    Fields are NumPy arrays over every record of the game, for example
+    history.amount[history.kind == RAISE] holds every raise amount.
+    '''
+
+    def __init__(self, name):
+        if name.endswith('.hh'):
+            name = name[:-len('.hh')]
+        self.records = read_records(name + '.hh')
+        self.offsets = np.fromfile(name + '.hhi', dtype=INDEX_DTYPE)
+        self.kind = self.records['kind']
+        self.board = self.records['board']
+        self.seat = self.records['seat']
+        self.street = self.records['street']
+        self.round = self.records['round']
+        self.amount = self.records['amount']
+        self.cards = self.records['cards']
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def round_records(self, round_num):
+        '''
+        Returns the records of one round, numbered from 1.
+        '''
+        start = int(self.offsets[round_num - 1])
+        end = int(self.offsets[round_num]) if round_num < len(self.offsets) else len(self.records)
+        return self.records[start:end]
+
+    def round_deltas(self):
+        '''
+        Returns an array shaped (rounds, 2) of each seat's bankroll delta per round.
+        '''
+        deltas = np.zeros((len(self.offsets), 2), dtype=np.int64)
+        ends = self.records[self.kind == ROUND_END]
+        deltas[ends['round'] - 1, ends['seat']] = ends['amount']
+        return deltas
+
+
+def read_records(name):
+    '''
+    Memory-maps every record of a hand history file as a structured array.
+    '''
+    if os.path.getsize(name) == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(name, dtype=RECORD_DTYPE, mode='r')
+
+
+def read_round(name, round_num):
+    '''
+    Reads the records of one round, numbered from 1, with one seek into the index and one into the records.
+    '''
+    if name.endswith('.hh'):
+        name = name[:-len('.hh')]
+    with open(name + '.hhi', 'rb') as index_file:
+        index_file.seek((round_num - 1) * INDEX_DTYPE.itemsize)
+        offsets = np.frombuffer(index_file.read(2 * INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)
+    with open(name + '.hh', 'rb') as history_file:
+        history_file.seek(int(offsets[0]) * RECORD.size)
+        data = history_file.read((int(offsets[1]) - int(offsets[0])) * RECORD.size if len(offsets) == 2 else -1)
+    return np.frombuffer(data, dtype=RECORD_DTYPE)
@@ -7,9 +7,20 @@ import java.util.Collections;
 import java.lang.Integer;
 import java.lang.String;
 import java.net.Socket;
+import java.net.SocketAddress;
+import java.net.ProtocolFamily;
+import java.net.StandardProtocolFamily;
+import java.nio.channels.Channels;
+import java.nio.channels.SocketChannel;
+import java.nio.ByteBuffer;
+import java.nio.ByteOrder;
+import java.io.Closeable;
 import java.io.PrintWriter;
 import java.io.BufferedReader;
 import java.io.InputStreamReader;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.DataInputStream;
 import java.io.IOException;
 
 /**
@@ -19,9 +30,21 @@ public class Runner {
     private String host;
     private int port;
     private Bot pokerbot;
-    private Socket socket;
+    private Closeable socket;
     private PrintWriter outStream;
     private BufferedReader inStream;
+    private DataInputStream frameInStream;
+    private OutputStream frameOutStream;
+    private GameState gameState;
+    private State roundState;
+    private int active;
+    private boolean roundFlag;
+
+    // the engine may offer the binary protocol, see engine.py for its layout
+    public static final String PROTOCOL_VERSION = "V1";
+    private static final String RANKS = "23456789TJQKA";
+    private static final String SUITS = "cdhs";
+    private static final int UNKNOWN_CARD = 255;
 
     /**
      * Returns an incoming message from the engine.
@@ -31,6 +54,75 @@ public class Runner {
         return line.split(" ");
     }
 
+    private static String cardName(int card) {
+        if (card >= 52) {
+            return "";
+        }
+        return "" + RANKS.charAt(card / 4) + SUITS.charAt(card % 4);
+    }
+
+    private static byte cardByte(String card) {
+        return (byte)(4 * RANKS.indexOf(card.charAt(0)) + SUITS.indexOf(card.charAt(1)));
+    }
+
+    /**
+     * Reads the cards of a binary clause, a count followed by one byte per card.
+     */
+    private static List<String> readCards(ByteBuffer frame) {
+        int count = frame.get() & 0xff;
+        List<String> cards = new ArrayList<String>(count);
+        for (int i = 0; i < count; i++) {
+            cards.add(cardName(frame.get() & 0xff));
+        }
+        return cards;
+    }
+
+    /**
+     * Reads a binary frame from the engine, a little-endian uint32 length and the payload.
+     */
+    public ByteBuffer receiveFrame() throws IOException {
+        byte[] header = new byte[4];
+        this.frameInStream.readFully(header);
+        byte[] payload = new byte[ByteBuffer.wrap(header).order(ByteOrder.LITTLE_ENDIAN).getInt()];
+        this.frameInStream.readFully(payload);
+        return ByteBuffer.wrap(payload).order(ByteOrder.LITTLE_ENDIAN);
+    }
+
+    /**
+     * Encodes an action as a binary frame and sends it to the engine.
+     */
+    public void sendFrame(List<Action> actions) throws IOException {
+        ByteBuffer frame = ByteBuffer.allocate(4 + 4 * State.NUM_BOARDS).order(ByteOrder.LITTLE_ENDIAN);
+        frame.putInt(4 * State.NUM_BOARDS);
+        for (int i = 0; i < State.NUM_BOARDS; i++) {
+            Action action = actions.get(i);
+            switch (action.actionType) {
+                case ASSIGN_ACTION_TYPE: {
+                    frame.put((byte)'A').put(cardByte(action.cards.get(0))).put(cardByte(action.cards.get(1))).put((byte)0);
+                    break;
+                }
+                case FOLD_ACTION_TYPE: {
+                    frame.put((byte)'F').put(new byte[3]);
+                    break;
+                }
+                case CALL_ACTION_TYPE: {
+                    frame.put((byte)'C').put(new byte[3]);
+                    break;
+                }
+                case CHECK_ACTION_TYPE: {
+                    frame.put((byte)'K').put(new byte[3]);
+                    break;
+                }
+                default: {  // RAISE_ACTION_TYPE
+                    frame.put((byte)'R').putShort((short)action.amount).put((byte)0);
+                    break;
+                }
+            }
+        }
+        this.frameOutStream.write(frame.array());
+        this.frameOutStream.flush();
+    }
+
     /**
      * Encodes an action and sends it to the engine.
      */
@@ -64,83 +156,187 @@ public class Runner {
         this.outStream.println(code);
     }
 
+    /**
+     * Returns the pokerbot's actions, or the ack the engine expects between rounds.
+     */
+    private List<Action> respond() {
+        if (this.roundFlag) {  // ack the engine
+            List<Action> ack = new ArrayList<Action>();
+            for (int i = 0; i < State.NUM_BOARDS; i++) {
+                ack.add(new Action(ActionType.CHECK_ACTION_TYPE));
+            }
+            return ack;
+        }
+        return this.pokerbot.getActions(this.gameState, (RoundState)this.roundState, this.active);
+    }
+
+    /**
+     * Updates the player's game clock.
+     */
+    private void setClock(float gameClock) {
+        this.gameState = new GameState(this.gameState.bankroll, this.gameState.oppBankroll, gameClock, this.gameState.roundNum);
+    }
+
+    /**
+     * Starts a new round with the player's hole cards.
+     */
+    private void startRound(List<String> cards) {
+        List<List<String>> hands = new ArrayList<List<String>>(
+            Arrays.asList(
+                new ArrayList<String>(),
+                new ArrayList<String>()
+            )
+        );
+        hands.set(this.active, cards);
+        String[] oppHands = new String[cards.size()];
+        Arrays.fill(oppHands, "");
+        hands.set(1 - this.active, Arrays.asList(oppHands));
+        List<String> deck = new ArrayList<String>(Arrays.asList("", "", "", "", ""));
+        List<Integer> pips = Arrays.asList(State.SMALL_BLIND, State.BIG_BLIND);
+        List<State> boardStates = new ArrayList<State>();
+        for (int i = 0; i < State.NUM_BOARDS; i++) {
+            boardStates.add(new BoardState((i+1)*State.BIG_BLIND, pips,
+                            Arrays.asList(new ArrayList<String>(), new ArrayList<String>()),
+                            deck, null));
+        }
+        List<Integer> stacks = Arrays.asList(State.STARTING_STACK - State.NUM_BOARDS*State.SMALL_BLIND,
+                                             State.STARTING_STACK - State.NUM_BOARDS*State.BIG_BLIND);
+        this.roundState = new RoundState(-2, 0, stacks, hands, boardStates, null);
+        if (this.roundFlag) {
+            this.pokerbot.handleNewRound(this.gameState, (RoundState)this.roundState, this.active);
+            this.roundFlag = false;
+        }
+    }
+
+    /**
+     * Ends the round with the player's and the opponent's bankroll deltas.
+     */
+    private void endRound(int delta, int oppDelta) {
+        List<Integer> deltas = new ArrayList<Integer>(Arrays.asList(delta, oppDelta));
+        deltas.set(this.active, delta);
+        deltas.set(1 - this.active, oppDelta);
+        this.roundState = new TerminalState(deltas, ((TerminalState)this.roundState).previousState);
+        GameState gameState = this.gameState;
+        gameState = new GameState(gameState.bankroll + delta, gameState.oppBankroll + oppDelta, gameState.gameClock, gameState.roundNum);
+        this.pokerbot.handleRoundOver(gameState, (TerminalState)this.roundState, this.active);
+        this.gameState = new GameState(gameState.bankroll, gameState.oppBankroll, gameState.gameClock, gameState.roundNum + 1);
+        this.roundFlag = true;
+    }
+
+    /**
+     * Resets the game state for a new game against a warm bot.
+     */
+    private void newGame() {
+        this.gameState = new GameState(0, 0, (float)0., 1);
+        this.roundFlag = true;
+    }
+
+    /**
+     * Shows the board cards dealt so far on each board.
+     */
+    private static State updateBoards(List<List<String>> boards, State roundState) {
+        List<State> newBoardStates = new ArrayList<State>();
+        for (int i = 0; i < State.NUM_BOARDS; i++) {
+            List<String> cards = boards.get(i);
+            List<String> revisedDeck = new ArrayList<String>(Arrays.asList("", "", "", "", ""));
+            for (int j = 0; j < cards.size(); j++) {
+                revisedDeck.set(j, cards.get(j));
+            }
+            if (((RoundState)roundState).boardStates.get(i) instanceof BoardState) {
+                BoardState maker = (BoardState)((RoundState)roundState).boardStates.get(i);
+                newBoardStates.add(new BoardState(maker.pot, maker.pips, maker.hands,
+                                                    revisedDeck, maker.previousState));
+            } else {
+                TerminalState terminal = (TerminalState)((RoundState)roundState).boardStates.get(i);
+                BoardState maker = (BoardState)terminal.previousState;
+                newBoardStates.add(new TerminalState(terminal.deltas,
+                                                    new BoardState(maker.pot, maker.pips, maker.hands,
+                                                                    revisedDeck, maker.previousState,
+                                                                    maker.settled)));
+            }
+        }
+        RoundState maker = (RoundState)roundState;
+        return new RoundState(maker.button, maker.street, maker.stacks, maker.hands,
+                                newBoardStates, maker.previousState);
+    }
+
+    /**
+     * Shows the opponent's hand on each board, null where it was not shown, and ends the round.
+     */
+    private static State revealHands(List<List<String>> oppHands, State roundState, int active) {
+        List<State> newBoardStates = new ArrayList<State>();
+        roundState = (RoundState)((TerminalState)roundState).previousState;
+        for (int i = 0; i < State.NUM_BOARDS; i++) {
+            if (oppHands.get(i) == null) {
+                newBoardStates.add(((RoundState)roundState).boardStates.get(i));
+            } else {
+                // backtrack
+                TerminalState terminal = (TerminalState)((RoundState)roundState).boardStates.get(i);
+                BoardState maker = (BoardState)terminal.previousState;
+                List<List<String>> revisedHands = new ArrayList<List<String>>(maker.hands);
+                revisedHands.set(1 - active, oppHands.get(i));
+                newBoardStates.add(new TerminalState(terminal.deltas, new BoardState(maker.pot, maker.pips, revisedHands, maker.deck, maker.previousState, maker.settled)));
+            }
+        }
+        RoundState maker = (RoundState)roundState;
+        roundState = new RoundState(maker.button, maker.street, maker.stacks, maker.hands, newBoardStates, maker.previousState);
+        return new TerminalState(Arrays.asList(0, 0), roundState);
+    }
+
     /**
      * Reconstructs the game tree based on the action history received from the engine.
      */
     public void run() throws IOException {
-        GameState gameState = new GameState(0, 0, (float)0., 1);
+        this.newGame();
         List<State> boardStates = new ArrayList<State>();
         for (int i = 0; i < State.NUM_BOARDS; i++) {
             boardStates.add(new BoardState((i+1)*State.BIG_BLIND, Arrays.asList(0, 0),
                                             Arrays.asList(Arrays.asList(""), Arrays.asList("")),
                                             Arrays.asList(""), null));
         }
-        State roundState = new RoundState(-2, 0, Arrays.asList(0, 0),
-                                          Arrays.asList(Arrays.asList(""), Arrays.asList("")),
-                                          boardStates, null);
-        int active = 0;
-        boolean roundFlag = true;
+        this.roundState = new RoundState(-2, 0, Arrays.asList(0, 0),
+                                         Arrays.asList(Arrays.asList(""), Arrays.asList("")),
+                                         boardStates, null);
+        this.active = 0;
         while (true) {
             String[] packet = this.receive();
+            if (packet.length == 1 && PROTOCOL_VERSION.equals(packet[0])) {
+                // accept the binary protocol and use it from now on
+                this.outStream.println(PROTOCOL_VERSION);
+                this.runBinary();
+                return;
+            }
             for (String clause : packet) {
                 String leftover = clause.substring(1, clause.length());
                 switch (clause.charAt(0)) {
                     case 'T': {
-                        gameState = new GameState(gameState.bankroll, gameState.oppBankroll, Float.parseFloat(leftover), gameState.roundNum);
+                        this.setClock(Float.parseFloat(leftover));
                         break;
                     }
                     case 'P': {
-                        active = Integer.parseInt(leftover);
+                        this.active = Integer.parseInt(leftover);
                         break;
                     }
                     case 'H': {
-                        String[] cards = leftover.split(",");
-                        List<List<String>> hands = new ArrayList<List<String>>(
-                            Arrays.asList(
-                                new ArrayList<String>(),
-                                new ArrayList<String>()
-                            )
-                        );
-                        hands.set(active, Arrays.asList(cards));
-                        String[] oppHands = new String[cards.length];
-                        Arrays.fill(oppHands, "");
-                        hands.set(1 - active, Arrays.asList(oppHands));
-                        List<String> deck = new ArrayList<String>(Arrays.asList("", "", "", "", ""));
-                        List<Integer> pips = Arrays.asList(State.SMALL_BLIND, State.BIG_BLIND);
-                        boardStates = new ArrayList<State>();
-                        for (int i = 0; i < State.NUM_BOARDS; i++) {
-                            boardStates.add(new BoardState((i+1)*State.BIG_BLIND, pips,
-                                            Arrays.asList(new ArrayList<String>(), new ArrayList<String>()),
-                                            deck, null));
-                        }
-                        List<Integer> stacks = Arrays.asList(State.STARTING_STACK - State.NUM_BOARDS*State.SMALL_BLIND,
-                                                             State.STARTING_STACK - State.NUM_BOARDS*State.BIG_BLIND);
-                        roundState = new RoundState(-2, 0, stacks, hands, boardStates, null);
-                        if (roundFlag) {
-                            this.pokerbot.handleNewRound(gameState, (RoundState)roundState, active);
-                            roundFlag = false;
-                        }
+                        this.startRound(Arrays.asList(leftover.split(",")));
                         break;
                     }
                     case 'D': {
                         String[] subclauses = clause.split(";");
                         int delta = Integer.parseInt(subclauses[0].substring(1, subclauses[0].length()));
                         int oppDelta = Integer.parseInt(subclauses[1].substring(1, subclauses[1].length()));
-                        List<Integer> deltas = new ArrayList<Integer>(Arrays.asList(delta, oppDelta));
-                        deltas.set(active, delta);
-                        deltas.set(1-active, oppDelta);
-                        roundState = new TerminalState(deltas, ((TerminalState)roundState).previousState);
-                        gameState = new GameState(gameState.bankroll + delta, gameState.oppBankroll + oppDelta, gameState.gameClock, gameState.roundNum);
-                        this.pokerbot.handleRoundOver(gameState, (TerminalState)roundState, active);
-                        gameState = new GameState(gameState.bankroll, gameState.oppBankroll, gameState.gameClock, gameState.roundNum + 1);
-                        roundFlag = true;
+                        this.endRound(delta, oppDelta);
+                        break;
+                    }
+                    case 'N': {
+                        this.newGame();
                         break;
                     }
                     case 'Q': {
                         return;
                     }
                     case '1': {
-                        roundState = this.parseMultiCode(clause, roundState, active);
+                        this.roundState = this.parseMultiCode(clause, this.roundState, this.active);
                         break;
                     }
                     default: {
@@ -148,17 +344,108 @@ public class Runner {
                     }
                 }
             }
-            if (roundFlag) {  // ack the engine
-                List<Action> ack = new ArrayList<Action>();
-                for (int i = 0; i < State.NUM_BOARDS; i++) {
-                    ack.add(new Action(ActionType.CHECK_ACTION_TYPE));
+            this.send(this.respond());
+        }
+    }
+
+    /**
+     * Plays the rest of the game over binary frames, which are decoded straight into the game state.
+     */
+    private void runBinary() throws IOException {
+        while (this.processFrame(this.receiveFrame())) {
+            this.sendFrame(this.respond());
+        }
+    }
+
+    /**
+     * Reconstructs the game tree from one binary message, returning false once the game is over.
+     */
+    private boolean processFrame(ByteBuffer frame) {
+        while (frame.hasRemaining()) {
+            char letter = (char)frame.get();
+            switch (letter) {
+                case 'T': {
+                    this.setClock(frame.getInt() / (float)1000.);
+                    break;
+                }
+                case 'P': {
+                    this.active = frame.get() & 0xff;
+                    break;
+                }
+                case 'H': {
+                    this.startRound(readCards(frame));
+                    break;
+                }
+                case 'D': {
+                    int delta = frame.getInt();
+                    int oppDelta = frame.getInt();
+                    this.endRound(delta, oppDelta);
+                    break;
+                }
+                case 'N': {
+                    this.newGame();
+                    break;
+                }
+                case 'B': {
+                    List<List<String>> boards = new ArrayList<List<String>>();
+                    for (int i = 0; i < State.NUM_BOARDS; i++) {
+                        boards.add(readCards(frame));
+                    }
+                    this.roundState = updateBoards(boards, this.roundState);
+                    break;
+                }
+                case 'O': {
+                    List<List<String>> oppHands = new ArrayList<List<String>>();
+                    for (int i = 0; i < State.NUM_BOARDS; i++) {
+                        List<String> cards = readCards(frame);
+                        oppHands.add(cards.isEmpty() ? null : cards);
+                    }
+                    this.roundState = revealHands(oppHands, this.roundState, this.active);
+                    break;
+                }
+                case 'A': {
+                    List<Action> actions = new ArrayList<Action>();
+                    for (int i = 0; i < State.NUM_BOARDS; i++) {
+                        char code = (char)frame.get();
+                        int first = frame.get() & 0xff;
+                        int second = frame.get() & 0xff;
+                        frame.get();
+                        switch (code) {
+                            case 'F': {
+                                actions.add(new Action(ActionType.FOLD_ACTION_TYPE));
+                                break;
+                            }
+                            case 'C': {
+                                actions.add(new Action(ActionType.CALL_ACTION_TYPE));
+                                break;
+                            }
+                            case 'K': {
+                                actions.add(new Action(ActionType.CHECK_ACTION_TYPE));
+                                break;
+                            }
+                            case 'R': {
+                                actions.add(new Action(ActionType.RAISE_ACTION_TYPE, first | second << 8));
+                                break;
+                            }
+                            default: {  // 'A'
+                                if (first == UNKNOWN_CARD) {
+                                    actions.add(new Action(ActionType.ASSIGN_ACTION_TYPE, Arrays.asList("", "")));
+                                } else {
+                                    actions.add(new Action(ActionType.ASSIGN_ACTION_TYPE, Arrays.asList(cardName(first), cardName(second))));
+                                }
+                                break;
+                            }
+                        }
+                    }
+                    this.roundState = ((RoundState)this.roundState).proceed(actions);
+                    break;
+                }
+                default: {  // Q
+                    return false;
                 }
-                this.send(ack);
-            } else {
-                List<Action> actions = this.pokerbot.getActions(gameState, (RoundState)roundState, active);
-                this.send(actions);
             }
         }
+        return true;
     }
 
     /**
@@ -167,50 +454,24 @@ public class Runner {
     public State parseMultiCode(String clause, State roundState, int active) {
         String[] subclauses = clause.split(";");
         if (clause.contains("B")) {
-            List<State> newBoardStates = new ArrayList<State>();
+            List<List<String>> boards = new ArrayList<List<String>>();
             for (int i = 0; i < State.NUM_BOARDS; i++) {
                 String leftover = subclauses[i].substring(2, subclauses[i].length());
-                String[] cards = leftover.split(",");
-                List<String> revisedDeck = new ArrayList<String>(Arrays.asList("", "", "", "", ""));
-                for (int j = 0; j < cards.length; j++) {
-                    revisedDeck.set(j, cards[j]);
-                }
-                if (((RoundState)roundState).boardStates.get(i) instanceof BoardState) {
-                    BoardState maker = (BoardState)((RoundState)roundState).boardStates.get(i);
-                    newBoardStates.add(new BoardState(maker.pot, maker.pips, maker.hands,
-                                                        revisedDeck, maker.previousState));
-                } else {
-                    TerminalState terminal = (TerminalState)((RoundState)roundState).boardStates.get(i);
-                    BoardState maker = (BoardState)terminal.previousState;
-                    newBoardStates.add(new TerminalState(terminal.deltas,
-                                                        new BoardState(maker.pot, maker.pips, maker.hands,
-                                                                        revisedDeck, maker.previousState,
-                                                                        maker.settled)));
-                }
+                boards.add(Arrays.asList(leftover.split(",")));
             }
-            RoundState maker = (RoundState)roundState;
-            return new RoundState(maker.button, maker.street, maker.stacks, maker.hands,
-                                    newBoardStates, maker.previousState);
+            return updateBoards(boards, roundState);
         } else if (clause.contains("O")) {
-            List<State> newBoardStates = new ArrayList<State>();
-            roundState = (RoundState)((TerminalState)roundState).previousState;
+            List<List<String>> oppHands = new ArrayList<List<String>>();
             for (int i = 0; i < State.NUM_BOARDS; i++) {
                 String leftover = subclauses[i].substring(2, subclauses[i].length());
                 if ("".equals(leftover)) {
-                    newBoardStates.add(((RoundState)roundState).boardStates.get(i));
+                    oppHands.add(null);
                 } else {
-                    // backtrack
                     String[] cards = leftover.split(",");
-                    TerminalState terminal = (TerminalState)((RoundState)roundState).boardStates.get(i);
-                    BoardState maker = (BoardState)terminal.previousState;
-                    List<List<String>> revisedHands = new ArrayList<List<String>>(maker.hands);
-                    revisedHands.set(1 - active, Arrays.asList(cards[0], cards[1]));
-                    newBoardStates.add(new TerminalState(terminal.deltas, new BoardState(maker.pot, maker.pips, revisedHands, maker.deck, maker.previousState, maker.settled)));
+                    oppHands.add(Arrays.asList(cards[0], cards[1]));
                 }
             }
-            RoundState maker = (RoundState)roundState;
-            roundState = new RoundState(maker.button, maker.street, maker.stacks, maker.hands, newBoardStates, maker.previousState);
-            return new TerminalState(Arrays.asList(0, 0), roundState);
+            return revealHands(oppHands, roundState, active);
         }
         else {
             List<Action> actions = new ArrayList<Action>();
@@ -251,6 +512,7 @@ public class Runner {
         }
     }
 
+
     /**
      * Parses arguments corresponding to socket connection information.
      */
@@ -271,19 +533,62 @@ public class Runner {
         }
     }
 
+    /**
+     * Connects to the engine's unix domain socket when it offers one.
+     * Unix domain sockets need Java 16, so they are looked up by reflection
+     * and older versions fall back to TCP.
+     */
+    public boolean connectUnix(String path) {
+        if (path == null) {
+            return false;
+        }
+        try {
+            ProtocolFamily unix = StandardProtocolFamily.valueOf("UNIX");
+            SocketAddress address = (SocketAddress)Class.forName("java.net.UnixDomainSocketAddress")
+                .getMethod("of", String.class).invoke(null, path);
+            SocketChannel channel = (SocketChannel)SocketChannel.class
+                .getMethod("open", ProtocolFamily.class).invoke(null, unix);
+            try {
+                channel.connect(address);
+            } catch (IOException e) {
+                channel.close();
+                return false;
+            }
+            this.socket = channel;
+            this.openStreams(Channels.newInputStream(channel), Channels.newOutputStream(channel));
+            return true;
+        } catch (ReflectiveOperationException | IllegalArgumentException | IOException e) {
+            return false;
+        }
+    }
+
+    /**
+     * Wraps the socket's streams for the text protocol and for binary frames.
+     * The engine waits for the answer to its binary protocol offer before sending
+     * frames, so nothing is left buffered in the text reader when frames start.
+     */
+    private void openStreams(InputStream in, OutputStream out) {
+        this.outStream = new PrintWriter(out, true);
+        this.inStream = new BufferedReader(new InputStreamReader(in));
+        this.frameInStream = new DataInputStream(in);
+        this.frameOutStream = out;
+    }
+
     /**
      * Runs the pokerbot.
      */
     public void runBot(Bot pokerbot) {
         this.pokerbot = pokerbot;
-        try {
-            this.socket = new Socket(this.host, this.port);
-            this.socket.setTcpNoDelay(true);
-            this.outStream = new PrintWriter(socket.getOutputStream(), true);
-            this.inStream = new BufferedReader(new InputStreamReader(socket.getInputStream()));
-        } catch (IOException e) {
-            System.out.println("Could not connect to " + host + ":" + Integer.toString(port));
-            return;
+        if (!this.connectUnix(System.getenv("POKERBOTS_UNIX_SOCKET"))) {
+            try {
+                Socket tcpSocket = new Socket(this.host, this.port);
+                tcpSocket.setTcpNoDelay(true);
+                this.socket = tcpSocket;
+                this.openStreams(tcpSocket.getInputStream(), tcpSocket.getOutputStream());
+            } catch (IOException e) {
+                System.out.println("Could not connect to " + host + ":" + Integer.toString(port));
+                return;
+            }
         }
         try {
             this.run();
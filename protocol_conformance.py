@@ -0,0 +1,97 @@
+'''
+6.176 MIT POKERBOTS PROTOCOL CONFORMANCE CHECK
+Plays the same seeded game between two pokerbots over the text protocol and over the binary
+protocol, and checks that both pokerbots accept the binary protocol and play identical games.
+
+Pokerbots which decide only from the messages they receive play the same game over either
+protocol, so any difference points to a bug in a skeleton's binary encoding or decoding.
+Only the actions the pokerbots take are compared, so a pokerbot which never raises or folds
+leaves those action codes unchecked, and a note says so. The example skeletons only check and
+call; conformance_bots/ holds deterministic pokerbots for each language which raise and fold.
+'''
+import argparse
+import difflib
+import sys
+import os
+import re
+
+import engine
+from config import PLAYER_1_NAME, PLAYER_1_PATH, PLAYER_2_NAME, PLAYER_2_PATH, NUM_ROUNDS
+
+# latencies and the game clock left differ between any two games
+LATENCY_LINE = re.compile(r'^\S+ latency p50 ')
+# the game log lines of the actions whose codes a check-call pokerbot never sends
+UNCOMMON_ACTIONS = [('raised', re.compile(r' (raises to|bets) \d+ on board ')), ('folded', re.compile(r' folds on board '))]
+
+
+def play(config, protocol):
+    '''
+    Plays one seeded game over a protocol and returns the players and the lines of its game log.
+    '''
+    config = config._replace(bot_protocol=protocol, output_dir=os.path.join(config.output_dir, protocol))
+    os.makedirs(config.output_dir, exist_ok=True)
+    game = engine.Game(config.players, config.output_dir, config)
+    players = game.run()
+    with open(game.log.name) as log_file:
+        lines = [line for line in log_file.read().splitlines() if not LATENCY_LINE.match(line)]
+    return players, lines
+
+
+def check(player_specs, seed, rounds, output_dir):
+    '''
+    Plays the game over both protocols and returns the problems found and notes on the action codes left unchecked.
+    '''
+    # socket pokerbots and an uncompressed log, whatever config.py says
+    config = engine.MatchConfig(players=player_specs, output_dir=output_dir, num_rounds=rounds, deal_seed=seed,
+                                in_process_bots=False, game_log_compression=None)
+    _, text_lines = play(config, 'text')
+    players, binary_lines = play(config, 'binary')
+    problems = []
+    for player in players:
+        if not isinstance(player.socketfile, engine.BinaryConnection):
+            problems.append(player.name + ' did not accept the binary protocol')
+    if text_lines != binary_lines:
+        diff = list(difflib.unified_diff(text_lines, binary_lines, 'text', 'binary', lineterm='', n=1))
+        problems.append('the games differ:\n' + '\n'.join(diff[:40]))
+    return problems, unchecked_actions(players, text_lines)
+
+
+def unchecked_actions(players, lines):
+    '''
+    Returns a note for each pokerbot that never raised or never folded in the game, whose action codes went unchecked.
+    '''
+    notes = []
+    for player in players:
+        for action, pattern in UNCOMMON_ACTIONS:
+            if not any(line.startswith(player.name + ' ') and pattern.search(line) for line in lines):
+                notes.append('{} never {}, so that action code was not compared'.format(player.name, action))
+    return notes
+
+
+def parse_args():
+    '''
+    Parses the pokerbots to check and the game settings.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 protocol_conformance.py')
+    parser.add_argument('paths', nargs='*', default=[PLAYER_1_PATH, PLAYER_2_PATH],
+                        help='Two pokerbot directories, defaults to the players in config.py')
+    parser.add_argument('--seed', type=int, default=0, help='Deal seed of both games, defaults to 0')
+    parser.add_argument('--rounds', type=int, default=NUM_ROUNDS, help='Rounds per game, defaults to NUM_ROUNDS')
+    parser.add_argument('--output-dir', type=str, default='conformance', help='Directory for the logs of both games')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if len(args.paths) != 2:
+        print('The conformance check needs two pokerbots')
+        sys.exit(2)
+    problems, notes = check([(PLAYER_1_NAME, args.paths[0]), (PLAYER_2_NAME, args.paths[1])], args.seed, args.rounds, args.output_dir)
+    print()
+    for note in notes:
+        print('NOTE:', note)
+    for problem in problems:
+        print('FAIL:', problem)
+    if problems:
+        sys.exit(1)
+    print('PASS: both pokerbots accepted the binary protocol and played the same game over text and binary')
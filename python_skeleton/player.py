@@ -92,6 +92,10 @@ class Player(Bot):
         # stacks = [my_stack, opp_stack]
         # net_upper_raise_bound = round_state.raise_bounds()[1] # max raise across 3 boards
         # net_cost = 0 # keep track of the net additional amount you are spending across boards this round
+        # from skeleton.equity import board_equities
+        # equities = board_equities(round_state, active, budget=0.001) # your equity against a random hand on each board
+        # from skeleton.assignment import best_assignment
+        # assignment = best_assignment(my_cards) # the best split of your cards by preflop equity, assignment[i] goes to board i
         my_actions = [None] * NUM_BOARDS
         for i in range(NUM_BOARDS):
             if AssignAction in legal_actions[i]:
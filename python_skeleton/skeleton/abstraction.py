@@ -0,0 +1,272 @@
+'''
+Memory-mapped card abstraction tables.
+
+A bucket groups (hand, board) pairs of similar strength on one street, so strategies can be
+stored per bucket instead of per pair. Buckets are precomputed offline for every pair up to a
+relabeling of suits, and written to one file per street as an open-addressing hash table:
+
+    header      magic, number of board cards, number of buckets, number of slots and of entries
+    keys        two uint64 per slot packing the canonical key, zero for an empty slot
+    buckets     one uint8 per slot
+
+The canonical key of a pair orders the suits by the ranks of the hand and then of the board in
+each suit, so every relabeling of suits gives the same key. Bots memory-map the tables at
+startup, which is instant and shares the pages between processes, and each lookup computes the
+key and probes a few slots.
+
+Buckets are equal-population quantiles of the equity against a random hand. To build tables:
+
+    python3 -m skeleton.abstraction --streets preflop flop --buckets 8 --samples 128
+
+from the bot's directory, which writes them to abstraction/. Each street has many more pairs
+than the last (169 preflop, 1.3 million on the flop, 14 million on the turn and 123 million on
+the river), so the turn takes minutes and the river hours and gigabytes at the default sample count.
+'''
+from itertools import combinations
+import argparse
+import struct
+import time
+import os
+import numpy as np
+
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+CARD_INDEX = {rank + suit: 4*i + j for i, rank in enumerate(RANKS) for j, suit in enumerate(SUITS)}
+STREETS = {'preflop': 0, 'flop': 3, 'turn': 4, 'river': 5}
+TABLE_DIR = 'abstraction'
+HEADER = struct.Struct('<8sIIQQ')
+MAGIC = b'PBABSTR1'
+HEADER_SIZE = 64
+MAX_LOAD = 0.7
+MULTIPLIER_HI = 0x9E3779B97F4A7C15
+MULTIPLIER_LO = 0xC2B2AE3D27D4EB4F
+MASK = (1 << 64) - 1
+
+
+def parse_cards(cards):
+    '''
+    Returns the indices of the known cards in a sequence, skipping unknown '' entries.
+
+    The evaluator's tables are not loaded here, to keep a bot's startup fast.
+    '''
+    return [CARD_INDEX[card] if isinstance(card, str) else int(card) if isinstance(card, (int, np.integer)) else 4*card.rank + card.suit
+            for card in cards if card != '']
+
+
+def canonical_key(hand, board):
+    '''
+    Returns the canonical key of a hand and board, given as card indices, as two integers.
+    '''
+    suit_keys = [0, 0, 0, 0]
+    for card in hand:
+        suit_keys[card & 3] |= 1 << (13 + (card >> 2))
+    for card in board:
+        suit_keys[card & 3] |= 1 << (card >> 2)
+    suit_keys.sort(reverse=True)
+    return (suit_keys[0] << 26) | suit_keys[1], (suit_keys[2] << 26) | suit_keys[3]
+
+
+def canonical_keys(hands, boards):
+    '''
+    Returns the canonical keys of rows of hands and boards, as two uint64 arrays.
+    '''
+    rows = np.arange(len(hands))
+    suit_keys = np.zeros((len(hands), 4), dtype=np.uint64)
+    for cards, shift in ((hands, 13), (boards, 0)):
+        for column in cards.T:
+            suit_keys[rows, column & 3] |= np.uint64(1) << (np.uint64(shift) + (column >> 2).astype(np.uint64))
+    suit_keys = -np.sort(-suit_keys.astype(np.int64), axis=1).astype(np.uint64)
+    return (suit_keys[:, 0] << np.uint64(26)) | suit_keys[:, 1], (suit_keys[:, 2] << np.uint64(26)) | suit_keys[:, 3]
+
+
+def home_slot(key_hi, key_lo, bits):
+    '''
+    Returns the first slot probed for a key in a table of 2**bits slots.
+    '''
+    return ((key_hi * MULTIPLIER_HI + key_lo * MULTIPLIER_LO) & MASK) >> (64 - bits)
+
+
+def home_slots(keys_hi, keys_lo, bits):
+    '''
+    Returns the first slot probed for each key, with the same wrapping arithmetic as home_slot.
+    '''
+    with np.errstate(over='ignore'):
+        mixed = keys_hi * np.uint64(MULTIPLIER_HI) + keys_lo * np.uint64(MULTIPLIER_LO)
+    return (mixed >> np.uint64(64 - bits)).astype(np.int64)
+
+
+class AbstractionTable():
+    '''
+    Memory-maps the bucket table of one street.
+    '''
+
+    def __init__(self, name):
+        with open(name, 'rb') as table_file:
+            magic, self.board_cards, self.num_buckets, num_slots, self.num_entries = HEADER.unpack(table_file.read(HEADER.size))
+        assert magic == MAGIC, name + ' is not an abstraction table'
+        self.bits = num_slots.bit_length() - 1
+        self.mask = num_slots - 1
+        keys = np.memmap(name, dtype='<u8', mode='r', offset=HEADER_SIZE, shape=(num_slots, 2))
+        self.keys_hi = keys[:, 0]
+        self.keys_lo = keys[:, 1]
+        self.buckets = np.memmap(name, dtype=np.uint8, mode='r', offset=HEADER_SIZE + 16 * num_slots, shape=(num_slots,))
+
+    def __len__(self):
+        return self.num_entries
+
+    def bucket(self, hand, board):
+        '''
+        Returns the bucket of a hand and board given as card indices, or None if the pair is not in the table.
+        '''
+        key_hi, key_lo = canonical_key(hand, board)
+        slot = home_slot(key_hi, key_lo, self.bits)
+        while True:
+            slot_hi = int(self.keys_hi[slot])
+            if slot_hi == key_hi and int(self.keys_lo[slot]) == key_lo:
+                return int(self.buckets[slot])
+            if slot_hi == 0:
+                return None
+            slot = (slot + 1) & self.mask
+
+
+class Abstraction():
+    '''
+    Looks up buckets in the tables of every street found in a directory.
+    '''
+
+    def __init__(self, directory=TABLE_DIR):
+        self.tables = {}
+        for street, board_cards in STREETS.items():
+            name = os.path.join(directory, street + '.abs')
+            if os.path.isfile(name):
+                self.tables[board_cards] = AbstractionTable(name)
+
+    def bucket(self, hand, deck):
+        '''
+        Returns the bucket of a 2-card hand on the board cards dealt so far, as in a BoardState's deck.
+
+        Returns None when there is no table for the street.
+        '''
+        hand, board = parse_cards(hand), parse_cards(deck)
+        table = self.tables.get(len(board))
+        return table.bucket(hand, board) if table is not None else None
+
+
+def representative_hands():
+    '''
+    Returns one hand of each of the 169 starting hand classes, with how many hands the class holds.
+    '''
+    hands = []
+    for high in range(13):
+        for low in range(high + 1):
+            if high == low:
+                hands.append(([4*high, 4*low + 1], 6))
+            else:
+                hands.append(([4*high, 4*low], 4))
+                hands.append(([4*high, 4*low + 1], 12))
+    return hands
+
+
+def street_classes(board_cards):
+    '''
+    Yields the canonical keys of every hand and board on a street, one starting hand class at a time,
+    with a representative hand and board of each key and the number of pairs it stands for.
+
+    Keys of different starting hand classes never coincide, so each class can be made unique on its own.
+    '''
+    for hand, hand_count in representative_hands():
+        deck = [card for card in range(52) if card not in hand]
+        boards = np.array(list(combinations(deck, board_cards)), dtype=np.int64)
+        hands = np.broadcast_to(np.array(hand, dtype=np.int64), (len(boards), 2))
+        keys_hi, keys_lo = canonical_keys(hands, boards)
+        keys = np.stack([keys_hi, keys_lo], axis=1)
+        keys, first, counts = np.unique(keys, axis=0, return_index=True, return_counts=True)
+        yield keys, hands[first], boards[first], counts * hand_count
+
+
+def equity_buckets(equities, weights, num_buckets):
+    '''
+    Splits equities into buckets of equal total weight, from the weakest.
+    '''
+    order = np.argsort(equities, kind='stable')
+    cumulative = np.cumsum(weights[order]) / weights.sum()
+    edges = equities[order][np.searchsorted(cumulative, np.arange(1, num_buckets) / num_buckets)]
+    return np.searchsorted(edges, equities, side='right').astype(np.uint8)
+
+
+def build_table(name, board_cards, num_buckets, samples, seed=0, chunk=2048):
+    '''
+    Computes the bucket of every hand and board on a street and writes the table.
+    '''
+    from .equity import batch_equity
+    rng = np.random.default_rng(seed)
+    all_keys, all_equities, all_weights = [], [], []
+    for keys, hands, boards, weights in street_classes(board_cards):
+        equities = np.concatenate([batch_equity(hands[i:i+chunk], boards[i:i+chunk], samples, rng) for i in range(0, len(keys), chunk)])
+        all_keys.append(keys)
+        all_equities.append(equities)
+        all_weights.append(weights)
+    keys = np.concatenate(all_keys)
+    buckets = equity_buckets(np.concatenate(all_equities), np.concatenate(all_weights).astype(np.float64), num_buckets)
+    bits = max(1, int(np.ceil(np.log2(len(keys) / MAX_LOAD))))
+    slots = place_keys(keys, bits)
+    table_keys = np.zeros((1 << bits, 2), dtype='<u8')
+    table_buckets = np.zeros(1 << bits, dtype=np.uint8)
+    table_keys[slots] = keys
+    table_buckets[slots] = buckets
+    with open(name, 'wb') as table_file:
+        table_file.write(HEADER.pack(MAGIC, board_cards, num_buckets, 1 << bits, len(keys)).ljust(HEADER_SIZE, b'\0'))
+        table_file.write(table_keys.tobytes())
+        table_file.write(table_buckets.tobytes())
+    return len(keys)
+
+
+def place_keys(keys, bits):
+    '''
+    Returns the slot of each key in a linear probing table of 2**bits slots.
+
+    Keys are placed in rounds: each key tries its next slot, and of the keys trying a free slot
+    one takes it while the others move on, so every key ends up after an unbroken run of slots
+    from its home slot, as a lookup expects.
+    '''
+    mask = (1 << bits) - 1
+    slots = home_slots(keys[:, 0], keys[:, 1], bits)
+    placed = np.full(len(keys), -1, dtype=np.int64)
+    taken = np.zeros(1 << bits, dtype=bool)
+    waiting = np.arange(len(keys))
+    while len(waiting) > 0:
+        trying = slots[waiting]
+        free = ~taken[trying]
+        _, winners = np.unique(np.where(free, trying, -1), return_index=True)
+        winners = winners[free[winners]]
+        placed[waiting[winners]] = trying[winners]
+        taken[trying[winners]] = True
+        won = np.zeros(len(waiting), dtype=bool)
+        won[winners] = True
+        waiting = waiting[~won]
+        slots[waiting] = (slots[waiting] + 1) & mask
+    return placed
+
+
+def parse_args():
+    '''
+    Parses which tables to build and how.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 -m skeleton.abstraction')
+    parser.add_argument('--streets', nargs='+', choices=list(STREETS), default=['preflop', 'flop'], help='Streets to build tables for')
+    parser.add_argument('--buckets', type=int, default=8, help='Buckets per street, at most 256')
+    parser.add_argument('--samples', type=int, default=128, help='Monte Carlo samples of each pair\'s equity')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the equity samples')
+    parser.add_argument('--output-dir', type=str, default=TABLE_DIR, help='Directory for the tables')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    assert 1 <= args.buckets <= 256
+    os.makedirs(args.output_dir, exist_ok=True)
+    for street in args.streets:
+        start_time = time.perf_counter()
+        name = os.path.join(args.output_dir, street + '.abs')
+        entries = build_table(name, STREETS[street], args.buckets, args.samples, args.seed)
+        print('{}: {} entries in {:.1f}s, {}'.format(street, entries, time.perf_counter() - start_time, name))
@@ -0,0 +1,132 @@
+'''
+Chooses how to split the six dealt cards across the boards with AssignAction.
+
+Every hand is valued by its preflop equity against a random hand, from the table of the
+169 starting hand classes in preflop_equity.py, and each board's equity is weighted by
+the chips in play on it at the start of the round: the blinds plus the board's own
+(i+1)*BIG_BLIND. Since later boards are worth more, the best pairing of the cards puts its
+strongest hand on the last board, and only the 15 ways to pair up six cards need scoring.
+
+Results are memoized by the hand's suit-canonical form, so any relabeling of the suits of
+a hand seen before is solved with a dictionary lookup.
+
+Run python3 -m skeleton.assignment from the bot's directory to regenerate the equity table.
+'''
+from .states import NUM_BOARDS, BIG_BLIND, SMALL_BLIND
+from .preflop_equity import PREFLOP_EQUITY
+
+RANKS = '23456789TJQKA'
+RANK_OF = {rank: i for i, rank in enumerate(RANKS)}
+BOARD_WEIGHTS = tuple((i+1)*BIG_BLIND + SMALL_BLIND + BIG_BLIND for i in range(NUM_BOARDS))
+
+
+def pairings(positions):
+    '''
+    Returns every way to split a list of positions into unordered pairs.
+    '''
+    if not positions:
+        return [[]]
+    first, rest = positions[0], positions[1:]
+    return [[(first, partner)] + pairing for i, partner in enumerate(rest) for pairing in pairings(rest[:i] + rest[i+1:])]
+
+
+PAIRINGS = pairings(list(range(2*NUM_BOARDS)))
+
+
+def hand_class(card_a, card_b):
+    '''
+    Returns the index of a starting hand class: 13*high + low for suited hands, 13*low + high for offsuit ones and pairs.
+    '''
+    rank_a, rank_b = RANK_OF[card_a[0]], RANK_OF[card_b[0]]
+    high, low = max(rank_a, rank_b), min(rank_a, rank_b)
+    return 13*high + low if card_a[1] == card_b[1] and high != low else 13*low + high
+
+
+def canonical_order(cards):
+    '''
+    Returns the suit-canonical key of a hand, and its cards in the matching order.
+
+    Cards are grouped by suit, suits are ordered by their ranks and ranks from highest, so hands
+    which differ only by a relabeling of suits share a key and line up card for card.
+    '''
+    suits = {}
+    for card in cards:
+        suits.setdefault(card[1], []).append(card)
+    groups = [sorted(group, key=lambda card: RANK_OF[card[0]], reverse=True) for group in suits.values()]
+    groups.sort(key=lambda group: [RANK_OF[card[0]] for card in group], reverse=True)
+    key = tuple(tuple(RANK_OF[card[0]] for card in group) for group in groups)
+    return key, [card for group in groups for card in group]
+
+
+_memo = {}
+
+
+def solve(cards, weights):
+    '''
+    Returns the card positions of the best assignment, two per board, scoring every pairing.
+    '''
+    best_value, best_positions = None, None
+    for pairing in PAIRINGS:
+        # the strongest hand goes to the board with the most chips in play
+        equities = sorted((PREFLOP_EQUITY[hand_class(cards[a], cards[b])], a, b) for a, b in pairing)
+        value = sum(weight * equity for weight, (equity, _, _) in zip(sorted(weights), equities))
+        if best_value is None or value > best_value:
+            best_value, best_positions = value, [(a, b) for _, a, b in equities]
+    order = sorted(range(NUM_BOARDS), key=lambda i: weights[i])
+    positions = [None] * NUM_BOARDS
+    for i, pair in zip(order, best_positions):
+        positions[i] = pair
+    return tuple(positions)
+
+
+def best_assignment(cards, weights=BOARD_WEIGHTS):
+    '''
+    Returns the cards to assign to each board, as a list of NUM_BOARDS 2-card lists.
+
+    Boards are valued as weights times the preflop equity of their hand, by default the chips in play on each board.
+    '''
+    key, ordered = canonical_order(cards)
+    memo_key = (key, weights)
+    positions = _memo.get(memo_key)
+    if positions is None:
+        positions = _memo[memo_key] = solve(ordered, weights)
+    return [[ordered[a], ordered[b]] for a, b in positions]
+
+
+def build_preflop_table(samples=1000000, seed=2021):
+    '''
+    Estimates the equity of each starting hand class against a random hand by Monte Carlo.
+    '''
+    import numpy as np
+    from .equity import sample_equity, COMBOS
+    rng = np.random.default_rng(seed)
+    table = []
+    for index in range(169):
+        row, col = divmod(index, 13)
+        # suited classes sit above the diagonal, with the higher rank as the row
+        suited = row > col
+        high, low = max(row, col), min(row, col)
+        hand = [4*high, 4*low + (0 if suited else 1)]
+        total = 0.
+        for start in range(0, samples, 100000):
+            batch = min(100000, samples - start)
+            total += sample_equity(hand, [], hand, np.ones(len(COMBOS)), batch, rng)
+        table.append(total / samples)
+    return table
+
+
+def write_preflop_table(name, table):
+    '''
+    Writes the equity table as a Python module, one row of 13 classes per line.
+    '''
+    with open(name, 'w') as table_file:
+        table_file.write("'''\nPreflop equity against a random hand of the 169 starting hand classes, indexed as in assignment.hand_class.\n\n")
+        table_file.write("Generated by python3 -m skeleton.assignment, DO NOT EDIT.\n'''\nPREFLOP_EQUITY = (\n")
+        for row in range(13):
+            table_file.write('    ' + ', '.join('{:.4f}'.format(value) for value in table[13*row:13*row+13]) + ',\n')
+        table_file.write(')\n')
+
+
+if __name__ == '__main__':
+    import os
+    write_preflop_table(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop_equity.py'), build_preflop_table())
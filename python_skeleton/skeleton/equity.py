@@ -0,0 +1,218 @@
+'''
+Hand equity against a random hand or a weighted range.
+
+Equity is the chance of winning plus half the chance of tying at showdown, over every
+opponent hand and runout consistent with the known cards. It is computed exactly once
+the turn is out, and by vectorized Monte Carlo sampling before that, either for a fixed
+number of samples or, anytime, for as many as fit in a time budget.
+
+Cards may be given as strings such as 'As', as eval7.Card's, or as card indices (see
+evaluator.py); the unknown '' entries of a BoardState's deck are skipped. Dead cards are
+cards neither player can hold nor see on the board, such as your cards on other boards.
+
+Results against a random hand are cached, keyed by the hand, board and dead cards up to a
+relabeling of suits, and Monte Carlo estimates keep improving as cached entries are sampled again.
+'''
+from collections import OrderedDict
+from itertools import combinations, permutations
+import time
+import numpy as np
+
+from .evaluator import evaluate, card_index, RANKS
+from .states import BoardState, NUM_BOARDS
+
+CACHE_SIZE = 1 << 16
+BATCH_SIZE = 1000
+
+COMBOS = np.array(list(combinations(range(52), 2)), dtype=np.int64)
+COMBO_INDEX = {(a, b): i for i, (a, b) in enumerate(COMBOS.tolist())}
+SUIT_PERMUTATIONS = list(permutations(range(4)))
+
+_cache = OrderedDict()  # canonical key -> (summed equity, samples), samples is None for exact results
+_rng = np.random.default_rng()
+
+
+def parse_cards(cards):
+    '''
+    Returns the indices of the known cards in a sequence, skipping unknown '' entries.
+    '''
+    return [card if isinstance(card, (int, np.integer)) else card_index(card) for card in cards if card != '']
+
+
+def combos_of(name):
+    '''
+    Returns the combo indices of a hand given as two cards, or as a class such as 'AKs', 'AKo', 'AK' or 'TT'.
+    '''
+    if not isinstance(name, str) or len(name) == 4 and name[1] in 'cdhs':
+        a, b = sorted(parse_cards(name if not isinstance(name, str) else [name[:2], name[2:]]))
+        return [COMBO_INDEX[(a, b)]]
+    high, low = RANKS.index(name[0]), RANKS.index(name[1])
+    suited = name[2:] != 'o'
+    offsuit = name[2:] != 's'
+    combos = []
+    for suit_a in range(4):
+        for suit_b in range(4):
+            a, b = 4*high + suit_a, 4*low + suit_b
+            if a < b and (suit_a == suit_b and suited or suit_a != suit_b and offsuit):
+                combos.append(COMBO_INDEX[(a, b)])
+    return combos
+
+
+def range_weights(opp_range):
+    '''
+    Returns the weight of each of the 1326 combos in a range given as a dict from hands or hand classes to weights.
+    '''
+    weights = np.zeros(len(COMBOS))
+    for name, weight in opp_range.items():
+        weights[combos_of(name)] = weight
+    return weights
+
+
+def canonical_key(hand, board, dead):
+    '''
+    Returns the hand, board and dead cards as sorted tuples under the suit relabeling which makes them smallest.
+    '''
+    best = None
+    for permutation in SUIT_PERMUTATIONS:
+        key = tuple(tuple(sorted((card & ~3) | permutation[card & 3] for card in cards)) for cards in (hand, board, dead))
+        if best is None or key < best:
+            best = key
+    return best
+
+
+def exact_equity(hand, board, known, weights):
+    '''
+    Enumerates every opponent combo and remaining board card, for boards with 4 or 5 cards.
+    '''
+    hand, board = np.array(hand, dtype=np.int64), np.array(board, dtype=np.int64)
+    blocked = np.zeros(52, dtype=bool)
+    blocked[known] = True
+    live_combos = ~blocked[COMBOS].any(axis=1) & (weights > 0)
+    combos = COMBOS[live_combos]
+    combo_weights = weights[live_combos]
+    if len(board) == 5:
+        rivers = np.zeros((1, 0), dtype=np.int64)
+    else:
+        rivers = np.flatnonzero(~blocked)[:, None]
+    boards = np.concatenate([np.broadcast_to(board, (len(rivers), len(board))), rivers], axis=1)
+    my_scores = evaluate(np.concatenate([np.broadcast_to(hand, (len(rivers), 2)), boards], axis=1))
+    # an opponent combo can not hold the river card, such pairs are scored with your hand and weigh nothing
+    holds_river = (combos[None, :, :] == rivers[:, :, None]).any(axis=2)
+    opp_cards = np.where(holds_river[:, :, None], hand, combos[None, :, :])
+    opp_scores = evaluate(np.concatenate([opp_cards, np.broadcast_to(boards[:, None, :], (len(rivers), len(combos), 5))], axis=2))
+    joint_weights = combo_weights * ~holds_river
+    results = (my_scores[:, None] > opp_scores) + 0.5 * (my_scores[:, None] == opp_scores)
+    return float((results * joint_weights).sum() / joint_weights.sum())
+
+
+def sample_equity(hand, board, known, weights, samples, rng=None):
+    '''
+    Sums the showdown results of randomly sampled opponent combos and runouts.
+    '''
+    hand, board = np.array(hand, dtype=np.int64), np.array(board, dtype=np.int64)
+    rng = rng or _rng
+    blocked = np.zeros(52, dtype=bool)
+    blocked[known] = True
+    probabilities = np.where(blocked[COMBOS].any(axis=1), 0., weights)
+    probabilities /= probabilities.sum()
+    opp = COMBOS[rng.choice(len(COMBOS), size=samples, p=probabilities)]
+    need = 5 - len(board)
+    if need > 0:
+        # the smallest random keys of the cards left pick a runout without repeats
+        keys = rng.random((samples, 52))
+        keys[:, blocked] = 2.
+        keys[np.arange(samples)[:, None], opp] = 2.
+        runouts = np.argpartition(keys, need - 1, axis=1)[:, :need]
+        boards = np.concatenate([np.broadcast_to(board, (samples, len(board))), runouts], axis=1)
+    else:
+        boards = np.broadcast_to(board, (samples, 5))
+    scores = evaluate(np.stack([np.concatenate([np.broadcast_to(hand, (samples, 2)), boards], axis=1),
+                                np.concatenate([opp, boards], axis=1)]))
+    return float((scores[0] > scores[1]).sum() + 0.5 * (scores[0] == scores[1]).sum())
+
+
+def batch_equity(hands, boards, samples, rng=None):
+    '''
+    Estimates the equity against a random hand of many hands at once, each on its own board.
+
+    Hands and boards are arrays of card indices shaped (n, 2) and (n, board cards), and every
+    row gets samples opponent hands and runouts.
+    '''
+    rng = rng or _rng
+    hands, boards = np.asarray(hands, dtype=np.int64), np.asarray(boards, dtype=np.int64).reshape(len(hands), -1)
+    rows = len(hands)
+    need = 2 + 5 - boards.shape[1]
+    keys = rng.random((rows, samples, 52))
+    known = np.concatenate([hands, boards], axis=1)
+    keys[np.arange(rows)[:, None], :, known] = 2.
+    # the smallest random keys of the cards left deal the opponent's hand, then the runout
+    dealt = np.argpartition(keys, need - 1, axis=2)[:, :, :need]
+    runouts = np.concatenate([np.broadcast_to(boards[:, None, :], (rows, samples, boards.shape[1])), dealt[:, :, 2:]], axis=2)
+    scores = evaluate(np.stack([np.concatenate([np.broadcast_to(hands[:, None, :], (rows, samples, 2)), runouts], axis=2),
+                                np.concatenate([dealt[:, :, :2], runouts], axis=2)]))
+    return ((scores[0] > scores[1]).sum(axis=1) + 0.5 * (scores[0] == scores[1]).sum(axis=1)) / samples
+
+
+def equity(hand, board=(), opp_range=None, dead=(), samples=4 * BATCH_SIZE, budget=None):
+    '''
+    Returns the equity of a 2-card hand against a random hand, or a range weighted as in range_weights.
+
+    With 4 or 5 board cards the result is exact. Otherwise samples hands are sampled, or when a
+    budget in seconds is given, batches are sampled until it runs out, with at least one batch.
+    Raises ValueError when the known cards block every combo of the range that has weight.
+    '''
+    hand, board, dead = parse_cards(hand), parse_cards(board), parse_cards(dead)
+    known = hand + board + dead
+    assert len(hand) == 2 and len(board) <= 5 and len(set(known)) == len(known)
+    weights = np.ones(len(COMBOS)) if opp_range is None else range_weights(opp_range)
+    if opp_range is not None:
+        blocked = np.zeros(52, dtype=bool)
+        blocked[known] = True
+        if not (weights > 0)[~blocked[COMBOS].any(axis=1)].any():
+            raise ValueError('the known cards block every combo of the range with a weight above 0')
+    key = canonical_key(hand, board, dead) if opp_range is None else None
+    total, count = _cache.get(key, (0., 0)) if key is not None else (0., 0)
+    if key is not None and key in _cache:
+        _cache.move_to_end(key)
+    if count is None:
+        return total
+    if len(board) >= 4:
+        total, count = exact_equity(hand, board, known, weights), None
+    elif budget is not None:
+        deadline = time.perf_counter() + budget
+        while count == 0 or time.perf_counter() < deadline:
+            total += sample_equity(hand, board, known, weights, BATCH_SIZE)
+            count += BATCH_SIZE
+    elif count < samples:
+        total += sample_equity(hand, board, known, weights, samples - count)
+        count = samples
+    if key is not None:
+        _cache[key] = (total, count)
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return total if count is None else total / count
+
+
+def board_equities(round_state, active, samples=4 * BATCH_SIZE, budget=None):
+    '''
+    Returns your equity against a random hand on each board, or None on boards which are over or not yet assigned.
+
+    Your cards on the other boards are dead, and a budget is split evenly between the live boards.
+    '''
+    my_cards = round_state.hands[active]
+    live = [isinstance(board_state, BoardState) and bool(board_state.hands[active]) for board_state in round_state.board_states]
+    board_budget = budget / max(1, sum(live)) if budget is not None else None
+    equities = [None] * NUM_BOARDS
+    for i, board_state in enumerate(round_state.board_states):
+        if live[i]:
+            hand = board_state.hands[active]
+            dead = [card for card in my_cards if card not in hand]
+            equities[i] = equity(hand, board_state.deck, None, dead, samples, board_budget)
+    return equities
+
+
+def clear_cache():
+    '''
+    Forgets every cached result.
+    '''
+    _cache.clear()
@@ -0,0 +1,20 @@
+'''
+Preflop equity against a random hand of the 169 starting hand classes, indexed as in assignment.hand_class.
+
+Generated by python3 -m skeleton.assignment, DO NOT EDIT.
+'''
+PREFLOP_EQUITY = (
+    0.5029, 0.3229, 0.3319, 0.3430, 0.3401, 0.3467, 0.3682, 0.3906, 0.4166, 0.4435, 0.4729, 0.5055, 0.5493,
+    0.3603, 0.5377, 0.3520, 0.3630, 0.3610, 0.3654, 0.3748, 0.3996, 0.4255, 0.4530, 0.4825, 0.5151, 0.5586,
+    0.3676, 0.3872, 0.5706, 0.3820, 0.3808, 0.3856, 0.3937, 0.4068, 0.4354, 0.4625, 0.4917, 0.5235, 0.5671,
+    0.3796, 0.3973, 0.4152, 0.6035, 0.3998, 0.4054, 0.4149, 0.4272, 0.4430, 0.4718, 0.5003, 0.5323, 0.5775,
+    0.3770, 0.3954, 0.4133, 0.4326, 0.6331, 0.4234, 0.4301, 0.4454, 0.4611, 0.4775, 0.5107, 0.5414, 0.5765,
+    0.3808, 0.4006, 0.4186, 0.4368, 0.4539, 0.6622, 0.4510, 0.4644, 0.4794, 0.4966, 0.5175, 0.5516, 0.5874,
+    0.4021, 0.4083, 0.4267, 0.4463, 0.4625, 0.4800, 0.6913, 0.4821, 0.4962, 0.5148, 0.5368, 0.5606, 0.5984,
+    0.4237, 0.4322, 0.4381, 0.4576, 0.4746, 0.4904, 0.5079, 0.7208, 0.5157, 0.5333, 0.5542, 0.5785, 0.6081,
+    0.4484, 0.4569, 0.4652, 0.4717, 0.4900, 0.5061, 0.5241, 0.5405, 0.7500, 0.5535, 0.5727, 0.5972, 0.6276,
+    0.4733, 0.4817, 0.4909, 0.5001, 0.5063, 0.5239, 0.5404, 0.5566, 0.5754, 0.7745, 0.5810, 0.6060, 0.6351,
+    0.5013, 0.5101, 0.5185, 0.5273, 0.5359, 0.5434, 0.5600, 0.5759, 0.5941, 0.6023, 0.7996, 0.6148, 0.6441,
+    0.5326, 0.5400, 0.5489, 0.5574, 0.5655, 0.5753, 0.5839, 0.6000, 0.6178, 0.6241, 0.6338, 0.8239, 0.6540,
+    0.5741, 0.5824, 0.5907, 0.5996, 0.5988, 0.6099, 0.6198, 0.6275, 0.6459, 0.6531, 0.6621, 0.6699, 0.8521,
+)
@@ -3,34 +3,90 @@ The infrastructure for interacting with the engine.
 '''
 import argparse
 import socket
+import io
+import struct
+import os
 from .actions import FoldAction, CallAction, CheckAction, RaiseAction, AssignAction
 from .states import GameState, TerminalState, RoundState, BoardState
 from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND, NUM_BOARDS
 from .bot import Bot
 
 
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+# every card is decoded once, and all clauses share the same card strings
+CARDS = {(rank + suit).encode(): rank + suit for rank in RANKS for suit in SUITS}
+CARDS[b''] = ''
+# in binary messages cards are bytes, 4*rank + suit, and 255 is an unknown card
+CARD_NAMES = [CARDS[(rank + suit).encode()] for rank in RANKS for suit in SUITS] + [''] * 204
+CARD_BYTES = {card: i for i, card in enumerate(CARD_NAMES[:52])}
+PROTOCOL_VERSION = b'V1'
+FRAME_HEADER = struct.Struct('<I')
+INT32 = struct.Struct('<i')
+DELTAS = struct.Struct('<ii')
+RAISE_RECORD = struct.Struct('<cHx')
+
+
+def parse_cards(data):
+    '''
+    Returns the cards of a comma separated bytes string.
+    '''
+    return [CARDS[card] for card in data.split(b',')]
+
+
 class Runner():
     '''
     Interacts with the engine.
+
+    The socketfile is read and written as bytes, so it should be opened in binary mode, as
+    socket.makefile('rwb') does. A text-mode file such as socket.makefile('rw') is switched
+    to the binary buffer beneath it.
     '''
 
     def __init__(self, pokerbot, socketfile):
         self.pokerbot = pokerbot
+        if isinstance(socketfile, io.TextIOBase):
+            socketfile.flush()
+            socketfile = socketfile.buffer
         self.socketfile = socketfile
+        self.game_state = GameState(0, 0, 0., 1)
+        self.round_state = None
+        self.active = 0
+        self.round_flag = True
+        # clause handlers indexed by the first byte of the clause
+        self.handlers = [None] * 256
+        self.handlers[ord('T')] = self.parse_clock
+        self.handlers[ord('P')] = self.parse_index
+        self.handlers[ord('H')] = self.parse_hands
+        self.handlers[ord('D')] = self.parse_deltas
+        self.handlers[ord('N')] = self.parse_new_game
+        self.handlers[ord('1')] = self.parse_boards
+        # board clauses are further dispatched on their code
+        self.board_handlers = BOARD_HANDLERS
+        # binary clause readers indexed by the clause letter, each returning where the next clause starts
+        self.readers = [None] * 256
+        self.readers[ord('T')] = self.read_clock
+        self.readers[ord('P')] = self.read_index
+        self.readers[ord('H')] = self.read_hands
+        self.readers[ord('D')] = self.read_deltas
+        self.readers[ord('N')] = self.read_new_game
+        self.readers[ord('B')] = self.read_board_cards
+        self.readers[ord('O')] = self.read_opponent_cards
+        self.readers[ord('A')] = self.read_actions
 
     def receive(self):
         '''
         Generator for incoming messages from the engine.
         '''
         while True:
-            packet = self.socketfile.readline().strip().split(' ')
-            if not packet:
+            line = self.socketfile.readline()
+            if not line:
                 break
-            yield packet
+            yield line.split()
 
-    def send(self, actions):
+    def encode(self, actions):
         '''
-        Encodes actions and sends it to the engine.
+        Encodes actions into the message sent to the engine.
         '''
         codes = [''] * NUM_BOARDS
         for i in range(NUM_BOARDS):
@@ -44,72 +100,206 @@ class Runner():
                 codes[i] = str(i+1) + 'K'
             else:  # isinstance(action, RaiseAction)
                 codes[i] = str(i+1) + 'R' + str(actions[i].amount)
-        code = ';'.join(codes)
-        self.socketfile.write(code + '\n')
+        return ';'.join(codes)
+
+    def send(self, actions):
+        '''
+        Encodes actions and sends it to the engine.
+        '''
+        self.socketfile.write(self.encode(actions).encode() + b'\n')
         self.socketfile.flush()
-       
+
+    def receive_frames(self):
+        '''
+        Generator for incoming binary messages from the engine.
+        '''
+        while True:
+            header = self.socketfile.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                break
+            yield self.socketfile.read(FRAME_HEADER.unpack(header)[0])
+
+    def encode_frame(self, actions):
+        '''
+        Encodes actions into the binary message sent to the engine.
+        '''
+        records = bytearray(FRAME_HEADER.pack(4 * NUM_BOARDS))
+        for action in actions:
+            if isinstance(action, AssignAction):
+                records += bytes((ord('A'), CARD_BYTES[action.cards[0]], CARD_BYTES[action.cards[1]], 0))
+            elif isinstance(action, FoldAction):
+                records += b'F\0\0\0'
+            elif isinstance(action, CallAction):
+                records += b'C\0\0\0'
+            elif isinstance(action, CheckAction):
+                records += b'K\0\0\0'
+            else:  # isinstance(action, RaiseAction)
+                records += RAISE_RECORD.pack(b'R', action.amount)
+        return bytes(records)
+
     def run(self):
         '''
-        Reconstructs the game tree based on the action history received from the engine.
+        Answers messages from the engine until the game is over.
+
+        The engine may first offer the binary protocol, which is accepted and used from then on.
         '''
-        game_state = GameState(0, 0, 0., 1)
-        round_state = None
-        active = 0
-        round_flag = True
         for packet in self.receive():
-            for clause in packet:
-                if clause[0] == 'T':
-                    game_state = GameState(game_state.bankroll, game_state.opp_bankroll, float(clause[1:]), game_state.round_num)
-                elif clause[0] == 'P':
-                    active = int(clause[1:])
-                elif clause[0] == 'H':
-                    cards = clause[1:].split(',')
-                    hands = [[], []]
-                    hands[active] = cards
-                    hands[1-active] = ['']*(2*NUM_BOARDS)
-                    deck = ["", "", "", "", ""]
-                    pips = [SMALL_BLIND, BIG_BLIND]
-                    board_states = [BoardState((i+1)*BIG_BLIND, pips, [[]]*2, deck, None) for i in range(NUM_BOARDS)]
-                    stacks = [STARTING_STACK - NUM_BOARDS*SMALL_BLIND, STARTING_STACK - NUM_BOARDS*BIG_BLIND]
-                    round_state = RoundState(-2, 0, stacks, hands, board_states, None)
-                    if round_flag:
-                        self.pokerbot.handle_new_round(game_state, round_state, active)
-                        round_flag = False
-                elif clause[0] == 'D':
-                    assert isinstance(round_state, TerminalState)
-                    subclauses = clause.split(';')
-                    delta = int(subclauses[0][1:])
-                    opp_delta = int(subclauses[1][1:])
-                    deltas = [delta, opp_delta]
-                    deltas[active] = delta
-                    deltas[1-active] = opp_delta
-                    round_state = TerminalState(deltas, round_state.previous_state)
-                    game_state = GameState(game_state.bankroll + delta, game_state.opp_bankroll + opp_delta, game_state.game_clock, game_state.round_num)
-                    self.pokerbot.handle_round_over(game_state, round_state, active)
-                    game_state = GameState(game_state.bankroll, game_state.opp_bankroll, game_state.game_clock, game_state.round_num + 1)
-                    round_flag = True
-                elif clause[0] == 'Q':
-                    return
-                elif clause[0] == '1':
-                    round_state = parse_multi_code(clause, round_state, active)
-            if round_flag:  # ack the engine
-                self.send([CheckAction()]*NUM_BOARDS)
-            else:
-                assert active == round_state.button % 2
-                actions = self.pokerbot.get_actions(game_state, round_state, active)
-                self.send(actions)
+            if packet == [PROTOCOL_VERSION]:
+                self.socketfile.write(PROTOCOL_VERSION + b'\n')
+                self.socketfile.flush()
+                self.run_binary()
+                return
+            actions = self.process(packet)
+            if actions is None:
+                return
+            self.send(actions)
 
+    def run_binary(self):
+        '''
+        Answers binary messages from the engine until the game is over.
+        '''
+        for frame in self.receive_frames():
+            actions = self.process_frame(frame)
+            if actions is None:
+                return
+            self.socketfile.write(self.encode_frame(actions))
+            self.socketfile.flush()
 
-def parse_multi_code(clause, round_state, active):
-    subclauses = clause.split(';')
-    if 'B' in clause:
+    def process(self, packet):
+        '''
+        Reconstructs the game tree based on the action history in one message from the engine.
+
+        The message is given as a list of bytes clauses, handled in order, so the end of one round
+        may come in the same message as the start of the next.
+        Returns the actions to send back, or None once the game is over.
+        '''
+        handlers = self.handlers
+        for clause in packet:
+            if clause == b'Q':
+                return None
+            handler = handlers[clause[0]]
+            if handler is not None:
+                handler(clause)
+        return self.respond()
+
+    def process_frame(self, data):
+        '''
+        Reconstructs the game tree based on the action history in one binary message from the engine.
+
+        Returns the actions to send back, or None once the game is over.
+        '''
+        readers = self.readers
+        i = 0
+        while i < len(data):
+            if data[i] == ord('Q'):
+                return None
+            i = readers[data[i]](data, i + 1)
+        return self.respond()
+
+    def respond(self):
+        '''
+        Returns the pokerbot's actions, or the ack the engine expects between rounds.
+        '''
+        if self.round_flag:  # ack the engine
+            return [CheckAction()]*NUM_BOARDS
+        assert self.active == self.round_state.button % 2
+        return self.pokerbot.get_actions(self.game_state, self.round_state, self.active)
+
+    def parse_clock(self, clause):
+        '''
+        T#.###, the player's game clock.
+        '''
+        self.set_clock(float(clause[1:]))
+
+    def set_clock(self, game_clock):
+        '''
+        Updates the player's game clock.
+        '''
+        game_state = self.game_state
+        self.game_state = GameState(game_state.bankroll, game_state.opp_bankroll, game_clock, game_state.round_num)
+
+    def parse_index(self, clause):
+        '''
+        P#, the player's index.
+        '''
+        self.active = int(clause[1:])
+
+    def parse_hands(self, clause):
+        '''
+        H**,**, the player's hole cards, which start a new round.
+        '''
+        self.start_round(parse_cards(clause[1:]))
+
+    def start_round(self, cards):
+        '''
+        Starts a new round with the player's hole cards.
+        '''
+        active = self.active
+        hands = [[], []]
+        hands[active] = cards
+        hands[1-active] = ['']*(2*NUM_BOARDS)
+        deck = ["", "", "", "", ""]
+        pips = [SMALL_BLIND, BIG_BLIND]
+        board_states = [BoardState((i+1)*BIG_BLIND, pips, [[]]*2, deck, None) for i in range(NUM_BOARDS)]
+        stacks = [STARTING_STACK - NUM_BOARDS*SMALL_BLIND, STARTING_STACK - NUM_BOARDS*BIG_BLIND]
+        self.round_state = RoundState(-2, 0, stacks, hands, board_states, None)
+        if self.round_flag:
+            self.pokerbot.handle_new_round(self.game_state, self.round_state, active)
+            self.round_flag = False
+
+    def parse_deltas(self, clause):
+        '''
+        D###;D###, the player's and the opponent's bankroll deltas, which end the round.
+        '''
+        delta_clause, opp_delta_clause = clause.split(b';')
+        self.end_round(int(delta_clause[1:]), int(opp_delta_clause[1:]))
+
+    def end_round(self, delta, opp_delta):
+        '''
+        Ends the round with the player's and the opponent's bankroll deltas.
+        '''
+        assert isinstance(self.round_state, TerminalState)
+        deltas = [delta, opp_delta]
+        deltas[self.active] = delta
+        deltas[1-self.active] = opp_delta
+        self.round_state = TerminalState(deltas, self.round_state.previous_state)
+        game_state = self.game_state
+        game_state = GameState(game_state.bankroll + delta, game_state.opp_bankroll + opp_delta, game_state.game_clock, game_state.round_num)
+        self.pokerbot.handle_round_over(game_state, self.round_state, self.active)
+        self.game_state = GameState(game_state.bankroll, game_state.opp_bankroll, game_state.game_clock, game_state.round_num + 1)
+        self.round_flag = True
+
+    def parse_new_game(self, clause):
+        '''
+        N, a new game against a warm bot.
+        '''
+        self.game_state = GameState(0, 0, 0., 1)
+        self.round_flag = True
+
+    def parse_boards(self, clause):
+        '''
+        1*;2*;3*, one clause for each board.
+        '''
+        subclauses = clause.split(b';')
+        self.round_state = self.board_handlers[clause[1]](subclauses, self.round_state, self.active)
+
+    @staticmethod
+    def parse_board_cards(subclauses, round_state, active):
+        '''
+        #B**,**,**,**,**, the board cards on each board.
+        '''
+        return Runner.update_boards([parse_cards(subclause[2:]) for subclause in subclauses], round_state)
+
+    @staticmethod
+    def update_boards(boards, round_state):
+        '''
+        Shows the board cards dealt so far on each board.
+        '''
         new_board_states = [None] * NUM_BOARDS
         for i in range(NUM_BOARDS):
-            leftover = subclauses[i][2:]
-            cards = leftover.split(',')
+            cards = boards[i]
             revised_deck = ["", "", "", "", ""]
-            for j in range(len(cards)):
-                revised_deck[j] = cards[j]
+            revised_deck[:len(cards)] = cards
             if isinstance(round_state.board_states[i], BoardState):
                 maker = round_state.board_states[i]
                 new_board_states[i] = BoardState(maker.pot, maker.pips, maker.hands, revised_deck, maker.previous_state)
@@ -118,43 +308,144 @@ def parse_multi_code(clause, round_state, active):
                 maker = terminal.previous_state
                 new_board_states[i] = TerminalState(terminal.deltas, BoardState(maker.pot, maker.pips, maker.hands, revised_deck, maker.previous_state, maker.settled))
         return RoundState(round_state.button, round_state.street, round_state.stacks, round_state.hands, new_board_states, round_state.previous_state)
-    elif 'O' in clause:
+
+    @staticmethod
+    def parse_opponent_cards(subclauses, round_state, active):
+        '''
+        #O**,**, the opponent's hand on each board, empty if it was not shown.
+        '''
+        return Runner.reveal_hands([parse_cards(subclause[2:]) if subclause[2:] else None for subclause in subclauses], round_state, active)
+
+    @staticmethod
+    def reveal_hands(opp_hands, round_state, active):
+        '''
+        Shows the opponent's hand on each board, None where it was not shown, and ends the round.
+        '''
         new_board_states = [None] * NUM_BOARDS
         round_state = round_state.previous_state
         for i in range(NUM_BOARDS):
-            leftover = subclauses[i][2:]
-            if leftover == "":
+            if opp_hands[i] is None:
                 new_board_states[i] = round_state.board_states[i]
             else:
-                cards = leftover.split(',')
                 terminal = round_state.board_states[i]
                 maker = terminal.previous_state
                 revised_hands = maker.hands
-                revised_hands[1-active] = cards
+                revised_hands[1-active] = opp_hands[i]
                 new_board_states[i] = TerminalState(terminal.deltas, BoardState(maker.pot, maker.pips, revised_hands, maker.deck, maker.previous_state, maker.settled))
         round_state = RoundState(round_state.button, round_state.street, round_state.stacks, round_state.hands, new_board_states, round_state.previous_state)
         return TerminalState([0, 0], round_state)
-    else:
+
+    @staticmethod
+    def parse_actions(subclauses, round_state, active):
+        '''
+        #F, #C, #K, #R### or #A**,**, the action on each board.
+        '''
         actions = [None] * NUM_BOARDS
         for i in range(NUM_BOARDS):
             subclause = subclauses[i]
-            leftover = subclause[2:]
-            if subclause[1] == 'F':
-                actions[i] = FoldAction()
-            elif subclause[1] == 'C':
-                actions[i] = CallAction()
-            elif subclause[1] == 'K':
-                actions[i] = CheckAction()
-            elif subclause[1] == 'R':
-                actions[i] = RaiseAction(int(leftover))
-            elif subclause[1] == 'A':
-                cards = leftover.split(',')
-                if leftover == "":
-                    actions[i] = AssignAction(["", ""])
-                else:
-                    actions[i] = AssignAction(cards)
+            actions[i] = DECODE[subclause[1]](subclause[2:])
         return round_state.proceed(actions)
 
+    def read_clock(self, data, i):
+        '''
+        T int32, the player's game clock in milliseconds.
+        '''
+        self.set_clock(INT32.unpack_from(data, i)[0] / 1000)
+        return i + INT32.size
+
+    def read_index(self, data, i):
+        '''
+        P uint8, the player's index.
+        '''
+        self.active = data[i]
+        return i + 1
+
+    def read_hands(self, data, i):
+        '''
+        H uint8 count, then count cards, the player's hole cards.
+        '''
+        end = i + 1 + data[i]
+        self.start_round([CARD_NAMES[card] for card in data[i+1:end]])
+        return end
+
+    def read_deltas(self, data, i):
+        '''
+        D int32 int32, the player's and the opponent's bankroll deltas.
+        '''
+        self.end_round(*DELTAS.unpack_from(data, i))
+        return i + DELTAS.size
+
+    def read_new_game(self, data, i):
+        '''
+        N, a new game against a warm bot.
+        '''
+        self.parse_new_game(b'N')
+        return i
+
+    def read_board_cards(self, data, i):
+        '''
+        B, for each board a uint8 count, then count cards, the board cards.
+        '''
+        boards = [None] * NUM_BOARDS
+        for board in range(NUM_BOARDS):
+            end = i + 1 + data[i]
+            boards[board] = [CARD_NAMES[card] for card in data[i+1:end]]
+            i = end
+        self.round_state = self.update_boards(boards, self.round_state)
+        return i
+
+    def read_opponent_cards(self, data, i):
+        '''
+        O, for each board a uint8 count, then count cards, the opponent's hand, count 0 if it was not shown.
+        '''
+        opp_hands = [None] * NUM_BOARDS
+        for board in range(NUM_BOARDS):
+            end = i + 1 + data[i]
+            opp_hands[board] = [CARD_NAMES[card] for card in data[i+1:end]] if end > i + 1 else None
+            i = end
+        self.round_state = self.reveal_hands(opp_hands, self.round_state, self.active)
+        return i
+
+    def read_actions(self, data, i):
+        '''
+        A, for each board a 4 byte action record.
+        '''
+        end = i + 4 * NUM_BOARDS
+        self.round_state = self.round_state.proceed([RECORDS[data[j]](data, j) for j in range(i, end, 4)])
+        return end
+
+
+FOLD, CALL, CHECK = FoldAction(), CallAction(), CheckAction()
+DECODE = [None] * 256
+DECODE[ord('F')] = lambda leftover: FOLD
+DECODE[ord('C')] = lambda leftover: CALL
+DECODE[ord('K')] = lambda leftover: CHECK
+DECODE[ord('R')] = lambda leftover: RaiseAction(int(leftover))
+DECODE[ord('A')] = lambda leftover: AssignAction(parse_cards(leftover) if leftover else ["", ""])
+# action records in binary messages are decoded from the record's offset
+RECORDS = [None] * 256
+RECORDS[ord('F')] = lambda data, j: FOLD
+RECORDS[ord('C')] = lambda data, j: CALL
+RECORDS[ord('K')] = lambda data, j: CHECK
+RECORDS[ord('R')] = lambda data, j: RaiseAction(data[j+1] | data[j+2] << 8)
+RECORDS[ord('A')] = lambda data, j: AssignAction([CARD_NAMES[data[j+1]], CARD_NAMES[data[j+2]]])
+# board clause handlers indexed by the code of the first board's clause
+BOARD_HANDLERS = [Runner.parse_actions] * 256
+BOARD_HANDLERS[ord('B')] = Runner.parse_board_cards
+BOARD_HANDLERS[ord('O')] = Runner.parse_opponent_cards
+
+
+def parse_multi_code(clause, round_state, active):
+    '''
+    Applies one board clause, 1*;2*;3*, to the round state and returns the new state.
+
+    Kept for pokerbots written against earlier skeletons, the clause may be text or bytes.
+    '''
+    if isinstance(clause, str):
+        clause = clause.encode()
+    return BOARD_HANDLERS[clause[1]](clause.split(b';'), round_state, active)
+
+
 def parse_args():
     '''
     Parses arguments corresponding to socket connection information.
@@ -164,17 +455,33 @@ def parse_args():
     parser.add_argument('port', type=int, help='Port on host to connect to')
     return parser.parse_args()
 
+def connect_unix(path):
+    '''
+    Connects to the engine's unix domain socket when it offers one, otherwise returns None.
+    '''
+    if path is None or not hasattr(socket, 'AF_UNIX'):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
 def run_bot(pokerbot, args):
     '''
     Runs the pokerbot.
     '''
     assert isinstance(pokerbot, Bot)
-    try:
-        sock = socket.create_connection((args.host, args.port))
-    except OSError:
-        print('Could not connect to {}:{}'.format(args.host, args.port))
-        return
-    socketfile = sock.makefile('rw')
+    sock = connect_unix(os.environ.get('POKERBOTS_UNIX_SOCKET'))
+    if sock is None:
+        try:
+            sock = socket.create_connection((args.host, args.port))
+        except OSError:
+            print('Could not connect to {}:{}'.format(args.host, args.port))
+            return
+    socketfile = sock.makefile('rwb')
     runner = Runner(pokerbot, socketfile)
     runner.run()
     socketfile.close()
@@ -13,9 +13,18 @@ BIG_BLIND = 2
 SMALL_BLIND = 1
 NUM_BOARDS = 3
 
+# legal action sets are shared, so they are frozen
+ASSIGN_ACTIONS = frozenset({AssignAction})
+CHECK_ACTIONS = frozenset({CheckAction})
+CHECK_RAISE_ACTIONS = frozenset({CheckAction, RaiseAction})
+FOLD_CALL_ACTIONS = frozenset({FoldAction, CallAction})
+FOLD_CALL_RAISE_ACTIONS = frozenset({FoldAction, CallAction, RaiseAction})
+
 class BoardState(namedtuple('_BoardState', ['pot', 'pips', 'hands', 'deck', 'previous_state', 'settled', 'reveal'], defaults=[False, True])):
     '''
     Encodes the game tree for one board within a round.
+
+    The last legal actions and raise bounds are kept with the active player and stacks they were computed for.
     '''
     def showdown(self):
         '''
@@ -26,33 +35,45 @@ class BoardState(namedtuple('_BoardState', ['pot', 'pips', 'hands', 'deck', 'pre
 
     def legal_actions(self, button, stacks):
         '''
-        Returns a set which corresponds to the active player's legal moves on this board.
+        Returns a frozenset which corresponds to the active player's legal moves on this board.
         '''
         active = button % 2
+        key = (active, stacks[0], stacks[1])
+        memo = self.__dict__.get('legal_memo')
+        if memo is not None and memo[0] == key:
+            return memo[1]
         if (self.hands is None) or (len(self.hands[active]) == 0):
-            return {AssignAction}
+            legal_actions = ASSIGN_ACTIONS
         elif self.settled:
-            return {CheckAction}
-        # board being played on
-        continue_cost = self.pips[1-active] - self.pips[active]
-        if continue_cost == 0:
-            # we can only raise the stakes if both players can afford it
-            bets_forbidden = (stacks[0] == 0 or stacks[1] == 0)
-            return {CheckAction} if bets_forbidden else {CheckAction, RaiseAction}
-        # continue_cost > 0
-        # similarly, re-raising is only allowed if both players can afford it
-        raises_forbidden = (continue_cost == stacks[active] or stacks[1-active] == 0)
-        return {FoldAction, CallAction} if raises_forbidden else {FoldAction, CallAction, RaiseAction}
+            legal_actions = CHECK_ACTIONS
+        else:  # board being played on
+            continue_cost = self.pips[1-active] - self.pips[active]
+            if continue_cost == 0:
+                # we can only raise the stakes if both players can afford it
+                bets_forbidden = (stacks[0] == 0 or stacks[1] == 0)
+                legal_actions = CHECK_ACTIONS if bets_forbidden else CHECK_RAISE_ACTIONS
+            else:  # continue_cost > 0
+                # similarly, re-raising is only allowed if both players can afford it
+                raises_forbidden = (continue_cost == stacks[active] or stacks[1-active] == 0)
+                legal_actions = FOLD_CALL_ACTIONS if raises_forbidden else FOLD_CALL_RAISE_ACTIONS
+        self.legal_memo = (key, legal_actions)
+        return legal_actions
 
     def raise_bounds(self, button, stacks):
         '''
         Returns a tuple of the minimum and maximum legal raises on this board.
         '''
         active = button % 2
+        key = (active, stacks[0], stacks[1])
+        memo = self.__dict__.get('bounds_memo')
+        if memo is not None and memo[0] == key:
+            return memo[1]
         continue_cost = self.pips[1-active] - self.pips[active]
         max_contribution = min(stacks[active], stacks[1-active] + continue_cost)
         min_contribution = min(max_contribution, continue_cost + max(continue_cost, BIG_BLIND))
-        return (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
+        bounds = (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
+        self.bounds_memo = (key, bounds)
+        return bounds
 
     def proceed(self, action, button, street):
         '''
@@ -93,6 +114,8 @@ class BoardState(namedtuple('_BoardState', ['pot', 'pips', 'hands', 'deck', 'pre
 class RoundState(namedtuple('_RoundState', ['button', 'street', 'stacks', 'hands', 'board_states', 'previous_state'])):
     '''
     Encodes the game tree for one round of poker.
+
+    The legal actions and raise bounds are computed once per state.
     '''
     def showdown(self):
         '''
@@ -104,14 +127,28 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'stacks', 'hands
 
     def legal_actions(self):
         '''
-        Returns a list of sets which correspond to the active player's legal moves on each board.
+        Returns a tuple of frozensets which correspond to the active player's legal moves on each board.
         '''
-        return [board_state.legal_actions(self.button, self.stacks) if isinstance(board_state, BoardState) else {CheckAction} for board_state in self.board_states]
+        legal = self.__dict__.get('legal')
+        if legal is None:
+            legal = tuple(board_state.legal_actions(self.button, self.stacks) if isinstance(board_state, BoardState) else CHECK_ACTIONS for board_state in self.board_states)
+            self.legal = legal
+        return legal
 
     def raise_bounds(self):
         '''
         Returns a tuple of the minimum and maximum legal raises summed across boards.
         '''
+        bounds = self.__dict__.get('bounds')
+        if bounds is None:
+            bounds = self.compute_raise_bounds()
+            self.bounds = bounds
+        return bounds
+
+    def compute_raise_bounds(self):
+        '''
+        Sums the raise bounds across boards.
+        '''
         active = self.button % 2
         net_continue_cost = 0
         net_pips_unsettled = 0
@@ -140,14 +177,20 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'stacks', 'hands
         '''
         Advances the game tree by one tuple of actions performed by the active player across all boards.
         '''
-        new_board_states = [self.board_states[i].proceed(actions[i], self.button, self.street) if isinstance(self.board_states[i], BoardState) else self.board_states[i] for i in range(NUM_BOARDS)]
         active = self.button % 2
-        new_stacks = list(self.stacks)
+        new_board_states = []
         contribution = 0
-        for i in range(NUM_BOARDS):
-            if isinstance(new_board_states[i], BoardState) and isinstance(self.board_states[i], BoardState):
-                contribution += new_board_states[i].pips[active] - self.board_states[i].pips[active]
+        all_settled = True
+        for board_state, action in zip(self.board_states, actions):
+            if isinstance(board_state, BoardState):
+                new_board_state = board_state.proceed(action, self.button, self.street)
+                if isinstance(new_board_state, BoardState):
+                    contribution += new_board_state.pips[active] - board_state.pips[active]
+                    all_settled = all_settled and new_board_state.settled
+                new_board_states.append(new_board_state)
+            else:
+                new_board_states.append(board_state)
+        new_stacks = list(self.stacks)
         new_stacks[active] -= contribution
-        settled = [(isinstance(board_state, TerminalState) or board_state.settled) for board_state in new_board_states]
         state = RoundState(self.button + 1, self.street, new_stacks, self.hands, new_board_states, self)
-        return state.proceed_street() if all(settled) else state
+        return state.proceed_street() if all_settled else state
@@ -0,0 +1,196 @@
+'''
+6.176 MIT POKERBOTS TOURNAMENT RUNNER
+Plays many games between a list of pokerbots concurrently and merges the results.
+'''
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from itertools import combinations
+from multiprocessing.util import Finalize
+import argparse
+import csv
+import os
+
+from engine import Game, Player, BotPool
+from config import NUM_BOARDS
+
+SCHEDULES = ['round-robin', 'gauntlet']
+MATCH_FIELDS = ['match', 'player_1', 'player_2', 'bankroll_1', 'bankroll_2'] + \
+               ['table_{}_{}'.format(i+1, seat) for i in range(NUM_BOARDS) for seat in (1, 2)] + ['winner', 'rounds', 'stop_reason', 'error']
+STANDING_FIELDS = ['bot', 'matches', 'wins', 'losses', 'ties', 'bankroll']
+
+
+def bot_names(paths):
+    '''
+    Names each pokerbot after its directory, disambiguating repeated names.
+    '''
+    bases = [os.path.basename(os.path.normpath(path)) for path in paths]
+    names = []
+    for i, base in enumerate(bases):
+        names.append(base if bases.count(base) == 1 else '{}_{}'.format(base, i+1))
+    return names
+
+
+def make_schedule(num_bots, schedule, games):
+    '''
+    Returns a list of (first seat, second seat) bot index pairs, one per game.
+
+    Round-robin pairs every two bots; gauntlet pairs the first bot with every other bot.
+    Seats alternate between consecutive games of the same pairing.
+    '''
+    if schedule == 'gauntlet':
+        pairings = [(0, j) for j in range(1, num_bots)]
+    else:  # round-robin
+        pairings = list(combinations(range(num_bots), 2))
+    return [(i, j) if game % 2 == 0 else (j, i) for i, j in pairings for game in range(games)]
+
+
+def build_bots(names, paths, output_dir):
+    '''
+    Builds each pokerbot once, so that concurrent games never build the same directory.
+    '''
+    build_dir = os.path.join(output_dir, 'builds')
+    os.makedirs(build_dir, exist_ok=True)
+    for name, path in zip(names, paths):
+        print('Building', name)
+        player = Player(name, path, build_dir)
+        player.build()
+        player.stop()
+
+
+_worker_pool = None  # each worker process keeps its own warm pokerbots
+
+
+def worker_pool():
+    '''
+    Returns this worker process's pool of warm pokerbots, which is closed when the worker exits.
+    '''
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = BotPool()
+        Finalize(_worker_pool, _worker_pool.close, exitpriority=10)
+    return _worker_pool
+
+
+def run_match(match_id, player_specs, match_dir, warm=False):
+    '''
+    Runs one game in its own output directory and returns a row of the results table.
+
+    With warm set, the pokerbots are kept running for the worker's next games.
+    '''
+    os.makedirs(match_dir, exist_ok=True)
+    with open(os.path.join(match_dir, 'engine.txt'), 'w') as engine_output:
+        with redirect_stdout(engine_output):
+            game = Game(player_specs, match_dir)
+            players = game.run(build=False, pool=worker_pool() if warm else None)
+    row = {'match': match_id, 'player_1': players[0].name, 'player_2': players[1].name,
+           'bankroll_1': players[0].bankroll, 'bankroll_2': players[1].bankroll,
+           'rounds': len(game.round_results), 'stop_reason': game.stop_reason or '', 'error': ''}
+    for i in range(NUM_BOARDS):
+        row['table_{}_1'.format(i+1)] = players[0].table_winnings[i]
+        row['table_{}_2'.format(i+1)] = players[1].table_winnings[i]
+    if players[0].bankroll > players[1].bankroll:
+        row['winner'] = players[0].name
+    elif players[0].bankroll < players[1].bankroll:
+        row['winner'] = players[1].name
+    else:
+        row['winner'] = ''
+    return row
+
+
+def standings(names, rows):
+    '''
+    Aggregates match rows into one standings row per pokerbot, best bankroll first.
+    '''
+    table = {name: {'bot': name, 'matches': 0, 'wins': 0, 'losses': 0, 'ties': 0, 'bankroll': 0} for name in names}
+    for row in rows:
+        if row['error']:
+            continue
+        for seat in (1, 2):
+            entry = table[row['player_{}'.format(seat)]]
+            entry['matches'] += 1
+            entry['bankroll'] += row['bankroll_{}'.format(seat)]
+            if row['winner'] == '':
+                entry['ties'] += 1
+            elif row['winner'] == entry['bot']:
+                entry['wins'] += 1
+            else:
+                entry['losses'] += 1
+    return sorted(table.values(), key=lambda entry: (entry['wins'], entry['bankroll']), reverse=True)
+
+
+def write_csv(name, fields, rows):
+    '''
+    Writes rows of a results table to a CSV file.
+    '''
+    with open(name, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_tournament(paths, schedule='round-robin', games=1, workers=None, output_dir='tournament', warm=False):
+    '''
+    Plays every scheduled game on a bounded process pool and writes the merged results.
+
+    Returns the standings rows.
+    '''
+    paths = [os.path.abspath(path) for path in paths]
+    names = bot_names(paths)
+    os.makedirs(output_dir, exist_ok=True)
+    build_bots(names, paths, output_dir)
+    matches = make_schedule(len(paths), schedule, games)
+    workers = workers or os.cpu_count() or 1
+    print('Running {} games on {} workers'.format(len(matches), workers))
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for match_id, (i, j) in enumerate(matches, 1):
+            match_dir = os.path.join(output_dir, 'match_{:04d}_{}_vs_{}'.format(match_id, names[i], names[j]))
+            player_specs = [(names[i], paths[i]), (names[j], paths[j])]
+            futures[executor.submit(run_match, match_id, player_specs, match_dir, warm)] = (match_id, names[i], names[j])
+        for future in as_completed(futures):
+            match_id, name_1, name_2 = futures[future]
+            try:
+                row = future.result()
+            except Exception as error:  # a crashed game must not take down the tournament
+                row = {'match': match_id, 'player_1': name_1, 'player_2': name_2, 'error': repr(error)}
+            rows.append(row)
+            print('Game {} of {} finished: {} vs {}'.format(len(rows), len(matches), name_1, name_2))
+    rows.sort(key=lambda row: row['match'])
+    table = standings(names, rows)
+    write_csv(os.path.join(output_dir, 'results.csv'), MATCH_FIELDS, rows)
+    write_csv(os.path.join(output_dir, 'standings.csv'), STANDING_FIELDS, table)
+    return table
+
+
+def print_standings(table):
+    '''
+    Prints the standings as a fixed-width table.
+    '''
+    width = max([len('bot')] + [len(entry['bot']) for entry in table])
+    print('{:<{}}  {:>7}  {:>4}  {:>6}  {:>4}  {:>8}'.format('bot', width, 'matches', 'wins', 'losses', 'ties', 'bankroll'))
+    for entry in table:
+        print('{:<{}}  {:>7}  {:>4}  {:>6}  {:>4}  {:>8}'.format(entry['bot'], width, entry['matches'], entry['wins'],
+                                                              entry['losses'], entry['ties'], entry['bankroll']))
+
+
+def parse_args():
+    '''
+    Parses the list of pokerbots and the tournament settings.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 tournament.py')
+    parser.add_argument('paths', nargs='+', help='Pokerbot directories; for a gauntlet the first one is the challenger')
+    parser.add_argument('--schedule', choices=SCHEDULES, default='round-robin', help='Pairing schedule, defaults to round-robin')
+    parser.add_argument('--games', type=int, default=2, help='Games per pairing with alternating seats, defaults to 2')
+    parser.add_argument('--workers', type=int, default=None, help='Concurrent games, defaults to the number of cores')
+    parser.add_argument('--output-dir', type=str, default='tournament', help='Directory for game logs and results')
+    parser.add_argument('--warm', action='store_true', help='Keep pokerbots running between the games of each worker')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if len(args.paths) < 2:
+        print('A tournament needs at least two pokerbots')
+    else:
+        print_standings(run_tournament(args.paths, args.schedule, args.games, args.workers, args.output_dir, args.warm))
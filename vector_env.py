@@ -0,0 +1,325 @@
+'''
+Batched self-play environment.
+
+Holds many independent rounds of the game as NumPy arrays and advances every one of them
+by one action of its active player per step, for training pokerbots by self-play. The
+rules are the engine's: legal actions and raise bounds follow BoardState.legal_actions and
+raise_bounds, actions are checked and corrected as engine.Player.parse_actions checks a
+pokerbot's response, and payouts follow RoundState.showdown. A round dealt from the same
+deal seed and played with the same actions ends with the same deltas as in engine.py.
+
+Players are numbered by their position in the round, 0 for the small blind. Cards are
+indices as in evaluator.py, NO_CARD where not dealt yet. An action is one of the kinds
+below on every board, with an amount for raises. While the players assign their hole cards,
+an action is instead a permutation of the NUM_BOARDS*2 positions of the player's hand, read
+two at a time for each board; anything else folds every board, as in the engine.
+'''
+import random
+import numpy as np
+
+from config import NUM_BOARDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
+from evaluator import evaluate
+from hand_history import NO_CARD
+
+FOLD, CALL, CHECK, RAISE = range(4)
+NUM_KINDS = 4
+HAND_SIZE = NUM_BOARDS * 2
+
+
+def deal_seeded(deal_seed):
+    '''
+    Deals (hands, boards) as card indices the way engine.Game.round_queries deals from a deal seed.
+    '''
+    rng = random.Random(deal_seed)
+    cards = list(range(52))  # the order of a fresh eval7.Deck
+    rng.shuffle(cards)
+    hands = [cards[:HAND_SIZE], cards[HAND_SIZE:2*HAND_SIZE]]
+    boards = []
+    for _ in range(NUM_BOARDS):
+        deck = cards[2*HAND_SIZE:]
+        rng.shuffle(deck)
+        boards.append(deck[:5])
+    return hands, boards
+
+
+class VectorEnv():
+    '''
+    Plays num_envs rounds at once with a gym-like reset and step.
+
+    Arrays hold one row per round, boards along the next axis and players along the last.
+    Rounds which end during a step are dealt again at once when auto_reset is set; otherwise
+    they stay over and ignore actions until the next reset.
+    '''
+
+    def __init__(self, num_envs, seed=None, auto_reset=True):
+        self.num_envs = num_envs
+        self.rng = np.random.default_rng(seed)
+        self.auto_reset = auto_reset
+        self.rows = np.arange(num_envs)
+        self.button = np.zeros(num_envs, dtype=np.int64)
+        self.street = np.zeros(num_envs, dtype=np.int64)
+        self.stacks = np.zeros((num_envs, 2), dtype=np.int64)
+        self.pots = np.zeros((num_envs, NUM_BOARDS), dtype=np.int64)
+        self.pips = np.zeros((num_envs, NUM_BOARDS, 2), dtype=np.int64)
+        self.settled = np.zeros((num_envs, NUM_BOARDS), dtype=bool)
+        self.live = np.zeros((num_envs, NUM_BOARDS), dtype=bool)
+        # chips each player won from each board's pot, once the board has ended
+        self.winnings = np.zeros((num_envs, NUM_BOARDS, 2), dtype=np.int64)
+        self.hands = np.zeros((num_envs, 2, HAND_SIZE), dtype=np.uint8)
+        self.assigned = np.full((num_envs, 2, NUM_BOARDS, 2), NO_CARD, dtype=np.uint8)
+        self.boards = np.zeros((num_envs, NUM_BOARDS, 5), dtype=np.uint8)
+        self.done = np.zeros(num_envs, dtype=bool)
+        self.deltas = np.zeros((num_envs, 2), dtype=np.int64)
+        self.reset()
+
+    def deal(self, count):
+        '''
+        Deals count rounds at random, returning hands and boards as arrays of card indices.
+        '''
+        cards = np.argsort(self.rng.random((count, 52)), axis=1)
+        hands = cards[:, :2*HAND_SIZE].reshape(count, 2, HAND_SIZE)
+        deck = cards[:, 2*HAND_SIZE:]
+        # every board draws from its own shuffle of the cards left after the hands
+        order = np.argsort(self.rng.random((count, NUM_BOARDS, deck.shape[1])), axis=2)[:, :, :5]
+        boards = np.take_along_axis(deck[:, None, :], order, axis=2)
+        return hands, boards
+
+    def start(self, envs, deal_seeds=None):
+        '''
+        Deals new rounds to the rounds in envs, from their deal seeds if given.
+        '''
+        if deal_seeds is None:
+            hands, boards = self.deal(len(envs))
+        else:
+            deals = [deal_seeded(deal_seed) for deal_seed in deal_seeds]
+            hands = np.array([hands for hands, _ in deals]).reshape(len(envs), 2, HAND_SIZE)
+            boards = np.array([boards for _, boards in deals]).reshape(len(envs), NUM_BOARDS, 5)
+        self.hands[envs] = hands
+        self.boards[envs] = boards
+        self.button[envs] = -2
+        self.street[envs] = 0
+        self.stacks[envs] = (STARTING_STACK - NUM_BOARDS*SMALL_BLIND, STARTING_STACK - NUM_BOARDS*BIG_BLIND)
+        self.pots[envs] = (np.arange(NUM_BOARDS) + 1) * BIG_BLIND
+        self.pips[envs] = (SMALL_BLIND, BIG_BLIND)
+        self.settled[envs] = False
+        self.live[envs] = True
+        self.winnings[envs] = 0
+        self.assigned[envs] = NO_CARD
+        self.done[envs] = False
+        self.deltas[envs] = 0
+
+    def reset(self, deal_seeds=None):
+        '''
+        Deals a new round to every env, from one deal seed per env if given, and returns the observation.
+        '''
+        if deal_seeds is not None and len(deal_seeds) != self.num_envs:
+            raise ValueError('expected {} deal seeds, got {}'.format(self.num_envs, len(deal_seeds)))
+        self.start(self.rows, deal_seeds)
+        return self.observe()
+
+    def active_view(self, array):
+        '''
+        Splits a per-player array shaped (num_envs, ..., 2) into the active player's and the opponent's values.
+        '''
+        first = (self.button % 2 == 0).reshape((-1,) + (1,) * (array.ndim - 2))
+        return np.where(first, array[..., 0], array[..., 1]), np.where(first, array[..., 1], array[..., 0])
+
+    def legal_actions(self):
+        '''
+        Returns a boolean array shaped (num_envs, NUM_BOARDS, NUM_KINDS) of the active player's legal kinds.
+
+        Boards being assigned have no legal kind, and boards which have ended only allow CHECK.
+        '''
+        pips, opp_pips = self.active_view(self.pips)
+        stack, opp_stack = self.active_view(self.stacks)
+        continue_cost = opp_pips - pips
+        betting = self.live & (self.button >= 0)[:, None]
+        open_boards = betting & ~self.settled
+        unopened = open_boards & (continue_cost == 0)
+        facing = open_boards & (continue_cost != 0)
+        legal = np.zeros((self.num_envs, NUM_BOARDS, NUM_KINDS), dtype=bool)
+        legal[:, :, FOLD] = facing
+        legal[:, :, CALL] = facing
+        legal[:, :, CHECK] = ~self.live | (betting & self.settled) | unopened
+        # raising is only allowed if both players can afford it
+        can_raise = (stack > 0) & (opp_stack > 0)
+        legal[:, :, RAISE] = (unopened & can_raise[:, None]) | (facing & (continue_cost != stack[:, None]) & (opp_stack > 0)[:, None])
+        return legal
+
+    def raise_bounds(self):
+        '''
+        Returns an array shaped (num_envs, NUM_BOARDS, 2) of the minimum and maximum legal raises on each board.
+        '''
+        pips, opp_pips = self.active_view(self.pips)
+        stack, opp_stack = self.active_view(self.stacks)
+        continue_cost = opp_pips - pips
+        max_contribution = np.minimum(stack[:, None], opp_stack[:, None] + continue_cost)
+        min_contribution = np.minimum(max_contribution, continue_cost + np.maximum(continue_cost, BIG_BLIND))
+        return np.stack([pips + min_contribution, pips + max_contribution], axis=2)
+
+    def observe(self):
+        '''
+        Returns the active player's view of every round as a dict of arrays.
+        '''
+        active = self.button % 2
+        visible = np.arange(5) < self.street[:, None, None]
+        return {
+            'active': active,
+            'button': self.button.copy(),
+            'street': self.street.copy(),
+            'assigning': (self.button < 0) & ~self.done,
+            'stacks': self.stacks.copy(),
+            'pots': self.pots.copy(),
+            'pips': self.pips.copy(),
+            'settled': self.settled.copy(),
+            'live': self.live.copy(),
+            'hand': self.hands[self.rows, active],
+            'assigned': self.assigned[self.rows, active],
+            'boards': np.where(visible, self.boards, NO_CARD).astype(np.uint8),
+            'legal': self.legal_actions(),
+            'raise_bounds': self.raise_bounds(),
+            'done': self.done.copy(),
+        }
+
+    def check_actions(self, kinds, amounts):
+        '''
+        Corrects the active players' actions the way engine.Player.parse_actions does.
+
+        Illegal kinds and raises outside the bounds check where legal and fold elsewhere, a raise
+        to the opponent's pip is a call, and combinations the player can not afford fall back to
+        checking and folding on every board. Unless the player is all in, raises below the minimum
+        become calls, and raises the opponent can not match are cut down board by board.
+        '''
+        kinds = kinds.copy()
+        amounts = amounts.copy()
+        legal = self.legal_actions()
+        bounds = self.raise_bounds()
+        pips, opp_pips = self.active_view(self.pips)
+        stack, opp_stack = self.active_view(self.stacks)
+        default = np.where(legal[:, :, CHECK], CHECK, FOLD)
+        known = (kinds >= 0) & (kinds < NUM_KINDS)
+        is_legal = known & np.take_along_axis(legal, np.where(known, kinds, CHECK)[:, :, None], axis=2)[:, :, 0]
+        raises = is_legal & (kinds == RAISE)
+        in_bounds = raises & (opp_pips < amounts) & (amounts <= bounds[:, :, 1])
+        to_call = raises & ~in_bounds & (amounts == opp_pips)
+        kinds[to_call] = CALL
+        illegal = ~is_legal | (raises & ~in_bounds & ~to_call)
+        kinds[illegal] = default[illegal]
+        raises = kinds == RAISE
+        contribution = (np.where(raises, amounts - pips, 0) + np.where(kinds == CALL, opp_pips - pips, 0)).sum(axis=1)
+        opp_continue_cost = np.where(raises, amounts - opp_pips, 0).sum(axis=1)
+        affordable = (contribution >= 0) & (contribution <= stack)
+        kinds[~affordable] = default[~affordable]
+        short = raises & (affordable & (contribution != stack))[:, None] & (amounts < bounds[:, :, 0])
+        kinds[short] = np.where(legal[:, :, CALL], CALL, CHECK)[short]
+        # raises the opponent can not match are cut to what is left of the opponent's stack
+        capped = affordable & (opp_continue_cost > opp_stack)
+        effective_stack = opp_stack.copy()
+        for i in range(NUM_BOARDS):
+            raised = capped & (kinds[:, i] == RAISE)
+            raise_delta = amounts[:, i] - opp_pips[:, i]
+            exhausted = raised & (effective_stack == 0)
+            cut = raised & ~exhausted & (raise_delta > effective_stack)
+            kinds[exhausted, i] = CALL
+            amounts[cut, i] = opp_pips[cut, i] + effective_stack[cut]
+            effective_stack = np.where(cut, 0, np.where(raised & ~exhausted, effective_stack - raise_delta, effective_stack))
+        return kinds, amounts
+
+    def check_assignments(self, assignments, assigning):
+        '''
+        Stores the hole cards of active players who assigned them with a permutation of their hand.
+
+        Returns which of the assigning rounds had an illegal assignment.
+        '''
+        assignments = np.asarray(assignments, dtype=np.int64).reshape(self.num_envs, HAND_SIZE)
+        valid = assigning & (np.sort(assignments, axis=1) == np.arange(HAND_SIZE)).all(axis=1)
+        envs = np.flatnonzero(valid)
+        active = self.button[envs] % 2
+        cards = np.take_along_axis(self.hands[envs, active], assignments[envs], axis=1)
+        self.assigned[envs, active] = cards.reshape(len(envs), NUM_BOARDS, 2)
+        return assigning & ~valid
+
+    def step(self, kinds, amounts=None, assignments=None):
+        '''
+        Applies one action of the active player in every round which is not over.
+
+        kinds and amounts are shaped (num_envs, NUM_BOARDS), assignments (num_envs, NUM_BOARDS*2)
+        and is needed while any round is being assigned. Returns (observation, rewards, dones, info):
+        rewards are the players' deltas for rounds which ended in this step and 0 otherwise, and
+        info holds the chips each player won from each board of those rounds.
+        '''
+        playing = ~self.done
+        assigning = playing & (self.button < 0)
+        kinds = np.asarray(kinds, dtype=np.int64).reshape(self.num_envs, NUM_BOARDS)
+        amounts = np.zeros_like(kinds) if amounts is None else np.asarray(amounts, dtype=np.int64).reshape(self.num_envs, NUM_BOARDS)
+        kinds, amounts = self.check_actions(kinds, amounts)
+        if assigning.any():
+            if assignments is None:
+                raise ValueError('assignments are needed while rounds are being assigned')
+            forfeit = self.check_assignments(assignments, assigning)
+            kinds[assigning] = np.where(forfeit[assigning, None], FOLD, NUM_KINDS)  # NUM_KINDS leaves a board as it is
+        active = self.button % 2
+        pips, opp_pips = self.active_view(self.pips)
+        street_over = ((self.street == 0) & (self.button > 0)) | (self.button > 1)
+        moving = self.live & playing[:, None]
+        folds = moving & (kinds == FOLD)
+        calls = moving & (kinds == CALL)
+        checks = moving & (kinds == CHECK)
+        raises = moving & (kinds == RAISE)
+        # the small blind calling the big blind preflop leaves the big blind to act
+        completes = calls & (self.button == 0)[:, None]
+        new_pips = np.where(completes, BIG_BLIND, np.where(calls, opp_pips, np.where(raises, amounts, pips)))
+        contribution = np.where(moving & ~folds, new_pips - pips, 0).sum(axis=1)
+        self.stacks[self.rows, active] -= contribution
+        self.settled[:] = np.where(calls, ~completes, np.where(raises, False, self.settled | (checks & street_over[:, None])))
+        env_index, board_index = np.nonzero(moving)
+        self.pips[env_index, board_index, active[env_index]] = new_pips[env_index, board_index]
+        self.pips[completes] = BIG_BLIND
+        fold_envs, fold_boards = np.nonzero(folds)
+        self.pots[folds] += self.pips[folds].sum(axis=1)
+        self.winnings[fold_envs, fold_boards, 1 - active[fold_envs]] = self.pots[folds]
+        self.pips[folds] = 0
+        self.live[folds] = False
+        self.button[playing] += 1
+        all_settled = playing & ~(self.live & ~self.settled).any(axis=1)
+        if all_settled.any():
+            self.proceed_street(all_settled)
+        rewards = np.where((self.done & playing)[:, None], self.deltas, 0)
+        dones = self.done & playing
+        info = {'winnings': np.where(dones[:, None, None], self.winnings, 0)}
+        if self.auto_reset and dones.any():
+            self.start(np.flatnonzero(dones))
+        return self.observe(), rewards, dones, info
+
+    def proceed_street(self, envs):
+        '''
+        Collects the pips on every live board of the rounds in envs and deals the next street, or shows down.
+        '''
+        collecting = self.live & envs[:, None]
+        self.pots[collecting] += self.pips[collecting].sum(axis=1)
+        self.pips[collecting] = 0
+        self.settled[collecting] = False
+        showdown = envs & ((self.street == 5) | ~self.live.any(axis=1))
+        next_street = envs & ~showdown
+        self.street[next_street] = np.where(self.street[next_street] == 0, 3, self.street[next_street] + 1)
+        self.button[next_street] = 1
+        if showdown.any():
+            self.showdown(showdown)
+
+    def showdown(self, envs):
+        '''
+        Scores every live board of the rounds in envs in one batch and pays out their pots.
+        '''
+        self.street[envs] = 5
+        showing = self.live & envs[:, None]
+        boards = np.broadcast_to(self.boards[:, :, None, :], (self.num_envs, NUM_BOARDS, 2, 5))[showing]
+        hands = self.assigned.transpose(0, 2, 1, 3)[showing]
+        scores = evaluate(np.concatenate([boards, hands], axis=2))
+        pots = self.pots[showing]
+        winnings = np.stack([np.where(scores[:, 0] > scores[:, 1], pots, 0), np.where(scores[:, 0] < scores[:, 1], pots, 0)], axis=1)
+        split = scores[:, 0] == scores[:, 1]
+        winnings[split] = (pots[split] // 2)[:, None]
+        self.winnings[showing] = winnings
+        self.live[showing] = False
+        self.deltas[envs] = self.stacks[envs] + self.winnings[envs].sum(axis=1) - STARTING_STACK
+        self.done[envs] = True